@@ -66,8 +66,10 @@ class Amazons(Game):
 
     @classmethod
     def get_possible_moves(cls, state):
-        moves = []
+        return list(cls.iter_possible_moves(state))
 
+    @classmethod
+    def iter_possible_moves(cls, state):
         player_index = 0 if cls.is_player_1_turn(state) else 1
         for i, j in iter_product(cls.BOARD_SHAPE):
             if state[i, j, player_index] == 1:
@@ -78,8 +80,7 @@ class Amazons(Game):
                     for t_x, t_y in cls.shoot(partial_move, p_x, p_y):
                         full_move = np.copy(partial_move)  # Don't use null_move because turn was already switched above
                         full_move[t_x, t_y, 2] = 1
-                        moves.append(full_move)
-        return moves
+                        yield full_move
 
     @classmethod
     def get_legal_moves(cls, state):
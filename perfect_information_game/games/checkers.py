@@ -1,4 +1,4 @@
-from perfect_information_game.games import Game
+from perfect_information_game.games import Game, StateTransform
 import numpy as np
 from perfect_information_game.utils import iter_product
 
@@ -191,3 +191,23 @@ class Checkers(Game):
     @classmethod
     def heuristic(cls, state, king_weight=2):
         return np.sum(np.dot(state, [1, king_weight, -1, -king_weight, 0, 0]))
+
+    @classmethod
+    def get_captures(cls, state, moves):
+        return np.sum(moves[..., :4], axis=(1, 2, 3)) < np.sum(state[..., :4])
+
+    @classmethod
+    def get_symmetry_transforms(cls):
+        return [StateTransform.identity(cls), StateTransform(cls, flip_colors=True)]
+
+    @classmethod
+    def flip_state_colors(cls, state):
+        # swap the red and black layers, then rotate the board by 180 degrees so that pieces move in the right direction
+        new_state = np.concatenate((state[..., 2:4], state[..., :2], state[..., 4:5], 1 - state[..., 5:]), axis=-1)
+        return np.flip(new_state, axis=(0, 1))
+
+    @classmethod
+    def flip_policy_colors(cls, policy):
+        # rotating the board by 180 degrees maps i to 7 - i, j // 2 to 3 - j // 2,
+        # and reverses the order of MOVE_DIRECTIONS since each direction is negated
+        return np.flip(policy, axis=(0, 1, 2))
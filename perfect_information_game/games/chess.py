@@ -1,10 +1,8 @@
 from perfect_information_game.games import Game, InvalidMoveException
 import numpy as np
 from perfect_information_game.utils import one_hot, iter_product, get_np_uint_type, alternate_iterables, \
-    STRAIGHT_DIRECTIONS, DIAGONAL_DIRECTIONS, DIRECTIONS_8
+    lru_cached, STRAIGHT_DIRECTIONS, DIAGONAL_DIRECTIONS, DIRECTIONS_8
 from functools import partial, reduce
-from cachetools import cached, LRUCache
-import easygui
 
 
 class Chess(Game):
@@ -133,84 +131,116 @@ class Chess(Game):
 
         return ' '.join([pieces, turn, castling, en_passant, '-', '-'])
 
+    @classmethod
+    def get_piece_codes(cls, states):
+        """
+        Computes the 4 bit piece codes used by encode_board_bytes for an array of states.
+        Codes 0-5 are KQRBNP, 6 is the king whose turn it is, 7 is a rook that can castle or a pawn that just moved
+        2 squares, and 8-15 are the same for black.
+
+        :param states: An array with shape (k, 8, 8, 14).
+        :return: A boolean array with shape (k, 8, 8) that is True for every occupied square,
+                 and a uint8 array with shape (k, 8, 8) containing the code of the piece on each square.
+        """
+        occupied = np.sum(states[..., :12], axis=-1) == 1
+        where = np.argmax(states[..., :12], axis=-1)
+        piece = where % 6
+        is_white = where < 6
+        is_white_turn = np.all(states[..., -1], axis=(1, 2))[:, np.newaxis, np.newaxis]
+        rows = np.arange(cls.ROWS)[np.newaxis, :, np.newaxis]
+
+        # special flags that apply to the piece on each square, as stored on other squares of the special moves layer
+        castling_flags = np.zeros(occupied.shape, dtype=bool)
+        castling_flags[:, [0, 0, 7, 7], [0, 7, 0, 7]] = states[:, [0, 0, 7, 7], [2, 6, 2, 6], -2] == 1
+        en_passant_flags = np.zeros(occupied.shape, dtype=bool)
+        en_passant_flags[:, 3, :] = states[:, 2, :, -2] == 1
+        en_passant_flags[:, 4, :] = states[:, 5, :, -2] == 1
+
+        king_to_move = (piece == cls.KING) & (is_white == is_white_turn)
+        castling_rook = (piece == cls.ROOK) & (rows == np.where(is_white, 7, 0)) & castling_flags
+        en_passant_pawn = (piece == cls.PAWN) & (is_white != is_white_turn) & \
+            (rows == np.where(is_white, 4, 3)) & en_passant_flags
+
+        codes = np.where(king_to_move, 6, np.where(castling_rook | en_passant_pawn, 7, piece))
+        codes = (codes + np.where(is_white, 0, 8)).astype(np.uint8)
+        return occupied, codes
+
+    @classmethod
+    def encode_piece_codes(cls, occupied, codes):
+        """
+        Packs the output of get_piece_codes for k states that all have the same number of pieces
+        into an array with shape (k, board_bytes_length).
+        """
+        bitboard_bytes = np.packbits(occupied, axis=-1, bitorder='little').reshape(-1, cls.ROWS)
+        pieces = codes[occupied].reshape(occupied.shape[0], -1)
+        if pieces.shape[1] % 2 == 1:
+            # the first piece gets a byte to itself
+            pieces = np.concatenate((np.zeros((pieces.shape[0], 1), dtype=np.uint8), pieces), axis=1)
+        return np.concatenate((bitboard_bytes, 16 * pieces[:, ::2] + pieces[:, 1::2]), axis=1)
+
     @classmethod
     def encode_board_bytes(cls, state):
         # https://codegolf.stackexchange.com/a/19446
-        bitboard = np.sum(state[:, :, :12], axis=-1) == 1
-        is_white_turn = cls.is_player_1_turn(state)
+        # This is a fast path for a single state which uses a single NumPy call to locate all the pieces.
+        # encode_board_bytes_batch produces identical results for arrays of states.
+        is_white_turn = state[0, 0, -1] == 1
+        special = state[:, :, -2]
+        bitboard = [0] * cls.ROWS
         pieces = []
-        for i, j in iter_product(Chess.BOARD_SHAPE):
-            if not bitboard[i, j]:
-                continue
-
+        for i, j, where in zip(*np.nonzero(state[:, :, :12])):
+            bitboard[i] |= 1 << j
             # KQRBNP, King to move, Rook that can castle or Pawn that moved 2 squares, same 8 for black
-            where = np.argwhere(state[i, j, :12])[0, 0]
             piece = where % 6
             is_white = where < 6
+            colour_offset = 0 if is_white else 8
 
             if piece == cls.KING and is_white == is_white_turn:  # if piece is a king whose turn it is
-                pieces.append(6 if is_white_turn else 14)
-                continue
-
-            if piece == cls.ROOK and i == (7 if is_white else 0):  # if piece is a rook on home rank
-                if i == 0 and j == 0 and state[0, 2, -2] == 1:
-                    pieces.append(15)
-                    continue
-                if i == 0 and j == 7 and state[0, 6, -2] == 1:
-                    pieces.append(15)
-                    continue
-                if i == 7 and j == 0 and state[7, 2, -2] == 1:
-                    pieces.append(7)
-                    continue
-                if i == 7 and j == 7 and state[7, 6, -2] == 1:
-                    pieces.append(7)
-                    continue
-
-            if piece == cls.PAWN and is_white != is_white_turn and i == (4 if is_white else 3) \
-                    and state[(5 if is_white else 2), j, -2] == 1:
-                pieces.append(7 if is_white else 15)
-                continue
-
-            pieces.append(piece + (0 if is_white else 8))
-
-        board_bytes = []
-        for row in bitboard:
-            value = 0
-            for i, square in enumerate(row):
-                if square:
-                    value += (1 << i)
-            board_bytes.append(value)
+                pieces.append(6 + colour_offset)
+            elif piece == cls.ROOK and i == (7 if is_white else 0) and j in (0, 7) \
+                    and special[i, 2 if j == 0 else 6] == 1:  # if piece is a rook that can castle
+                pieces.append(7 + colour_offset)
+            elif piece == cls.PAWN and is_white != is_white_turn and i == (4 if is_white else 3) \
+                    and special[(5 if is_white else 2), j] == 1:  # if piece is a pawn that moved 2 squares
+                pieces.append(7 + colour_offset)
+            else:
+                pieces.append(piece + colour_offset)
+
         if len(pieces) % 2 == 1:
-            board_bytes.append(pieces[0])
-            pieces = pieces[1:]
-        for i in range(0, len(pieces), 2):
-            board_bytes.append(16 * pieces[i] + pieces[i + 1])
-        return bytes(board_bytes)
+            bitboard.append(pieces.pop(0))
+        return bytes(bitboard + [16 * pieces[i] + pieces[i + 1] for i in range(0, len(pieces), 2)])
+
+    @classmethod
+    def encode_board_bytes_batch(cls, states):
+        occupied, codes = cls.get_piece_codes(states)
+        piece_counts = np.sum(occupied, axis=(1, 2))
+        board_bytes = [None] * states.shape[0]
+        # the encoded length depends on the piece count, so positions are batched by piece count
+        for piece_count in np.unique(piece_counts):
+            indices = np.flatnonzero(piece_counts == piece_count)
+            for index, row in zip(indices, cls.encode_piece_codes(occupied[indices], codes[indices])):
+                board_bytes[index] = row.tobytes()
+        return board_bytes
 
     @classmethod
     def parse_board_bytes(cls, board_bytes):
-        board_bytes = list(board_bytes)  # convert back to list of integers
-        bitboard = np.array([[row & (1 << square) for square in range(8)] for row in board_bytes[:8]]) != 0
-        board_bytes = board_bytes[8:]
+        # This is a fast path for a single state, parse_board_bytes_batch produces identical results for many states.
+        squares = [(i, j) for i in range(cls.ROWS) for j in range(cls.COLUMNS) if board_bytes[i] & (1 << j)]
         pieces = []
-        piece_count = np.sum(bitboard)
-        if piece_count % 2 == 1:
-            pieces.append(board_bytes[0])
-            board_bytes = board_bytes[1:]
-        for piece_bytes in board_bytes:
-            pieces.append(piece_bytes // 16)
-            pieces.append(piece_bytes % 16)
+        piece_bytes = board_bytes[8:]
+        if len(squares) % 2 == 1:
+            pieces.append(piece_bytes[0])
+            piece_bytes = piece_bytes[1:]
+        for piece_byte in piece_bytes:
+            pieces.append(piece_byte // 16)
+            pieces.append(piece_byte % 16)
 
-        if len(pieces) != piece_count:
-            raise ValueError(f'Inconsistent number of pieces! Expected {piece_count} but got {len(pieces)}')
+        if len(pieces) != len(squares):
+            raise ValueError(f'Inconsistent number of pieces! Expected {len(squares)} but got {len(pieces)}')
 
         state = np.zeros(Chess.STATE_SHAPE, dtype=np.uint8)
-        en_passant_processed = False
-        for i, j in iter_product(Chess.BOARD_SHAPE):
-            if not bitboard[i, j]:
-                continue
-
-            piece_value = pieces.pop(0)
+        indices = []
+        en_passant_square = None
+        for (i, j), piece_value in zip(squares, pieces):
             is_white = piece_value < 8
             piece = piece_value % 8
 
@@ -221,43 +251,116 @@ class Chess(Game):
                 piece = cls.KING  # convert to regular king
             if piece == 7:
                 if i == 0 or i == 7:  # if this is castling information
-                    if i == 0 and j == 0 and not is_white:
-                        state[0, 2, -2] = 1
-                    elif i == 0 and j == 7 and not is_white:
-                        state[0, 6, -2] = 1
-                    elif i == 7 and j == 0 and is_white:
-                        state[7, 2, -2] = 1
-                    elif i == 7 and j == 7 and is_white:
-                        state[7, 6, -2] = 1
-                    else:
+                    if j not in (0, 7) or is_white != (i == 7):
                         raise ValueError(f'Castling information on invalid square! '
                                          f'i = {i}, j = {j}, is_white = {is_white}')
+                    indices.append((i, 2 if j == 0 else 6, -2))
                     piece = cls.ROOK  # convert to regular rook
                 elif i == 3 or i == 4:  # if this is en passant information
-                    if en_passant_processed:
+                    if en_passant_square is not None:
                         raise ValueError(f'Second en passant square found! i = {i}, j = {j}, is_white = {is_white}')
-                    if i == 4 and is_white:
-                        state[i + 1, j, -2] = 1
-                    elif i == 3 and not is_white:
-                        state[i - 1, j, -2] = 1
-                    else:
+                    if is_white != (i == 4):
                         raise ValueError(f'En passant rank does not match the correct colour! '
                                          f'i = {i}, j = {j}, is_white = {is_white}')
-                    en_passant_processed = True
+                    en_passant_square = (i + 1 if is_white else i - 1, j)
+                    indices.append(en_passant_square + (-2,))
                     piece = cls.PAWN  # convert to regular pawn
                 else:
                     raise ValueError(f'Special piece on invalid square! i = {i}, j = {j}, is_white = {is_white}')
 
-            state[i, j, piece + (0 if is_white else 6)] = 1
+            indices.append((i, j, piece + (0 if is_white else 6)))
 
-        if en_passant_processed:
-            # check if en passant information is consistent with whose turn it is
-            is_white_pawn_en_passant = np.any(state[5, :, -2] == 1)
-            if is_white_pawn_en_passant == cls.is_player_1_turn(state):
-                raise ValueError('The player whose turn it is also has an en passant pawn!')
+        state[tuple(np.array(indices, dtype=int).T)] = 1
+
+        # check if en passant information is consistent with whose turn it is
+        if en_passant_square is not None and (en_passant_square[0] == 5) == cls.is_player_1_turn(state):
+            raise ValueError('The player whose turn it is also has an en passant pawn!')
+
+        return state
+
+    @classmethod
+    def parse_board_bytes_batch(cls, board_bytes_batch):
+        states = np.zeros((len(board_bytes_batch),) + cls.STATE_SHAPE, dtype=np.uint8)
+        lengths = np.array([len(board_bytes) for board_bytes in board_bytes_batch])
+        # positions are batched by encoded length, so that each batch can be stored in a 2D array
+        for length in np.unique(lengths):
+            indices = np.flatnonzero(lengths == length)
+            board_bytes_array = np.frombuffer(b''.join([board_bytes_batch[index] for index in indices]),
+                                              dtype=np.uint8).reshape(len(indices), length)
+            states[indices] = cls.parse_board_bytes_array(board_bytes_array)
+        return states
+
+    @classmethod
+    def parse_board_bytes_array(cls, board_bytes_array):
+        """
+        Parses a uint8 array with shape (k, board_bytes_length) into an array of k states.
+        """
+        k = board_bytes_array.shape[0]
+        occupied = np.unpackbits(board_bytes_array[:, :8], axis=-1, bitorder='little').reshape(k, 8, 8) == 1
+        piece_counts = np.sum(occupied, axis=(1, 2))
+        piece_bytes = board_bytes_array[:, 8:]
+        for piece_count in np.unique(piece_counts):
+            if (piece_count + 1) // 2 != piece_bytes.shape[1]:
+                raise ValueError(f'Inconsistent number of pieces! Expected {piece_count} '
+                                 f'but got {2 * piece_bytes.shape[1] - piece_count % 2}')
+        if k == 0 or piece_bytes.shape[1] == 0:
+            return np.zeros((k,) + cls.STATE_SHAPE, dtype=np.uint8)
+
+        pieces = np.stack((piece_bytes // 16, piece_bytes % 16), axis=-1).reshape(k, -1)
+        used_pieces = np.ones(pieces.shape, dtype=bool)
+        used_pieces[piece_counts % 2 == 1, 0] = False  # with an odd piece count, the first piece gets its own byte
+        codes = np.zeros((k, 8, 8), dtype=np.uint8)
+        codes[occupied] = pieces[used_pieces]
+
+        state = np.zeros((k,) + cls.STATE_SHAPE, dtype=np.uint8)
+        is_white = codes < 8
+        piece = codes % 8
+        rows = np.arange(cls.ROWS)[np.newaxis, :, np.newaxis]
+        columns = np.arange(cls.COLUMNS)[np.newaxis, np.newaxis, :]
+
+        # process turn information from the king whose turn it is
+        state[np.any(occupied & (piece == 6) & is_white, axis=(1, 2)), :, :, -1] = 1
+
+        special = occupied & (piece == 7)
+        castling = special & ((rows == 0) | (rows == 7))
+        en_passant = special & ((rows == 3) | (rows == 4))
+        invalid_castling = castling & ((columns % 7 != 0) | (is_white != (rows == 7)))
+        invalid_en_passant = en_passant & (is_white != (rows == 4))
+        cls.raise_on_invalid_square(invalid_castling, is_white, 'Castling information on invalid square!')
+        cls.raise_on_invalid_square(special & ~castling & ~en_passant, is_white,
+                                    'Special piece on invalid square!')
+        if np.any(np.sum(en_passant, axis=(1, 2)) > 1):
+            cls.raise_on_invalid_square(en_passant & (np.cumsum(en_passant.reshape(k, -1), axis=-1) > 1)
+                                        .reshape(k, 8, 8), is_white, 'Second en passant square found!')
+        cls.raise_on_invalid_square(invalid_en_passant, is_white, 'En passant rank does not match the correct colour!')
+
+        # castling rooks at columns 0 and 7 flag the king's destination at columns 2 and 6
+        castling_p, castling_i, castling_j = np.nonzero(castling)
+        state[castling_p, castling_i, np.where(castling_j == 0, 2, 6), -2] = 1
+        # en passant pawns on rows 4 and 3 flag the capturing square behind them at rows 5 and 2
+        en_passant_p, en_passant_i, en_passant_j = np.nonzero(en_passant)
+        state[en_passant_p, np.where(en_passant_i == 4, 5, 2), en_passant_j, -2] = 1
+
+        # convert kings to move, castling rooks, and en passant pawns to regular pieces
+        piece = np.where(piece == 6, cls.KING, piece)
+        piece = np.where(castling, cls.ROOK, np.where(en_passant, cls.PAWN, piece))
+        p, i, j = np.nonzero(occupied)
+        state[p, i, j, (piece + np.where(is_white, 0, 6))[p, i, j]] = 1
+
+        # check if en passant information is consistent with whose turn it is
+        has_en_passant = np.any(en_passant, axis=(1, 2))
+        is_white_pawn_en_passant = np.any(state[:, 5, :, -2] == 1, axis=-1)
+        if np.any(has_en_passant & (is_white_pawn_en_passant == (state[:, 0, 0, -1] == 1))):
+            raise ValueError('The player whose turn it is also has an en passant pawn!')
 
         return state
 
+    @staticmethod
+    def raise_on_invalid_square(invalid, is_white, message):
+        if np.any(invalid):
+            p, i, j = np.argwhere(invalid)[0]
+            raise ValueError(f'{message} i = {i}, j = {j}, is_white = {is_white[p, i, j]}')
+
     @classmethod
     def encode_move_bytes(cls, move_data, outcome, terminal_distance):
         """
@@ -307,6 +410,9 @@ class Chess(Game):
 
     @classmethod
     def ask_user_for_promotion(cls):
+        # Note: easygui is imported within this function because it is slow to import and only needed for the UI
+        import easygui
+
         promotion = easygui.choicebox('Pick a piece to promote to', 'Promotion Picker',
                                       choices=['Queen', 'Rook', 'Bishop', 'Knight'])
         if promotion is None:
@@ -540,7 +646,7 @@ class Chess(Game):
         return moves
 
     @classmethod
-    @cached(cache=LRUCache(maxsize=256), key=lambda cls, state: cls.zobrist_hash(state))
+    @lru_cached(maxsize=256, key=lambda cls, state: cls.zobrist_hash(state))
     def get_possible_moves(cls, state):
         """
         This function is wrapped in a cache that tracks the result for the most recently used state parameter.
@@ -747,6 +853,11 @@ class Chess(Game):
     def heuristic(cls, state):
         return np.sum(np.dot(state, [100, 9, 5, 3.25, 3, 1, -100, -9, -5, -3.25, -3, -1, 0, 0]))
 
+    @classmethod
+    def get_captures(cls, state, moves):
+        # promotions keep the number of pieces the same, so only captures reduce it
+        return np.sum(moves[..., :12], axis=(1, 2, 3)) < np.sum(state[..., :12])
+
     @classmethod
     def zobrist_hash(cls, state):
         return reduce(lambda b1, b2: b1 ^ b2, cls.ZOBRIST_CONSTANTS[state == 1],
@@ -1,4 +1,4 @@
-from perfect_information_game.games import Game
+from perfect_information_game.games import Game, StateTransform
 import numpy as np
 from perfect_information_game.utils import iter_product
 
@@ -14,6 +14,10 @@ class Connect4(Game):
     REPRESENTATION_LETTERS = ['y', 'r']
     REPRESENTATION_FILES = ['dark_square', 'yellow_circle_dark_square', 'red_circle_dark_square']
     CLICKS_PER_MOVE = 1
+    # flat indices of the squares in every horizontal, vertical and diagonal window of 4 squares, shape (69, 4)
+    WINDOWS = None  # defined after this class's definition
+    # weights of the playable threat, threat, two in a window, and center column terms of the heuristic
+    HEURISTIC_WEIGHTS = np.array([1, 0.3, 0.05, 0.05])
 
     def __init__(self, state=STARTING_STATE):
         super().__init__(state)
@@ -83,3 +87,57 @@ class Connect4(Game):
             return -1
         if cls.is_board_full(state):
             return 0
+
+    @classmethod
+    def heuristic(cls, state):
+        return cls.heuristic_batch(state[np.newaxis, ...])[0]
+
+    @classmethod
+    def heuristic_batch(cls, states):
+        """
+        Evaluates states by counting the pieces of each player in every window of 4 squares (equivalent to convolving
+        each player's board with a line of 4 ones in every direction). Only windows that the opponent has not
+        blocked are counted. The following terms are positive if player 1 is better off:
+        playable threats: windows with 3 pieces whose empty square can be played right now,
+        threats: windows with 3 pieces, which are open threes that will need to be blocked eventually,
+        twos: windows with 2 pieces,
+        center: pieces in the center column, which is part of the most windows.
+        The weighted sum is squashed into the range (-1, 1).
+        """
+        k = states.shape[0]
+        player_1_pieces = states[..., 0] == 1
+        player_2_pieces = states[..., 1] == 1
+        empty = ~(player_1_pieces | player_2_pieces)
+        # an empty square can be played if it is on the bottom row or the square below it is occupied
+        playable = empty & np.concatenate((~empty[:, 1:, :], np.ones((k, 1, cls.COLUMNS), dtype=bool)), axis=1)
+        playable_windows = playable.reshape(k, -1)[:, cls.WINDOWS]
+
+        terms = []
+        window_counts = [pieces.reshape(k, -1)[:, cls.WINDOWS].sum(axis=-1)
+                         for pieces in (player_1_pieces, player_2_pieces)]
+        for friendly_counts, enemy_counts in [window_counts, window_counts[::-1]]:
+            open_windows = enemy_counts == 0
+            threats = open_windows & (friendly_counts == 3)
+            terms.append([np.sum(threats & np.any(playable_windows, axis=-1), axis=-1),
+                          np.sum(threats, axis=-1),
+                          np.sum(open_windows & (friendly_counts == 2), axis=-1)])
+        terms = np.array(terms[0]) - np.array(terms[1])
+        center = np.sum(player_1_pieces[:, :, cls.COLUMNS // 2], axis=-1) - \
+            np.sum(player_2_pieces[:, :, cls.COLUMNS // 2], axis=-1)
+        return np.tanh(np.concatenate((terms, center[np.newaxis, :]), axis=0).T @ cls.HEURISTIC_WEIGHTS)
+
+    @classmethod
+    def get_symmetry_transforms(cls):
+        # gravity breaks vertical symmetry, so the only non-trivial symmetry is a left-right mirror
+        return [StateTransform.identity(cls), StateTransform(cls, flip_j=True)]
+
+    @classmethod
+    def flip_policy_j(cls, policy):
+        return np.flip(policy, axis=0)
+
+
+# need to define this after the Connect4 class is created so that we can use the class constants
+Connect4.WINDOWS = np.array([[(i + k * di) * Connect4.COLUMNS + j + k * dj for k in range(4)]
+                             for di, dj in [(0, 1), (1, 0), (1, 1), (1, -1)]
+                             for i, j in iter_product(Connect4.BOARD_SHAPE)
+                             if 0 <= i + 3 * di < Connect4.ROWS and 0 <= j + 3 * dj < Connect4.COLUMNS])
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 import numpy as np
-from typing import Optional, Sequence, Tuple, Literal, Union, Any
+from typing import Optional, Sequence, Tuple, Literal, Union, Any, List, Iterator
+from perfect_information_game.games.state_transform import StateTransform
 
 
 # noinspection PyUnresolvedReferences
@@ -74,6 +75,14 @@ class Game(ABC):
     def is_player_1_turn(cls, state: np.ndarray) -> bool:
         return np.all(state[..., -1])
 
+    @classmethod
+    def is_player_1_turn_batch(cls, states: np.ndarray) -> np.ndarray:
+        """
+        Checks an array of states with shape (k,) + STATE_SHAPE. The results must match is_player_1_turn.
+        Subclasses can override this with a vectorized implementation.
+        """
+        return np.array([cls.is_player_1_turn(state) for state in states], dtype=bool)
+
     @classmethod
     @abstractmethod
     def get_possible_moves(cls, state: np.ndarray) -> Sequence[np.ndarray]:
@@ -84,6 +93,14 @@ class Game(ABC):
         """
         pass
 
+    @classmethod
+    def iter_possible_moves(cls, state: np.ndarray) -> Iterator[np.ndarray]:
+        """
+        Generates the same moves as get_possible_moves, in the same order, but only creates each one when it is needed.
+        Games with many possible moves should override this with a generator (see ProgressiveWidening).
+        """
+        yield from cls.get_possible_moves(state)
+
     @classmethod
     @abstractmethod
     def get_legal_moves(cls, state: np.ndarray) -> np.ndarray:
@@ -161,6 +178,111 @@ class Game(ABC):
     def heuristic(cls, state: np.ndarray) -> float:
         raise NotImplementedError()
 
+    @classmethod
+    def heuristic_batch(cls, states: np.ndarray) -> np.ndarray:
+        """
+        Evaluates an array of states with shape (k,) + STATE_SHAPE. The results must match heuristic.
+        Subclasses can override this with a vectorized implementation.
+        """
+        return np.array([cls.heuristic(state) for state in states], dtype=float)
+
+    @classmethod
+    def get_captures(cls, state: np.ndarray, moves: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean array indicating which of the given moves (i.e. sub states of state) capture a piece.
+        Subclasses with captures should override this, it is used to prioritize captures in rollouts.
+        """
+        return np.zeros(len(moves), dtype=bool)
+
+    @classmethod
+    def get_symmetry_transforms(cls) -> List[StateTransform]:
+        """
+        Returns every StateTransform under which the rules of the game are invariant, starting with the identity.
+        Subclasses should override this to enable symmetry reduction via canonicalize.
+        """
+        return [StateTransform.identity(cls)]
+
+    @classmethod
+    def canonicalize(cls, state: np.ndarray) -> Tuple[np.ndarray, StateTransform]:
+        """
+        Finds the canonical representative of all positions that are symmetric to the given state.
+        Symmetric states are guaranteed to have the same canonical representative,
+        so it can be used as a key for sharing work between them.
+
+        :return: A tuple consisting of the canonical state and the StateTransform that maps the given state to it.
+                 Moves (i.e. states) and policies for the canonical state can be mapped back using
+                 untransform_state, untransform_policy, and untransform_distribution.
+                 Evaluations and outcomes can be mapped back using transform_outcome.
+        """
+        best_state, best_key, best_transform = None, None, None
+        for transform in cls.get_symmetry_transforms():
+            transformed_state = transform.transform_state(state)
+            key = transformed_state.tobytes()
+            if best_key is None or key < best_key:
+                best_state, best_key, best_transform = transformed_state, key, transform
+        return np.ascontiguousarray(best_state), best_transform
+
+    @classmethod
+    def flip_state_colors(cls, state: np.ndarray) -> np.ndarray:
+        """
+        Swaps the roles of player 1 and player 2 in the given state.
+        This only needs to be implemented by games that include a StateTransform with flip_colors=True in
+        get_symmetry_transforms.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def flip_policy_colors(cls, policy: np.ndarray) -> np.ndarray:
+        raise NotImplementedError()
+
+    # The following default implementations apply to games where MOVE_SHAPE == BOARD_SHAPE,
+    # i.e. where each move corresponds to a single square.
+
+    @classmethod
+    def flip_policy_i(cls, policy: np.ndarray) -> np.ndarray:
+        return np.flip(policy, axis=0)
+
+    @classmethod
+    def flip_policy_j(cls, policy: np.ndarray) -> np.ndarray:
+        return np.flip(policy, axis=1)
+
+    @classmethod
+    def flip_policy_diagonal(cls, policy: np.ndarray) -> np.ndarray:
+        return np.swapaxes(policy, 0, 1)
+
+    @classmethod
+    def pack_state(cls, state: np.ndarray) -> bytes:
+        """
+        Packs the given state into a bytes object that uses 1 bit per element, which is 8 times smaller than the
+        uint8 array. Every element of the state must be 0 or 1.
+        The result is hashable, so it can also be used as a dictionary key.
+        """
+        return np.packbits(state, axis=None).tobytes()
+
+    @classmethod
+    def unpack_state(cls, packed_state: bytes) -> np.ndarray:
+        """
+        This is the inverse of pack_state.
+        """
+        return np.unpackbits(np.frombuffer(packed_state, dtype=np.uint8),
+                             count=np.prod(cls.STATE_SHAPE)).reshape(cls.STATE_SHAPE)
+
+    @classmethod
+    def pack_states(cls, states: np.ndarray) -> np.ndarray:
+        """
+        Packs an array of states with shape (k,) + STATE_SHAPE into a uint8 array with shape (k, packed_size).
+        Row i of the result contains the same bytes as pack_state(states[i]).
+        """
+        return np.packbits(states.reshape(states.shape[0], -1), axis=-1)
+
+    @classmethod
+    def unpack_states(cls, packed_states: np.ndarray) -> np.ndarray:
+        """
+        This is the inverse of pack_states.
+        """
+        return np.unpackbits(packed_states, axis=-1,
+                             count=np.prod(cls.STATE_SHAPE)).reshape((packed_states.shape[0],) + cls.STATE_SHAPE)
+
     @classmethod
     def encode_board_bytes(cls, state: np.ndarray) -> bytes:
         """
@@ -177,6 +299,22 @@ class Game(ABC):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def encode_board_bytes_batch(cls, states: np.ndarray) -> List[bytes]:
+        """
+        Encodes an array of states with shape (k,) + STATE_SHAPE. The results must match encode_board_bytes.
+        Subclasses can override this with a vectorized implementation.
+        """
+        return [cls.encode_board_bytes(state) for state in states]
+
+    @classmethod
+    def parse_board_bytes_batch(cls, board_bytes_batch: Sequence[bytes]) -> np.ndarray:
+        """
+        Parses a sequence of bytes objects into an array of states. The results must match parse_board_bytes.
+        Subclasses can override this with a vectorized implementation.
+        """
+        return np.stack([cls.parse_board_bytes(board_bytes) for board_bytes in board_bytes_batch], axis=0)
+
     @classmethod
     def encode_move_bytes(cls, move_data: Any, outcome: Literal[-1, 0, 1],
                           # terminal_distance should be type hinted as Union[int, Literal[np.inf]],
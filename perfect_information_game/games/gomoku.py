@@ -1,4 +1,4 @@
-from perfect_information_game.games import Game
+from perfect_information_game.games import Game, StateTransform
 import numpy as np
 from perfect_information_game.utils import iter_product
 
@@ -32,13 +32,15 @@ class Gomoku(Game):
 
     @classmethod
     def get_possible_moves(cls, state):
-        moves = []
+        return list(cls.iter_possible_moves(state))
+
+    @classmethod
+    def iter_possible_moves(cls, state):
         for i, j in iter_product(Gomoku.BOARD_SHAPE):
             if np.all(state[i, j, :2] == 0):
                 move = cls.null_move(state)
                 move[i, j, :2] = [1, 0] if cls.is_player_1_turn(state) else [0, 1]
-                moves.append(move)
-        return moves
+                yield move
 
     @classmethod
     def get_legal_moves(cls, state):
@@ -68,6 +70,10 @@ class Gomoku(Game):
 
         return False
 
+    @classmethod
+    def get_symmetry_transforms(cls):
+        return StateTransform.dihedral_group(cls)
+
     @classmethod
     def get_ruleset(cls):
         return f'{Gomoku.W}x{Gomoku.W}({Gomoku.K}-in-a-row)'
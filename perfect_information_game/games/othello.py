@@ -1,4 +1,4 @@
-from perfect_information_game.games import Game
+from perfect_information_game.games import Game, StateTransform
 import numpy as np
 from perfect_information_game.utils import iter_product, DIRECTIONS_8
 
@@ -23,6 +23,14 @@ class Othello(Game):
     REPRESENTATION_LETTERS = ['b', 'w']
     REPRESENTATION_FILES = ['dark_square', 'black_circle_dark_square', 'white_circle_dark_square']
     CLICKS_PER_MOVE = 1
+    CORNERS = np.zeros(BOARD_SHAPE, dtype=bool)
+    CORNERS[[0, 0, -1, -1], [0, -1, 0, -1]] = True
+    EDGES = np.zeros(BOARD_SHAPE, dtype=bool)
+    EDGES[[0, -1], :] = True
+    EDGES[:, [0, -1]] = True
+    EDGES[CORNERS] = False
+    # weights of the mobility, corner, edge, frontier and disc terms of the heuristic
+    HEURISTIC_WEIGHTS = np.array([1, 2, 0.5, 0.5, 0.25])
 
     def __init__(self, state=STARTING_STATE):
         super().__init__(state)
@@ -153,3 +161,87 @@ class Othello(Game):
         if player_2_points > player_1_points:
             return -1
         return 0
+
+    @classmethod
+    def heuristic(cls, state):
+        return cls.heuristic_batch(state[np.newaxis, ...])[0]
+
+    @classmethod
+    def heuristic_batch(cls, states):
+        """
+        Evaluates states using a weighted sum of the following terms (each is positive if player 1 is better off),
+        squashed into the range (-1, 1):
+        mobility: relative number of legal moves,
+        corners and edges: difference in the number of stable squares occupied,
+        frontier: relative number of discs adjacent to an empty square (fewer is better),
+        discs: relative number of discs.
+        """
+        k = states.shape[0]
+        player_1_discs = states[..., 0] == 1
+        player_2_discs = states[..., 1] == 1
+        empty = ~(player_1_discs | player_2_discs)
+
+        def relative_difference(counts):
+            return (counts[:k] - counts[k:]) / (counts[:k] + counts[k:] + 1)
+
+        def count(squares, mask=None):
+            return np.sum(squares if mask is None else squares & mask, axis=(1, 2))
+
+        padded_empty = cls.pad_boards(empty, 1)
+        empty_neighbours = np.zeros_like(empty)
+        for di, dj in DIRECTIONS_8:
+            empty_neighbours |= cls.get_neighbours(padded_empty, 1, di, dj)
+
+        # stack the players so that each term is computed for both of them at once
+        discs = np.concatenate((player_1_discs, player_2_discs), axis=0)
+        enemy_discs = np.concatenate((player_2_discs, player_1_discs), axis=0)
+        terms = np.stack([
+            relative_difference(count(cls.get_legal_moves_batch(discs, enemy_discs))),
+            (count(discs, cls.CORNERS)[:k] - count(discs, cls.CORNERS)[k:]) / np.sum(cls.CORNERS),
+            (count(discs, cls.EDGES)[:k] - count(discs, cls.EDGES)[k:]) / np.sum(cls.EDGES),
+            -relative_difference(count(discs, np.concatenate((empty_neighbours, empty_neighbours), axis=0))),
+            relative_difference(count(discs)),
+        ], axis=-1)
+        return np.tanh(terms @ cls.HEURISTIC_WEIGHTS)
+
+    @classmethod
+    def get_legal_moves_batch(cls, friendly_discs, enemy_discs):
+        """
+        Finds the legal moves for the player with friendly_discs in every board at once.
+
+        :param friendly_discs: A boolean array with shape (k, 8, 8).
+        :param enemy_discs: A boolean array with shape (k, 8, 8).
+        :return: A boolean array with shape (k, 8, 8) which is True for every square that is a legal move.
+        """
+        pad = max(cls.ROWS, cls.COLUMNS) - 1
+        padded_friendly_discs = cls.pad_boards(friendly_discs, pad)
+        padded_enemy_discs = cls.pad_boards(enemy_discs, pad)
+
+        legal_moves = np.zeros_like(friendly_discs)
+        for di, dj in DIRECTIONS_8:
+            # walk away from every square, tracking whether all squares so far have contained enemy discs
+            line = cls.get_neighbours(padded_enemy_discs, pad, di, dj)
+            for distance in range(2, pad + 1):
+                legal_moves |= line & cls.get_neighbours(padded_friendly_discs, pad, distance * di, distance * dj)
+                line = line & cls.get_neighbours(padded_enemy_discs, pad, distance * di, distance * dj)
+        return legal_moves & ~(friendly_discs | enemy_discs)
+
+    @staticmethod
+    def pad_boards(boards, pad):
+        """
+        Surrounds an array of boards with shape (k, rows, columns) with pad empty squares on every side.
+        """
+        padded_boards = np.zeros((boards.shape[0], boards.shape[1] + 2 * pad, boards.shape[2] + 2 * pad), dtype=bool)
+        padded_boards[:, pad:-pad, pad:-pad] = boards
+        return padded_boards
+
+    @classmethod
+    def get_neighbours(cls, padded_boards, pad, di, dj):
+        """
+        Returns a view of the padded boards that contains the square at (i + di, j + dj) at index (i, j).
+        """
+        return padded_boards[:, pad + di:pad + di + cls.ROWS, pad + dj:pad + dj + cls.COLUMNS]
+
+    @classmethod
+    def get_symmetry_transforms(cls):
+        return StateTransform.dihedral_group(cls)
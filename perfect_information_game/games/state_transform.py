@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class StateTransform:
+    """
+    A symmetry of a game's rules, composed of up to four involutions which are applied in the following order:
+    swapping the players (flip_colors), flipping the rows (flip_i), flipping the columns (flip_j),
+    and reflecting across the main diagonal (flip_diagonal).
+    Together flip_i, flip_j, and flip_diagonal generate all 8 symmetries of a square board.
+
+    The geometric flips act on the first two axes of states. How each flip acts on policies (arrays with shape
+    GameClass.MOVE_SHAPE) and how swapping the players acts on states is defined by the flip_policy_* and
+    flip_state_colors class methods of the game.
+    """
+
+    def __init__(self, GameClass, flip_colors=False, flip_i=False, flip_j=False, flip_diagonal=False):
+        self.GameClass = GameClass
+        self.flip_colors = flip_colors
+        self.flip_i = flip_i
+        self.flip_j = flip_j
+        self.flip_diagonal = flip_diagonal
+
+    @staticmethod
+    def identity(GameClass):
+        return StateTransform(GameClass)
+
+    @staticmethod
+    def dihedral_group(GameClass):
+        """
+        Returns all 8 symmetries of a square board, starting with the identity.
+        """
+        return [StateTransform(GameClass, flip_i=flip_i, flip_j=flip_j, flip_diagonal=flip_diagonal)
+                for flip_diagonal in (False, True) for flip_i in (False, True) for flip_j in (False, True)]
+
+    def is_identity(self):
+        return not self.flip_colors and not self.flip_i and not self.flip_j and not self.flip_diagonal
+
+    def get_flips(self):
+        return [flip for flip, enabled in [('colors', self.flip_colors), ('i', self.flip_i), ('j', self.flip_j),
+                                           ('diagonal', self.flip_diagonal)] if enabled]
+
+    def transform_state(self, state):
+        for flip in self.get_flips():
+            state = self.flip_state(state, flip)
+        return state
+
+    def untransform_state(self, state):
+        # since all flips are their own inverses, we can just run through them in reverse
+        for flip in reversed(self.get_flips()):
+            state = self.flip_state(state, flip)
+        return state
+
+    def transform_policy(self, policy):
+        """
+        :param policy: An array with shape GameClass.MOVE_SHAPE.
+        """
+        for flip in self.get_flips():
+            policy = self.flip_policy(policy, flip)
+        return policy
+
+    def untransform_policy(self, policy):
+        for flip in reversed(self.get_flips()):
+            policy = self.flip_policy(policy, flip)
+        return policy
+
+    def untransform_distribution(self, transformed_state, distribution):
+        """
+        Maps a distribution over the legal moves of transformed_state (ordered like GameClass.get_legal_moves,
+        as returned by Network.call or AbstractNode.choose_best_node) to the corresponding distribution over the
+        legal moves of the untransformed state.
+        """
+        legal_moves = self.GameClass.get_legal_moves(transformed_state)
+        if self.is_identity() or not np.any(legal_moves):
+            # the only possible move is a pass, which is mapped to itself
+            return distribution
+
+        policy = np.zeros(legal_moves.shape, dtype=float)
+        policy[legal_moves] = distribution
+        state = self.untransform_state(transformed_state)
+        return self.untransform_policy(policy)[self.GameClass.get_legal_moves(state)]
+
+    def transform_outcome(self, outcome):
+        return -outcome if self.flip_colors else outcome
+
+    def flip_state(self, state, flip):
+        if flip == 'colors':
+            return self.GameClass.flip_state_colors(state)
+        if flip == 'i':
+            return np.flip(state, axis=0)
+        if flip == 'j':
+            return np.flip(state, axis=1)
+        if flip == 'diagonal':
+            return np.swapaxes(state, 0, 1)
+        raise ValueError(f'Unknown flip: {flip}')
+
+    def flip_policy(self, policy, flip):
+        if flip == 'colors':
+            return self.GameClass.flip_policy_colors(policy)
+        if flip == 'i':
+            return self.GameClass.flip_policy_i(policy)
+        if flip == 'j':
+            return self.GameClass.flip_policy_j(policy)
+        if flip == 'diagonal':
+            return self.GameClass.flip_policy_diagonal(policy)
+        raise ValueError(f'Unknown flip: {flip}')
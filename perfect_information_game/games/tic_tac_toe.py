@@ -1,4 +1,4 @@
-from perfect_information_game.games import Game, InvalidMoveException
+from perfect_information_game.games import Game, InvalidMoveException, StateTransform
 import numpy as np
 from perfect_information_game.utils import iter_product
 
@@ -66,6 +66,10 @@ class TicTacToe(Game):
         flipped_pieces = np.fliplr(pieces)
         return np.all(np.diag(pieces)) or np.all(np.diag(flipped_pieces))
 
+    @classmethod
+    def get_symmetry_transforms(cls):
+        return StateTransform.dihedral_group(cls)
+
     @classmethod
     def get_ruleset(cls):
         return f'{TicTacToe.W}x{TicTacToe.W}'
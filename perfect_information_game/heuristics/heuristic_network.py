@@ -0,0 +1,34 @@
+import numpy as np
+from perfect_information_game.heuristics import Network
+
+
+class HeuristicNetwork(Network):
+    """
+    A stand-in for a trained Network that evaluates positions using GameClass.heuristic_batch and returns a uniform
+    policy. This allows HeuristicNode based searches to run without keras or a trained model.
+    """
+
+    def __init__(self, GameClass):
+        super().__init__(GameClass)
+        self.evaluated_positions = 0
+
+    def initialize(self):
+        pass
+
+    def predict(self, states):
+        self.evaluated_positions += states.shape[0]
+        policies = np.ones((states.shape[0],) + self.GameClass.MOVE_SHAPE)
+        return policies, self.GameClass.heuristic_batch(states)
+
+    def create_model(self, kernel_size=(4, 4), convolutional_filters=64, residual_layers=6,
+                     value_head_neurons=16, policy_loss_value=1):
+        raise NotImplementedError('HeuristicNetwork does not support this operation!')
+
+    def train(self, data, validation_fraction=0.2):
+        raise NotImplementedError('HeuristicNetwork does not support this operation!')
+
+    def save(self, model_path):
+        raise NotImplementedError('HeuristicNetwork does not support this operation!')
+
+    def equal_model_architecture(self, network):
+        raise NotImplementedError('HeuristicNetwork does not support this operation!')
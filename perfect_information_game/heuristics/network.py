@@ -176,6 +176,7 @@ class Network:
 
         :param GameClass:
         :param data: A list of game, outcome tuples. Each game is a list of position, distribution tuples.
+                     Positions may also be bit-packed using GameClass.pack_state.
         :param one_hot:
         :param shuffle:
         :return:
@@ -186,6 +187,8 @@ class Network:
 
         for game, outcome in data:
             for position, distribution in game:
+                if type(position) is bytes:
+                    position = GameClass.unpack_state(position)
                 legal_moves = GameClass.get_legal_moves(position)
                 policy = np.zeros_like(legal_moves, dtype=float)
                 policy[legal_moves] = distribution
@@ -4,7 +4,7 @@ from time import time
 from multiprocessing import Process, Queue, Event
 import numpy as np
 from perfect_information_game.move_selection.mcts import RolloutNode
-from perfect_information_game.move_selection.mcts import HeuristicNode
+from perfect_information_game.move_selection.mcts import BatchedSearcher
 from perfect_information_game.heuristics import Network
 from perfect_information_game.heuristics import spawn_training_process
 from perfect_information_game.utils import get_training_path
@@ -12,10 +12,18 @@ from perfect_information_game.utils import get_training_path
 
 class SelfPlayReinforcementLearning:
     def __init__(self, GameClass, model_path, threads=14, game_batch_size=6, expansions_per_move=500,
-                 c=np.sqrt(2), d=1, replay_buffer_size=1000):
+                 c=np.sqrt(2), d=1, replay_buffer_size=1000, array_tree=False, evaluate_on_visit=False,
+                 gumbel_search=None):
         """
         If network is None, then self play will be done using random MCTS rollouts and saved to
         {get_training_path(GameClass)}/games/reinforcement_learning_games/
+
+        :param array_tree: If True, the workers will store their search trees in ArrayTrees.
+        :param evaluate_on_visit: If True, the network will only evaluate nodes when they are expanded,
+                                  instead of evaluating all of their children (see HeuristicNode).
+        :param gumbel_search: If a GumbelSearch is given, then the children of each root are chosen by sequential
+                              halving with a budget of expansions_per_move simulations, and the improved policy of
+                              the search is used as the training target instead of the visit distribution.
         """
         path = f'{get_training_path(GameClass)}/games/reinforcement_learning_games'
         self.network_process, network_proxies, network_training_data_pipe = \
@@ -29,7 +37,8 @@ class SelfPlayReinforcementLearning:
         worker_training_data_queue = Queue()
         self.worker_processes = [Process(target=SelfPlayReinforcementLearning.game_batch_simulation_worker,
                                          args=(GameClass, worker_training_data_queue, network_proxy, path,
-                                               expansions_per_move, game_batch_size, c, d))
+                                               expansions_per_move, game_batch_size, c, d, array_tree,
+                                               evaluate_on_visit, gumbel_search))
                                  for network_proxy in network_proxies]
 
         self.replay_buffer_process = Process(target=SelfPlayReinforcementLearning.replay_buffer_process_loop,
@@ -62,80 +71,62 @@ class SelfPlayReinforcementLearning:
 
     @staticmethod
     def game_batch_simulation_worker(GameClass, response_queue, network, path,
-                                     expansions_per_move, game_batch_size, c, d):
+                                     expansions_per_move, game_batch_size, c, d, array_tree=False,
+                                     evaluate_on_visit=False, gumbel_search=None):
         """
         Simulates several games in series, and aggregates and batches all their network call requests.
         """
         network.initialize()
         training_data_sets = [[] for _ in range(game_batch_size)]
         starting_policy, starting_evaluation = network.call(GameClass.STARTING_STATE[np.newaxis, ...])[0]
-        roots = [HeuristicNode(GameClass.STARTING_STATE, parent=None, GameClass=GameClass, network=None, c=c, d=d,
-                               network_call_results=(np.copy(starting_policy), starting_evaluation))
-                 for _ in range(game_batch_size)]
+
+        searcher = BatchedSearcher(GameClass, network, expansions_per_move, c, d, array_tree=array_tree,
+                                   evaluate_on_visit=evaluate_on_visit, gumbel_search=gumbel_search)
+        for _ in range(game_batch_size):
+            searcher.add_tree(GameClass.STARTING_STATE, (np.copy(starting_policy), starting_evaluation))
+
+        def finish_game(i, root):
+            game = (training_data_sets[i], GameClass.get_winner(root.position))
+            with open(f'{path}/game_{time()}.pickle', 'wb') as fout:
+                pickle.dump(game, fout)
+            response_queue.put(network.get_training_data(GameClass, [game], shuffle=False))
+            training_data_sets[i] = []
+            searcher.reset_tree(i, GameClass.STARTING_STATE, (np.copy(starting_policy), starting_evaluation))
 
         while True:
-            best_nodes = []
             for i in range(game_batch_size):
-                root = roots[i]
-                if root.count_expansions() >= expansions_per_move:
+                if searcher.is_search_finished(i):
+                    root = searcher.get_root(i)
+                    best_node, distribution = searcher.choose_best_node(i)
+                    training_data_sets[i].append((GameClass.pack_state(root.position), distribution))
+                    searcher.set_root(i, best_node)
+
+                    # practically speaking this will never happen
+                    if GameClass.is_over(best_node.position):
+                        finish_game(i, best_node)
+
+            # the leaves of all game_batch_size games are evaluated in a single network call
+            for i in searcher.step():
+                # the outcome of this game is known, so play it out using the proven moves
+                root = searcher.get_root(i)
+                while root.children is not None:
                     best_node, distribution = root.choose_best_node(return_probability_distribution=True)
-                    training_data_sets[i].append((root.position, distribution))
+                    training_data_sets[i].append((GameClass.pack_state(root.position), distribution))
                     root = best_node
                     root.parent = None
-
-                    # practically speaking this will never happen
-                    if GameClass.is_over(root.position):
-                        game = (training_data_sets[i], GameClass.get_winner(root.position))
-                        with open(f'{path}/game_{time()}.pickle', 'wb') as fout:
-                            pickle.dump(game, fout)
-                        response_queue.put(network.get_training_data(GameClass, [game], shuffle=False))
-
-                        training_data_sets[i] = []
-                        root = HeuristicNode(GameClass.STARTING_STATE, parent=None, GameClass=GameClass, network=None,
-                                             c=c, d=d,
-                                             network_call_results=(np.copy(starting_policy), starting_evaluation))
-
-                    roots[i] = root
-
-                best_node = root.choose_expansion_node()
-                if best_node is None:
-                    while root.children is not None:
-                        best_node, distribution = root.choose_best_node(return_probability_distribution=True)
-                        training_data_sets[i].append((root.position, distribution))
-                        root = best_node
-                        root.parent = None
-                    game = (training_data_sets[i], GameClass.get_winner(root.position))
-                    with open(f'{path}/game_{time()}.pickle', 'wb') as fout:
-                        pickle.dump(game, fout)
-                    response_queue.put(network.get_training_data(GameClass, [game], shuffle=False))
-                    training_data_sets[i] = []
-                    root = HeuristicNode(GameClass.STARTING_STATE, parent=None, GameClass=GameClass, network=None,
-                                         c=c, d=d, network_call_results=(np.copy(starting_policy), starting_evaluation))
-                    roots[i] = root
-                    best_node = root.choose_expansion_node()
-                best_nodes.append(best_node)
-
-            # batch evaluations for all possible moves for the best_node in all game_batch_size games
-            best_nodes_moves = [GameClass.get_possible_moves(best_node.position) for best_node in best_nodes]
-            network_call_results_batch = network.call(np.stack([position for moves in best_nodes_moves
-                                                                for position in moves], axis=0))
-
-            # un-batch network call results, and tell each best_node to expand with its respective network call results
-            pos = 0
-            for best_node, moves in zip(best_nodes, best_nodes_moves):
-                new_pos = pos + len(moves)
-                network_call_results = network_call_results_batch[pos:new_pos]
-                best_node.expand(moves, network_call_results)
-                pos = new_pos
+                finish_game(i, root)
 
     @staticmethod
     def replay_buffer_process_loop(GameClass, training_game_queue, network_training_pipe, path, replay_buffer_size,
                                    batch_size=256):
         (states, (policies, values)), game_lengths = SelfPlayReinforcementLearning.load_games(
             GameClass, path, replay_buffer_size)
+        # the buffer stores bit-packed states, which are only unpacked for the sampled training batch
+        states = GameClass.pack_states(states)
 
         while True:
             new_states, (new_policies, new_values) = training_game_queue.get()
+            new_states = GameClass.pack_states(new_states)
             new_game_length = new_states.shape[0]
 
             if len(game_lengths) < replay_buffer_size:
@@ -157,7 +148,8 @@ class SelfPlayReinforcementLearning:
             indices = np.random.choice(np.arange(states.shape[0]), batch_size,
                                        replace=False, p=probability_distribution)
             print('Starting Training step')
-            network_training_pipe.send((states[indices, ...], policies[indices, ...], values[indices]))
+            network_training_pipe.send((GameClass.unpack_states(states[indices, ...]), policies[indices, ...],
+                                        values[indices]))
 
     @staticmethod
     def load_games(GameClass, path, count=1000):
@@ -209,7 +201,8 @@ class MCTSRolloutGameGenerator:
 
     @staticmethod
     def simulate_games_worker_process(GameClass, termination_event, path, expansions_per_move, c):
-        # format for each game file: ([(position, [pi_0, pi_1, ...]), ...], result)
+        # format for each game file: ([(packed_position, [pi_0, pi_1, ...]), ...], result)
+        # positions are stored using GameClass.pack_state
         while not termination_event.is_set():
             training_data = []
 
@@ -226,7 +219,7 @@ class MCTSRolloutGameGenerator:
                     best_node.expand()
 
                 best_node, distribution = root.choose_best_node(return_probability_distribution=True)
-                training_data.append((root.position, distribution))
+                training_data.append((GameClass.pack_state(root.position), distribution))
                 root = best_node
                 root.parent = None
 
@@ -1,7 +1,6 @@
 import json
 # noinspection PyUnresolvedReferences
 import numpy as np  # used in eval
-import easygui
 from perfect_information_game.heuristics import train_from_scratch
 from perfect_information_game.learning import SelfPlayReinforcementLearning, MCTSRolloutGameGenerator
 from perfect_information_game.utils import get_training_path
@@ -18,6 +17,9 @@ def parse_float(value):
 
 
 def launch_trainer(GameClass, trainer):
+    # Note: easygui is imported within this function because it is slow to import
+    import easygui
+
     trainer.start()
 
     text = easygui.enterbox('End Training? Timeout (seconds):', title=f'{GameClass.__name__} Training', default='120')
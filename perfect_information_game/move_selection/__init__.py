@@ -1,4 +1,6 @@
+from perfect_information_game.move_selection.search_statistics import SearchStatistics
 from perfect_information_game.move_selection.move_chooser import MoveChooser
+from perfect_information_game.move_selection.position_mailbox import PositionMailbox
 from perfect_information_game.move_selection.mini_max import MiniMax
 from perfect_information_game.move_selection.random_chooser import RandomMoveChooser
 from perfect_information_game.move_selection.raw_network import RawNetwork
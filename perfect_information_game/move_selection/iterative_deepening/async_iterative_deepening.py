@@ -1,21 +1,28 @@
 import numpy as np
-from time import time, sleep
-from multiprocessing import Pipe
-from multiprocessing.context import Process
+from time import sleep
 from perfect_information_game.move_selection import MoveChooser
+from perfect_information_game.move_selection import SearchStatistics
+from perfect_information_game.move_selection import PositionMailbox
 from perfect_information_game.move_selection.iterative_deepening import DeepeningNode
 
 
 class AsyncIterativeDeepening(MoveChooser):
-    def __init__(self, GameClass, starting_position=None, time_limit=3):
+    def __init__(self, GameClass, starting_position=None, time_limit=3, pack_states=False):
         super().__init__(GameClass, starting_position)
         self.root = DeepeningNode(GameClass, starting_position)
         self.time_limit = time_limit
 
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pipe, Process
+
+        # the worker publishes its current best move after each deepening step in the mailbox,
+        # and the chosen moves are sent to it as packed states through the pipe
+        self.mailbox = PositionMailbox(GameClass, max_positions=1)
         self.parent_pipe, worker_pipe = Pipe()
         self.worker_process = Process(target=self.loop_func,
-                                      args=(GameClass, starting_position, worker_pipe))
-        self.receipt_backlog = 0
+                                      args=(GameClass, starting_position, worker_pipe, self.mailbox, pack_states))
+        # the number of moves that have been sent to the worker
+        self.moves = 0
 
     def start(self):
         self.worker_process.start()
@@ -23,17 +30,23 @@ class AsyncIterativeDeepening(MoveChooser):
     def terminate(self):
         self.worker_process.terminate()
         self.worker_process.join()
+        self.mailbox.close()
 
     @staticmethod
-    def loop_func(GameClass, starting_position, worker_pipe):
-        root = DeepeningNode(GameClass, starting_position)
+    def loop_func(GameClass, starting_position, worker_pipe, mailbox, pack_states=False):
+        root = DeepeningNode(GameClass, starting_position, pack_state=pack_states)
+        # the statistics cover the search since the root was last advanced
+        search_statistics = SearchStatistics(AsyncIterativeDeepening.__name__)
+        # the number of moves that have been received, which tags the results so the parent can ignore outdated ones
+        moves = 0
         while True:
-            root.deepen()
+            with search_statistics.timer('backup'):
+                root.deepen(search_statistics=search_statistics)
             print(root.get_depth())
-            worker_pipe.send(root.children[0].state)
+            mailbox.write([root.children[0].state], info=search_statistics.finish(), tag=moves)
 
             while worker_pipe.poll():
-                chosen_position = worker_pipe.recv()
+                chosen_position = GameClass.unpack_state(worker_pipe.recv())
                 if root.children is None:
                     root.deepen()
 
@@ -43,12 +56,13 @@ class AsyncIterativeDeepening(MoveChooser):
                         break
                 else:
                     raise ValueError('Invalid move!')
-                worker_pipe.send(None)  # send acknowledgement receipt
+                moves += 1
+                search_statistics.start()
 
     def report_user_move(self, user_chosen_position):
         # notify process that position was chosen
-        self.parent_pipe.send(user_chosen_position)
-        self.receipt_backlog += 1
+        self.parent_pipe.send(self.GameClass.pack_state(user_chosen_position))
+        self.moves += 1
         self.position = user_chosen_position
 
     def reset(self):
@@ -58,22 +72,15 @@ class AsyncIterativeDeepening(MoveChooser):
         if return_distribution:
             raise NotImplementedError
 
-        start_time = time()
-        while self.receipt_backlog > 0:
-            while self.parent_pipe.recv() is not None:
-                pass
-            self.receipt_backlog -= 1
-
-        remaining_time = self.time_limit - (time() - start_time)
-        if remaining_time > 0:
-            sleep(remaining_time)
-
-        self.position = self.parent_pipe.recv()
-        while self.parent_pipe.poll():
-            self.position = self.parent_pipe.recv()
+        sleep(self.time_limit)
+        # only the latest result is read, and if the worker hasn't finished deepening the current position yet,
+        # then it is waited for
+        _, (self.position,), _, stats = self.mailbox.wait(self.moves)
+        # the search was done by the worker process
+        self.search_statistics.finish(stats)
 
         # notify process that position was chosen
-        self.parent_pipe.send(self.position)
-        self.receipt_backlog += 1
+        self.parent_pipe.send(self.GameClass.pack_state(self.position))
+        self.moves += 1
 
         return [self.position]
@@ -1,15 +1,22 @@
 import numpy as np
+from time import time
 
 
 class DeepeningNode:
-    def __init__(self, GameClass, state, heuristic_func=None):
+    def __init__(self, GameClass, state, heuristic_func=None, pack_state=False):
+        """
+        :param pack_state: If True, the state will be stored using GameClass.pack_state and unpacked whenever it is
+                           accessed. This makes deep trees take up much less memory.
+        """
         if state is None:
             state = GameClass.STARTING_STATE
         if heuristic_func is None:
             heuristic_func = GameClass.heuristic
 
         self.GameClass = GameClass
-        self.state = state
+        self.pack_state = pack_state
+        self.packed_state = GameClass.pack_state(state) if pack_state else None
+        self.unpacked_state = None if pack_state else state
         self.heuristic_func = heuristic_func
         self.is_maximizing = GameClass.is_player_1_turn(state)
         if GameClass.is_over(state):
@@ -21,17 +28,35 @@ class DeepeningNode:
             self.terminal = False
         self.children = None
 
+    @property
+    def state(self):
+        return self.GameClass.unpack_state(self.packed_state) if self.pack_state else self.unpacked_state
+
     def sort_children(self):
-        self.children = sorted(self.children, key=lambda move: move.heuristic, reverse=self.is_maximizing)
+        self.children = sorted(self.children, key=lambda move: move.heuristic, reverse=bool(self.is_maximizing))
 
-    def deepen(self, value_to_beat=None):
+    def deepen(self, value_to_beat=None, search_statistics=None, depth=0):
+        """
+        :param search_statistics: An optional SearchStatistics, to which the new nodes, the time spent generating
+                                  moves and evaluating positions, and the alpha-beta cutoffs are added.
+                                  Callers can time each deepening step as backup, which then excludes those times.
+        :param depth: The number of moves from the root of the search to this node.
+        """
         if self.terminal:
             return self.heuristic
 
         if self.children is None:
             # this is currently a leaf node, so deepen one final layer, then return
+            start_time = time()
             moves = self.GameClass.get_possible_moves(self.state)
-            self.children = [DeepeningNode(self.GameClass, move, self.heuristic_func) for move in moves]
+            move_generation_end_time = time()
+            self.children = [DeepeningNode(self.GameClass, move, self.heuristic_func, self.pack_state)
+                             for move in moves]
+            if search_statistics is not None:
+                search_statistics.add_time('move_generation', move_generation_end_time - start_time)
+                search_statistics.add_time('evaluation', time() - move_generation_end_time)
+                for _ in moves:
+                    search_statistics.add_node(depth + 1)
             self.sort_children()
             self.heuristic = self.children[0].heuristic
             return self.heuristic
@@ -40,17 +65,21 @@ class DeepeningNode:
         if value_to_beat is None:
             value_to_beat = -best_heuristic
         for child in self.children:
-            heuristic = child.deepen(value_to_beat=best_heuristic)
+            heuristic = child.deepen(best_heuristic, search_statistics, depth + 1)
 
             if self.is_maximizing and heuristic > best_heuristic:
                 if heuristic > value_to_beat:
                     # prune
+                    if search_statistics is not None:
+                        search_statistics.add_count('cutoffs')
                     self.sort_children()
                     return heuristic
                 best_heuristic = heuristic
             if not self.is_maximizing and heuristic < best_heuristic:
                 if heuristic < value_to_beat:
                     # prune
+                    if search_statistics is not None:
+                        search_statistics.add_count('cutoffs')
                     self.sort_children()
                     return heuristic
                 best_heuristic = heuristic
@@ -4,9 +4,10 @@ from perfect_information_game.move_selection.iterative_deepening import Deepenin
 
 
 class IterativeDeepening(MoveChooser):
-    def __init__(self, GameClass, starting_position=None, depth=3):
+    def __init__(self, GameClass, starting_position=None, depth=3, pack_states=False):
         super().__init__(GameClass, starting_position)
-        self.root = DeepeningNode(GameClass, starting_position)
+        self.pack_states = pack_states
+        self.root = DeepeningNode(GameClass, starting_position, pack_state=pack_states)
         self.depth = depth
 
     def report_user_move(self, user_chosen_position):
@@ -26,7 +27,7 @@ class IterativeDeepening(MoveChooser):
 
     def reset(self):
         super().reset()
-        self.root = DeepeningNode(self.GameClass, self.position)
+        self.root = DeepeningNode(self.GameClass, self.position, pack_state=self.pack_states)
 
     def choose_move(self, return_distribution=False):
         if return_distribution:
@@ -35,9 +36,12 @@ class IterativeDeepening(MoveChooser):
         if self.root.terminal:
             raise ValueError('Game is over!')
 
+        self.search_statistics.start()
         while self.root.get_depth() < self.depth:
-            self.root.deepen()
+            with self.search_statistics.timer('backup'):
+                self.root.deepen(search_statistics=self.search_statistics)
             print(self.root.get_depth())
 
         self.root = self.root.children[0]
+        self.search_statistics.finish()
         return [self.root.state]
@@ -1,5 +1,18 @@
+from perfect_information_game.move_selection.mcts.transposition_table import TranspositionTable
+from perfect_information_game.move_selection.mcts.node_budget import NodeBudget
+from perfect_information_game.move_selection.mcts.time_manager import TimeManager
+from perfect_information_game.move_selection.mcts.tree_file import TreeFile
+from perfect_information_game.move_selection.mcts.tablebase_probe import TablebaseProbe
+from perfect_information_game.move_selection.mcts.rollout_policy import RolloutPolicy
+from perfect_information_game.move_selection.mcts.progressive_widening import ProgressiveWidening, LazyMoves
+from perfect_information_game.move_selection.mcts.gumbel_search import GumbelSearch
+from perfect_information_game.move_selection.mcts.rollout_pool import RolloutPool
 from perfect_information_game.move_selection.mcts.abstract_node import AbstractNode
 from perfect_information_game.move_selection.mcts.rollout_node import RolloutNode
 from perfect_information_game.move_selection.mcts.heuristic_node import HeuristicNode
+from perfect_information_game.move_selection.mcts.array_tree import ArrayTree, ArrayNode
+from perfect_information_game.move_selection.mcts.batched_searcher import BatchedSearcher
+from perfect_information_game.move_selection.mcts.root_parallel import RootParallelSearch
 from perfect_information_game.move_selection.mcts.mcts import MCTS
 from perfect_information_game.move_selection.mcts.async_mcts import AsyncMCTS
+from perfect_information_game.move_selection.mcts.tree_parallel import SharedArrayTree, TreeParallelMCTS
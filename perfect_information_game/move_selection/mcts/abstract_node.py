@@ -1,17 +1,81 @@
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+import sys
 import numpy as np
+from perfect_information_game.move_selection.mcts import LazyMoves
 
 
 class AbstractNode(ABC):
-    def __init__(self, position, parent, GameClass, c=np.sqrt(2), verbose=False):
-        self.position = position
+    # a GumbelSearch that chooses the children of this node instead of PUCT, which is only ever set for the root
+    root_search = None
+
+    def __init__(self, position, parent, GameClass, c=np.sqrt(2), verbose=False, pack_position=False,
+                 transposition_table=None, tablebase_probe=None, progressive_widening=None, search_statistics=None):
+        """
+        :param pack_position: If True, the position will be stored using GameClass.pack_state and unpacked whenever
+                              it is accessed. This makes large search trees take up much less memory.
+        :param transposition_table: If a TranspositionTable is provided, then children that transpose into positions
+                                    that are already in the search tree will reuse the existing nodes.
+                                    In that case, parent refers to the parent through which this node was most recently
+                                    selected, which is the path along which results are backpropagated.
+        :param tablebase_probe: If a TablebaseProbe is provided, then positions that are found in the tablebases are
+                                fully expanded using the stored outcome and terminal distance,
+                                instead of being searched.
+        :param progressive_widening: If a ProgressiveWidening is provided, then children are added a few at a time as
+                                     this node is expanded, instead of all at once.
+        :param search_statistics: If a SearchStatistics is provided, then the time spent in each phase of expanding
+                                  nodes (e.g. move generation or network inference) is added to it.
+        """
+        self.pack_position = pack_position
+        self.packed_position = GameClass.pack_state(position) if pack_position else None
+        self.unpacked_position = None if pack_position else position
         self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.transposition_table = transposition_table
+        self.tablebase_probe = tablebase_probe
+        self.progressive_widening = progressive_widening
+        self.search_statistics = search_statistics
+        # with progressive widening, the moves that haven't been added as children yet,
+        # and the index of the move of each child in the order of GameClass.get_possible_moves
+        self.lazy_moves = None
+        self.move_indices = None
         self.GameClass = GameClass
         self.c = c
         self.fully_expanded = GameClass.is_over(position)
+        # the number of moves until the end of the game with optimal play, which is known once fully expanded
+        self.proof_depth = 0 if self.fully_expanded else None
         self.is_maximizing = GameClass.is_player_1_turn(position)
         self.children = None
         self.verbose = verbose
+        # number of selected leaves below this node that are waiting to be expanded
+        self.virtual_losses = 0
+
+    @property
+    def position(self):
+        return self.GameClass.unpack_state(self.packed_position) if self.pack_position else self.unpacked_position
+
+    def timer(self, phase):
+        """
+        :return: A context manager that adds the time spent in it to the given phase of the search statistics, if any.
+        """
+        return self.search_statistics.timer(phase) if self.search_statistics is not None else nullcontext()
+
+    def get_known_outcome(self, position):
+        """
+        Probes the tablebases for the position of a new node, which is marked as fully expanded if it is found.
+
+        :return: The outcome of the game if the node is fully expanded, otherwise None.
+        """
+        if self.fully_expanded:
+            return self.GameClass.get_winner(position)
+        if self.tablebase_probe is None:
+            return None
+        result = self.tablebase_probe.probe(position)
+        if result is None:
+            return None
+        outcome, self.proof_depth = result
+        self.fully_expanded = True
+        return outcome
 
     @abstractmethod
     def get_evaluation(self):
@@ -25,19 +89,167 @@ class AbstractNode(ABC):
     def ensure_children(self):
         pass
 
+    def get_child_priors(self):
+        """
+        :return: The prior probability of each child. Nodes without a policy give every child the same prior.
+        """
+        return np.ones(len(self.children))
+
+    def get_move_priors(self):
+        """
+        :return: The priors used to order the moves that are added by progressive widening, or None to add them in the
+                 order of GameClass.iter_possible_moves.
+        """
+        return None
+
+    def widen(self, extra_children=0):
+        """
+        Used by ensure_children when progressive widening is enabled, adds children in order of their priors
+        until this node has as many as its expansion count allows, plus extra_children.
+        The children are created with create_children, which the object node classes implement.
+
+        :return: The number of children that were added.
+        """
+        if self.children is None:
+            self.children = []
+            self.move_indices = []
+            self.lazy_moves = LazyMoves(self.GameClass, self.position, self.get_move_priors(),
+                                        self.progressive_widening.max_cached_moves)
+        limit = self.progressive_widening.get_child_limit(self.count_expansions()) + extra_children
+        moves = []
+        with self.timer('move_generation'):
+            while len(self.children) + len(moves) < limit:
+                taken = self.lazy_moves.take()
+                if taken is None:
+                    break
+                self.move_indices.append(taken[0])
+                moves.append(taken[1])
+        if len(moves) > 0:
+            self.children.extend(self.create_children(moves))
+            self.store_transpositions()
+        return len(moves)
+
     @abstractmethod
-    def get_puct_heuristic_for_child(self, i):
+    def get_children_statistics(self):
+        """
+        :return: Arrays with whether each child is fully expanded, its expansion count and its evaluation.
+                 Children without any expansions may have any (finite) evaluation.
+        """
         pass
 
     @abstractmethod
-    def expand(self):
+    def get_puct_heuristics(self, child_expansions):
         pass
 
     @abstractmethod
-    def set_fully_expanded(self, minimax_evaluation):
+    def expand(self):
         pass
 
+    def set_fully_expanded(self, minimax_evaluation, fully_expanded, evaluations):
+        """
+        Marks this node as proven to have the given minimax evaluation, and caches its proof depth.
+        Subclasses also store the evaluation in their own statistics.
+
+        :param fully_expanded: Whether each child is fully expanded, as returned by get_children_statistics.
+        :param evaluations: The evaluation of each child, as returned by get_children_statistics.
+        """
+        self.proof_depth = self.get_proof_depth(
+            self.is_maximizing, minimax_evaluation, fully_expanded, evaluations,
+            np.fromiter((-1 if child.proof_depth is None else child.proof_depth for child in self.children), int,
+                        len(self.children)))
+        self.fully_expanded = True
+
+    def count_nodes(self):
+        """
+        :return: The number of distinct nodes in the subtree of this node, including this node.
+        """
+        return len(self.get_subtree()[0])
+
+    def get_subtree(self):
+        """
+        Visits each distinct node in the subtree of this node in breadth first order
+        (nodes that are shared due to transpositions are only visited once).
+
+        :return: A list of the nodes, and for each node the minimum expansion count of its ancestors
+                 (not including this node).
+        """
+        nodes = [self]
+        path_minimums = [np.inf]
+        visited = {id(self)}
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            if node.children is not None:
+                child_minimum = np.inf if i == 0 else min(path_minimums[i], node.count_expansions())
+                for child in node.children:
+                    if id(child) not in visited:
+                        visited.add(id(child))
+                        nodes.append(child)
+                        path_minimums.append(child_minimum)
+            i += 1
+        return nodes, path_minimums
+
+    def get_nbytes_per_node(self):
+        """
+        :return: An estimate of the memory used by this node, which is representative of the other nodes.
+        """
+        position = self.packed_position if self.pack_position else self.unpacked_position
+        # each node is also referenced from the children list of its parent
+        return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + sys.getsizeof(position) + 8
+
+    @staticmethod
+    def get_prune_threshold(path_minimums, max_nodes):
+        """
+        :return: The largest expansion count for which collapsing every node that has at most that many expansions
+                 (and is not the root or fully expanded) leaves at most max_nodes nodes,
+                 or None if there is no need to prune.
+        """
+        if len(path_minimums) <= max_nodes:
+            return None
+        # a node remains iff all of its ancestors have more expansions than the threshold
+        return np.sort(path_minimums)[::-1][max_nodes]
+
+    def prune(self, max_nodes):
+        """
+        Limits the memory used by the search tree below this node by collapsing the subtrees of the least expanded
+        nodes, so that at most max_nodes nodes remain.
+        Collapsed nodes keep their own statistics, and their children are recreated if they are selected again.
+        Fully expanded nodes are never collapsed, because their children are needed to choose moves.
+
+        :return: The number of nodes that were removed.
+        """
+        nodes, path_minimums = self.get_subtree()
+        threshold = self.get_prune_threshold(path_minimums, max_nodes)
+        if threshold is None:
+            return 0
+        kept_nodes = len(nodes)
+        for node, path_minimum in zip(nodes, path_minimums):
+            if path_minimum > threshold:
+                if node is not self and node.children is not None and node.count_expansions() <= threshold:
+                    node.children = None
+            else:
+                kept_nodes -= 1
+        return len(nodes) - kept_nodes
+
+    def find_transpositions(self, moves):
+        """
+        :return: A list containing the existing node for each of the given moves, or None if a new node is needed.
+        """
+        if self.transposition_table is None:
+            return [None] * len(moves)
+        return [self.transposition_table.lookup(move, self.depth + 1) for move in moves]
+
+    def store_transpositions(self):
+        if self.transposition_table is not None:
+            for child in self.children:
+                self.transposition_table.store(child)
+
     def choose_best_node(self, return_probability_distribution=False, optimal=False):
+        """
+        :return: The chosen child, and optionally the probability distribution over the possible moves
+                 (in the order of GameClass.get_possible_moves) that it was chosen from. With progressive widening,
+                 moves that haven't been added as children yet have a probability of 0.
+        """
         distribution = []
 
         optimal_value = 1 if self.is_maximizing else -1
@@ -50,6 +262,7 @@ class AbstractNode(ABC):
                 else:
                     print('I resign')
 
+            log_probabilities = []
             for child in self.children:
                 # only consider children that result in the optimal outcome
                 if child.fully_expanded and child.get_evaluation() == self.get_evaluation():
@@ -57,11 +270,16 @@ class AbstractNode(ABC):
                     depth_to_endgame = child.depth_to_end_game()
                     # if we are winning, weight smaller depths much more strongly by using e^-x
                     # if we are losing or drawing, weight larger depths much more strongly by using e^x
-                    relative_probability = np.exp(-depth_to_endgame if self.get_evaluation() == optimal_value else
-                                                  depth_to_endgame)
-                    distribution.append(relative_probability)
+                    log_probabilities.append(-depth_to_endgame if self.get_evaluation() == optimal_value else
+                                             depth_to_endgame)
                 else:
-                    distribution.append(0)
+                    log_probabilities.append(-np.inf)
+            log_probabilities = np.array(log_probabilities, dtype=float)
+            if np.any(np.isfinite(log_probabilities)):
+                # subtract the maximum so that long proofs (e.g. drawn tablebase positions) don't overflow
+                distribution = list(np.exp(log_probabilities - np.max(log_probabilities)))
+            else:
+                distribution = [0] * len(self.children)
         else:
             for child in self.children:
                 if not child.fully_expanded:
@@ -79,8 +297,133 @@ class AbstractNode(ABC):
             np.full_like(distribution, 1 / len(distribution), dtype=float)
         idx = np.argmax(distribution) if optimal else np.random.choice(np.arange(len(distribution)), p=distribution)
         best_child = self.children[idx]
+        if return_probability_distribution and self.progressive_widening is not None:
+            full_distribution = np.zeros(self.lazy_moves.count_moves())
+            full_distribution[self.move_indices] = distribution
+            distribution = full_distribution
         return (best_child, distribution) if return_probability_distribution else best_child
 
+    @staticmethod
+    def select_child(is_maximizing, fully_expanded, evaluations, puct_heuristics):
+        """
+        Scores all children of a node at once.
+        Children are considered in order, stopping at the first one that is either already optimal
+        (so the node is fully expanded) or that has never been explored.
+
+        :return: (i, None) where i is the index of the child to search,
+                 or (None, minimax_evaluation) if the node has become fully expanded.
+        """
+        optimal_value = 1 if is_maximizing else -1
+        optimal = fully_expanded & (evaluations == optimal_value)
+        unexplored = ~fully_expanded & np.isinf(puct_heuristics)
+        first = np.argmax(optimal | unexplored)
+        if unexplored[first]:
+            return first, None
+        if optimal[first]:
+            # If this child is already optimal, then the node is fully expanded and there is no point searching further
+            return None, optimal_value
+        if np.all(fully_expanded):
+            return None, np.max(evaluations) if is_maximizing else np.min(evaluations)
+
+        # don't bother exploring fully expanded children
+        if is_maximizing:
+            return np.argmax(np.where(fully_expanded, -np.inf, evaluations + puct_heuristics)), None
+        return np.argmin(np.where(fully_expanded, np.inf, evaluations - puct_heuristics)), None
+
+    @staticmethod
+    def apply_virtual_losses(is_maximizing, fully_expanded, expansions, evaluations, virtual_losses):
+        """
+        Treats each pending selection below a child as an extra expansion that resulted in a loss for the player
+        choosing between the children, so that a batch of selections spreads out over different leaves.
+
+        :return: The adjusted expansion counts and evaluations.
+        """
+        pending = (virtual_losses > 0) & ~fully_expanded
+        loss = -1 if is_maximizing else 1
+        # avoid multiplying the infinite expansion counts of fully expanded children
+        finite_expansions = np.where(pending, expansions, 0)
+        evaluations = np.where(pending, (evaluations * (finite_expansions + 1) + loss * virtual_losses) /
+                               (finite_expansions + virtual_losses + 1), evaluations)
+        return expansions + virtual_losses, evaluations
+
+    def get_path(self):
+        """
+        :return: A list of this node and all of its ancestors.
+        """
+        path = []
+        node = self
+        while node is not None:
+            path.append(node)
+            node = node.parent
+        return path
+
+    def choose_expansion_nodes(self, count):
+        """
+        Chooses up to count distinct nodes to expand, adding a virtual loss along the path to each one so that the
+        following selections are steered elsewhere.
+        Fewer nodes are returned if the same node would be chosen twice, or if the tree is fully expanded.
+
+        :return: A list of the chosen nodes, and a list of the paths that received virtual losses.
+        """
+        nodes = []
+        paths = []
+        for _ in range(count):
+            node = self.choose_expansion_node()
+            if node is None or node in nodes:
+                break
+            # the path is stored because parents can change when transpositions are used
+            path = node.get_path()
+            for ancestor in path:
+                ancestor.virtual_losses += 1
+            nodes.append(node)
+            paths.append(path)
+        return nodes, paths
+
+    def expand_batch(self, network, batch_size):
+        """
+        Chooses up to batch_size nodes using virtual losses, evaluates the children of all of them in a single
+        network call, and then expands them. Only supported for nodes that are evaluated by a network.
+
+        :return: The number of nodes that were expanded, which is 0 if the tree is fully expanded.
+        """
+        with self.timer('selection'):
+            nodes, paths = self.choose_expansion_nodes(batch_size)
+        if len(nodes) == 0:
+            return 0
+        self.remove_virtual_losses(paths)
+        if self.search_statistics is not None:
+            for path in paths:
+                self.search_statistics.add_node(len(path) - 1)
+        self.expand_nodes(network, nodes)
+        return len(nodes)
+
+    @staticmethod
+    def remove_virtual_losses(paths):
+        for path in paths:
+            for ancestor in path:
+                ancestor.virtual_losses -= 1
+
+    @staticmethod
+    def expand_nodes(network, nodes):
+        """
+        Expands the given nodes (which may belong to different trees) after evaluating all of the positions that they
+        need in a single network call.
+        """
+        with nodes[0].timer('move_generation'):
+            # with progressive widening, the children are created from the node's own lazy moves
+            nodes_moves = [node.GameClass.get_possible_moves(node.position) if node.progressive_widening is None
+                           else None for node in nodes]
+        nodes_requests = [node.get_network_requests(moves) for node, moves in zip(nodes, nodes_moves)]
+        requests = [position for positions in nodes_requests for position in positions]
+        with nodes[0].timer('inference'):
+            network_call_results_batch = network.call(np.stack(requests, axis=0)) if len(requests) > 0 else []
+
+        pos = 0
+        for node, moves, positions in zip(nodes, nodes_moves, nodes_requests):
+            new_pos = pos + len(positions)
+            node.expand(moves, network_call_results_batch[pos:new_pos])
+            pos = new_pos
+
     def choose_expansion_node(self):
         # TODO: continue tree search in case the user makes a mistake and the game continues
         if self.fully_expanded:
@@ -90,62 +433,44 @@ class AbstractNode(ABC):
             return self
 
         self.ensure_children()
-        best_heuristic = -np.inf if self.is_maximizing else np.inf
-        best_child = None
-        for i, child in enumerate(self.children):
-            # don't bother exploring fully expanded children
-            if child.fully_expanded:
-                optimal_value = 1 if self.is_maximizing else -1
-                # If this child is already optimal, then self is fully expanded and there is no point searching further
-                if child.get_evaluation() == optimal_value:
-                    self.set_fully_expanded(optimal_value)
-                    return self.parent.choose_expansion_node() if self.parent is not None else None
-                # continue searching other children, there may be another child that is more optimal
-                continue
-
-            # check puct heuristic before calling child.get_evaluation() because it may result in division by 0
-            puct_heuristic = self.get_puct_heuristic_for_child(i)
-            if np.isinf(puct_heuristic):
-                return child
-
-            if self.is_maximizing:
-                combined_heuristic = child.get_evaluation() + puct_heuristic
-                if combined_heuristic > best_heuristic:
-                    best_heuristic = combined_heuristic
-                    best_child = child
-            else:
-                combined_heuristic = child.get_evaluation() - puct_heuristic
-                if combined_heuristic < best_heuristic:
-                    best_heuristic = combined_heuristic
-                    best_child = child
-
-        # if nothing was found because all children are fully expanded
-        if best_child is None:
-            if self.verbose and not self.fully_expanded and self.parent is None:
-                print('Fully expanded tree!')
+        fully_expanded, child_expansions, evaluations = self.get_children_statistics()
+        i = self.root_search.select_child(self, fully_expanded, child_expansions, evaluations) \
+            if self.root_search is not None else None
+        if i is not None:
+            best_child = self.children[i]
+            best_child.parent = self
+            return best_child.choose_expansion_node()
+        i, minimax_evaluation = self.select_child(self.is_maximizing, fully_expanded, evaluations,
+                                                  self.get_puct_heuristics(child_expansions))
+        if minimax_evaluation is not None and self.progressive_widening is not None and \
+                minimax_evaluation != (1 if self.is_maximizing else -1) and self.widen(extra_children=1) > 0:
+            # the node can't be proven until all of its moves have been added, so select again with the new child
+            return self.choose_expansion_node()
+        if minimax_evaluation is None:
+            best_child = self.children[i]
+            # children can be shared between multiple parents, so backpropagate along the path that was selected
+            best_child.parent = self
+            return best_child.choose_expansion_node()
 
-            minimax_evaluation = max([child.get_evaluation() for child in self.children]) if self.is_maximizing \
-                else min([child.get_evaluation() for child in self.children])
-            self.set_fully_expanded(minimax_evaluation)
-            # this node is now fully expanded, so ask the parent to try to choose again
-            # if no parent is available (i.e. this is the root node) then the entire search tree has been expanded
-            return self.parent.choose_expansion_node() if self.parent is not None else None
+        if self.verbose and self.parent is None:
+            print('Fully expanded tree!')
+        self.set_fully_expanded(minimax_evaluation, fully_expanded, evaluations)
+        # this node is now fully expanded, so ask the parent to try to choose again
+        # if no parent is available (i.e. this is the root node) then the entire search tree has been expanded
+        return self.parent.choose_expansion_node() if self.parent is not None else None
 
-        return best_child.choose_expansion_node()
+    @staticmethod
+    def get_proof_depth(is_maximizing, minimax_evaluation, fully_expanded, evaluations, proof_depths):
+        """
+        :return: The proof depth of a node that has just been proven to have the given minimax evaluation,
+                 based on the proof depths of its children. If the node is winning, then the game is won as fast as
+                 possible, otherwise it is lost (or drawn) as slowly as possible.
+        """
+        optimal_value = 1 if is_maximizing else -1
+        depths = proof_depths[fully_expanded & (evaluations == minimax_evaluation)]
+        return 1 + int(np.min(depths) if minimax_evaluation == optimal_value else np.max(depths))
 
     def depth_to_end_game(self):
         if not self.fully_expanded:
             raise Exception('Node not fully expanded!')
-
-        if self.children is None:
-            return 0
-
-        optimal_value = 1 if self.is_maximizing else -1
-        if self.get_evaluation() == optimal_value:
-            # if we are winning, win as fast as possible
-            return 1 + min(child.depth_to_end_game() for child in self.children
-                           if child.fully_expanded and child.get_evaluation() == self.get_evaluation())
-        else:
-            # if we are losing or it is a draw, lose as slow as possible
-            return 1 + max(child.depth_to_end_game() for child in self.children
-                           if child.fully_expanded and child.get_evaluation() == self.get_evaluation())
+        return self.proof_depth
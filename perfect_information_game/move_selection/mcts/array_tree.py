@@ -0,0 +1,550 @@
+from contextlib import nullcontext
+import numpy as np
+from perfect_information_game.move_selection.mcts import AbstractNode
+from perfect_information_game.move_selection.mcts import RolloutPolicy
+
+
+class ArrayTree:
+    """
+    Stores a Monte Carlo search tree as a struct of arrays indexed by node id, instead of one Python object per node.
+    Visit counts, values, priors, parent ids, child offsets and bit-packed positions are kept in preallocated NumPy
+    arrays which are doubled in size whenever they run out of space.
+    The children of a node always occupy a contiguous block of ids, starting at first_children[node].
+
+    If heuristic is False, then the tree behaves like a tree of RolloutNodes, otherwise it behaves like a tree of
+    HeuristicNodes (heuristic defaults to whether a network is given, but network_call_results can be passed in
+    instead of using a network, like in self play):
+    visits holds the rollout count or the expansion count respectively (np.inf once fully expanded),
+    values holds the rollout sum or the minimax heuristic respectively,
+    priors holds the probability that the network's policy assigned to each node from its parent's position,
+    proof_depths holds the number of moves until the end of the game with optimal play (-1 until fully expanded).
+    The policies of nodes without children are kept in a dict until their children are created.
+    If evaluate_on_visit is True, then (like in HeuristicNode) children are created without being evaluated,
+    which is indicated by a value of NaN until they are expanded.
+
+    Use root (an ArrayNode) to interact with the tree with the same interface as the object based nodes.
+    """
+
+    def __init__(self, position, GameClass, network=None, c=np.sqrt(2), d=1, rollout_batch_size=1, pool=None,
+                 network_call_results=None, verbose=False, capacity=1024, heuristic=None, evaluate_on_visit=False,
+                 rollout_policy=None, search_statistics=None):
+        """
+        :param search_statistics: If a SearchStatistics is provided, then the time spent in each phase of expanding
+                                  nodes (e.g. move generation or network inference) is added to it.
+        """
+        self.GameClass = GameClass
+        self.network = network
+        self.heuristic = network is not None if heuristic is None else heuristic
+        self.evaluate_on_visit = evaluate_on_visit
+        self.c = c
+        self.d = d
+        self.rollout_batch_size = rollout_batch_size
+        self.pool = pool
+        self.rollout_policy = RolloutPolicy() if rollout_policy is None else rollout_policy
+        self.verbose = verbose
+        self.search_statistics = search_statistics
+
+        self.size = 0
+        self.parents = np.empty(capacity, dtype=np.int32)
+        self.first_children = np.empty(capacity, dtype=np.int32)
+        self.child_counts = np.empty(capacity, dtype=np.int32)
+        self.visits = np.empty(capacity, dtype=float)
+        self.values = np.empty(capacity, dtype=float)
+        self.priors = np.empty(capacity, dtype=np.float32)
+        self.fully_expanded = np.empty(capacity, dtype=bool)
+        self.is_maximizing = np.empty(capacity, dtype=bool)
+        self.virtual_losses = np.empty(capacity, dtype=np.int32)
+        self.proof_depths = np.empty(capacity, dtype=np.int32)
+        self.positions = np.empty((capacity, len(GameClass.pack_state(GameClass.STARTING_STATE))), dtype=np.uint8)
+        self.policies = {}
+
+        if self.heuristic and network_call_results is None and not GameClass.is_over(position):
+            with self.timer('inference'):
+                network_call_results = network.call(position[np.newaxis, ...])[0]
+        self.add_nodes(-1, [position], [network_call_results], priors=[1])
+        self.root = ArrayNode(self, 0)
+
+    def timer(self, phase):
+        return self.search_statistics.timer(phase) if self.search_statistics is not None else nullcontext()
+
+    def get_arrays(self):
+        return [self.parents, self.first_children, self.child_counts, self.visits, self.values, self.priors,
+                self.fully_expanded, self.is_maximizing, self.virtual_losses, self.proof_depths, self.positions]
+
+    def set_arrays(self, arrays):
+        self.parents, self.first_children, self.child_counts, self.visits, self.values, self.priors, \
+            self.fully_expanded, self.is_maximizing, self.virtual_losses, self.proof_depths, self.positions = arrays
+
+    def get_nbytes_per_node(self):
+        return sum(array.itemsize * np.prod(array.shape[1:], dtype=int) for array in self.get_arrays())
+
+    def ensure_capacity(self, count):
+        capacity = len(self.parents)
+        if self.size + count <= capacity:
+            return
+        while self.size + count > capacity:
+            capacity *= 2
+        self.set_arrays([np.concatenate((array, np.empty((capacity - len(array),) + array.shape[1:],
+                                                         dtype=array.dtype)))
+                         for array in self.get_arrays()])
+
+    def allocate(self, count):
+        """
+        :return: The id of the first node of a new contiguous block of count nodes.
+        """
+        self.ensure_capacity(count)
+        start = self.size
+        self.size += count
+        return start
+
+    def add_nodes(self, parent, moves, network_call_results=None, priors=None):
+        """
+        Adds a contiguous block of nodes for the given moves.
+
+        :return: The id of the first new node.
+        """
+        count = len(moves)
+        start = self.allocate(count)
+        end = start + count
+
+        moves = np.stack(moves, axis=0)
+        self.parents[start:end] = parent
+        self.first_children[start:end] = -1
+        self.child_counts[start:end] = 0
+        self.virtual_losses[start:end] = 0
+        self.proof_depths[start:end] = -1
+        self.priors[start:end] = priors if priors is not None else 0
+        self.is_maximizing[start:end] = self.GameClass.is_player_1_turn_batch(moves)
+        self.positions[start:end] = self.GameClass.pack_states(moves)
+
+        for i, move in enumerate(moves):
+            node = start + i
+            if self.GameClass.is_over(move):
+                self.fully_expanded[node] = True
+                self.values[node] = self.GameClass.get_winner(move)
+                self.visits[node] = np.inf
+                self.proof_depths[node] = 0
+            else:
+                self.fully_expanded[node] = False
+                self.visits[node] = 0
+                if not self.heuristic:
+                    self.values[node] = 0
+                elif network_call_results is None:
+                    self.values[node] = np.nan
+                else:
+                    self.policies[node], self.values[node] = network_call_results[i]
+        return start
+
+    def get_position(self, node):
+        return self.GameClass.unpack_states(self.positions[node:node + 1])[0]
+
+    def get_children(self, node):
+        """
+        :return: A slice of the ids of the children of the given node, or None if it has no children.
+        """
+        first_child = self.first_children[node]
+        return slice(first_child, first_child + self.child_counts[node]) if first_child != -1 else None
+
+    def get_evaluations(self, nodes):
+        if self.heuristic:
+            return self.values[nodes]
+        # rollout averages, avoiding division by 0 for nodes without any rollouts
+        return np.where(self.fully_expanded[nodes], self.values[nodes],
+                        self.values[nodes] / np.maximum(self.visits[nodes], 1))
+
+    def get_minimax_value(self, node):
+        """
+        :return: The best value of the children of the given node that have been evaluated, for the player to move.
+        """
+        values = self.values[self.get_children(node)]
+        return np.nanmax(values) if self.is_maximizing[node] else np.nanmin(values)
+
+    def get_children_statistics(self, node):
+        """
+        :return: Arrays with whether each child of the given node is fully expanded,
+                 its expansion count and its evaluation (including virtual losses).
+        """
+        children = self.get_children(node)
+        fully_expanded = self.fully_expanded[children]
+        visits = self.visits[children]
+        evaluations = self.get_evaluations(children)
+        if self.evaluate_on_visit:
+            # children that haven't been evaluated yet are assumed to be as good as this node
+            evaluations = np.where(np.isnan(evaluations), self.values[node], evaluations)
+        if self.virtual_losses[node] > 0:
+            visits, evaluations = AbstractNode.apply_virtual_losses(self.is_maximizing[node], fully_expanded, visits,
+                                                                    evaluations, self.virtual_losses[children])
+        return fully_expanded, visits, evaluations
+
+    def get_network_requests(self, node, moves):
+        if not self.evaluate_on_visit:
+            return moves
+        return [self.get_position(node)] if np.isnan(self.values[node]) else []
+
+    def ensure_children(self, node, moves=None, network_call_results=None):
+        if self.first_children[node] != -1:
+            return
+
+        if moves is None:
+            with self.timer('move_generation'):
+                moves = self.GameClass.get_possible_moves(self.get_position(node))
+        if not self.heuristic:
+            self.first_children[node] = self.add_nodes(node, moves)
+        elif self.evaluate_on_visit:
+            # new children are evaluated when they are expanded
+            self.first_children[node] = self.add_nodes(node, moves, priors=self.policies.pop(node))
+            # nodes that were collapsed by prune keep their expansion count
+            self.visits[node] = max(self.visits[node], 1)
+        else:
+            if network_call_results is None:
+                with self.timer('inference'):
+                    network_call_results = self.network.call(np.stack(moves, axis=0))
+            # the policy of this node becomes the priors of its children
+            self.first_children[node] = self.add_nodes(node, moves, network_call_results,
+                                                       priors=self.policies.pop(node))
+            self.visits[node] = max(self.visits[node], 1)
+        self.child_counts[node] = len(moves)
+
+    def get_puct_heuristics(self, node, child_visits, child_priors):
+        if not self.heuristic:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(child_visits > 0, self.c * np.sqrt(np.log(self.visits[node]) / child_visits), np.inf)
+        return self.c * np.sqrt(np.log(self.visits[node] + self.virtual_losses[node]) / (child_visits + 1)) + \
+            self.d * child_priors
+
+    def set_fully_expanded(self, node, minimax_evaluation, fully_expanded, evaluations):
+        """
+        Equivalent to AbstractNode.set_fully_expanded, with the statistics of the children of the given node.
+        """
+        self.proof_depths[node] = AbstractNode.get_proof_depth(self.is_maximizing[node], minimax_evaluation,
+                                                               fully_expanded, evaluations,
+                                                               self.proof_depths[self.get_children(node)])
+        self.values[node] = minimax_evaluation
+        self.visits[node] = np.inf
+        self.fully_expanded[node] = True
+
+    # a GumbelSearch that chooses the children of the root instead of PUCT (see AbstractNode.root_search)
+    root_search = None
+
+    def choose_expansion_node(self, node):
+        """
+        Equivalent to AbstractNode.choose_expansion_node, except that the statistics of the children of a node are
+        slices of the arrays, so they don't need to be gathered.
+
+        :return: The id of the node to expand, or -1 if the tree is fully expanded.
+        """
+        while True:
+            if self.fully_expanded[node]:
+                return -1
+
+            if self.visits[node] == 0:
+                return node
+
+            self.ensure_children(node)
+            children = self.get_children(node)
+            fully_expanded, child_visits, evaluations = self.get_children_statistics(node)
+            if self.root_search is not None and self.parents[node] == -1:
+                i = self.root_search.select_child(ArrayNode(self, node), fully_expanded, child_visits, evaluations)
+                if i is not None:
+                    node = children.start + i
+                    continue
+            i, minimax_evaluation = AbstractNode.select_child(
+                self.is_maximizing[node], fully_expanded, evaluations,
+                self.get_puct_heuristics(node, child_visits, self.priors[children]))
+            if minimax_evaluation is None:
+                node = children.start + i
+                continue
+
+            self.set_fully_expanded(node, minimax_evaluation, fully_expanded, evaluations)
+            # this node is now fully expanded, so ask the parent to try to choose again
+            # if no parent is available (i.e. this is the root node) then the entire search tree has been expanded
+            if self.verbose and self.parents[node] == -1:
+                print('Fully expanded tree!')
+            node = self.parents[node]
+            if node == -1:
+                return -1
+
+    def expand(self, node, moves=None, network_call_results=None):
+        if not self.heuristic:
+            self.expand_rollout(node)
+        else:
+            self.expand_heuristic(node, moves, network_call_results)
+
+    def expand_rollout(self, node):
+        position = self.get_position(node)
+        with self.timer('rollout'):
+            rollout_sum = self.pool.rollout(position, self.rollout_batch_size) if self.pool is not None else \
+                sum(self.rollout_policy.rollout(self.GameClass, position) for _ in range(self.rollout_batch_size))
+        self.backup_rollout(node, rollout_sum, self.rollout_batch_size)
+
+    def backup_rollout(self, node, rollout_sum, rollout_count):
+        with self.timer('backup'):
+            # update this node and all its parents, except for any that were proven while the rollouts were in flight
+            while node != -1:
+                if not self.fully_expanded[node]:
+                    self.values[node] += rollout_sum
+                    self.visits[node] += rollout_count
+                node = self.parents[node]
+
+    def expand_heuristic(self, node, moves=None, network_call_results=None):
+        if self.first_children[node] != -1:
+            raise Exception('Node already has children!')
+        if self.fully_expanded[node]:
+            raise Exception('Node is terminal!')
+
+        if self.evaluate_on_visit:
+            if np.isnan(self.values[node]):
+                with self.timer('inference'):
+                    self.policies[node], self.values[node] = \
+                        self.network.call(self.get_position(node)[np.newaxis, ...])[0] \
+                        if network_call_results is None else network_call_results[0]
+            self.ensure_children(node, moves)
+        else:
+            self.ensure_children(node, moves, network_call_results)
+            self.values[node] = self.get_minimax_value(node)
+
+        with self.timer('backup'):
+            # recompute the value of all parents from their evaluated children, which can make it worse as well
+            node = self.parents[node]
+            while node != -1:
+                value = self.get_minimax_value(node)
+                changed = value != self.values[node]
+                self.values[node] = value
+                self.visits[node] += 1
+                node = self.parents[node]
+                if not changed:
+                    # once a parent is reached whose value doesn't change,
+                    # all further parents are also not affected
+                    break
+
+            # despite not updating heuristic values for further parents, continue to update their expansion counts
+            while node != -1:
+                self.visits[node] += 1
+                node = self.parents[node]
+
+    def detach(self, node):
+        """
+        Makes the given node the root of the tree, discarding its parent and siblings.
+        The arrays are compacted once most of their space is used by discarded nodes.
+
+        :return: The (possibly new) id of the given node.
+        """
+        self.parents[node] = -1
+        if self.count_subtree(node) < self.size // 2:
+            node = self.compact(node)
+        return node
+
+    def count_subtree(self, node):
+        count = 0
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            count += 1
+            if self.first_children[node] != -1:
+                stack.extend(range(self.first_children[node], self.first_children[node] + self.child_counts[node]))
+        return count
+
+    def prune(self, node, max_nodes):
+        """
+        Equivalent to AbstractNode.prune for the subtree of the given root node, after which the tree is compacted.
+
+        :return: The new id of the given node, and the number of nodes that were removed.
+        """
+        nodes = [node]
+        path_minimums = [np.inf]
+        child_minimums = []
+        i = 0
+        while i < len(nodes):
+            child_minimum = np.inf if i == 0 else min(path_minimums[i], self.visits[nodes[i]])
+            child_minimums.append(child_minimum)
+            children = self.get_children(nodes[i])
+            if children is not None:
+                nodes.extend(range(children.start, children.stop))
+                path_minimums.extend([child_minimum] * (children.stop - children.start))
+            i += 1
+
+        threshold = AbstractNode.get_prune_threshold(path_minimums, max_nodes)
+        if threshold is None:
+            return node, 0
+        for collapsed, path_minimum, child_minimum in zip(nodes, path_minimums, child_minimums):
+            if path_minimum > threshold >= child_minimum and self.first_children[collapsed] != -1:
+                if self.heuristic:
+                    # the priors of the children are needed to recreate them
+                    self.policies[collapsed] = self.priors[self.get_children(collapsed)].copy()
+                self.first_children[collapsed] = -1
+                self.child_counts[collapsed] = 0
+        size = self.size
+        return self.compact(node), size - self.size
+
+    def compact(self, root):
+        """
+        Copies the subtree of the given node into new arrays, discarding all other nodes.
+
+        :return: The new id of the given node, which is always 0.
+        """
+        old_ids = [root]
+        new_first_children = [-1]
+        new_parents = [-1]
+        i = 0
+        # breadth first traversal which keeps the children of each node in a contiguous block
+        while i < len(old_ids):
+            first_child = self.first_children[old_ids[i]]
+            if first_child != -1:
+                child_count = self.child_counts[old_ids[i]]
+                new_first_children[i] = len(old_ids)
+                old_ids.extend(range(first_child, first_child + child_count))
+                new_first_children.extend([-1] * child_count)
+                new_parents.extend([i] * child_count)
+            i += 1
+
+        old_ids = np.array(old_ids)
+        capacity = len(self.parents)
+        arrays = []
+        for array in self.get_arrays():
+            new_array = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+            new_array[:len(old_ids)] = array[old_ids]
+            arrays.append(new_array)
+        self.set_arrays(arrays)
+        self.parents[:len(old_ids)] = new_parents
+        self.first_children[:len(old_ids)] = new_first_children
+        self.size = len(old_ids)
+        self.policies = {new_id: self.policies[old_id] for new_id, old_id in enumerate(old_ids)
+                         if old_id in self.policies}
+        self.root = ArrayNode(self, 0)
+        return 0
+
+
+class ArrayNode(AbstractNode):
+    """
+    A lightweight view of a single node in an ArrayTree, which provides the same interface as the object based nodes.
+    Views are created on demand, so attributes such as children and parent should not be cached.
+    After detaching a node from its parent (i.e. setting node.parent = None), only that node's view remains valid.
+    """
+
+    # progressive widening isn't supported, because the children of each node are stored contiguously
+    progressive_widening = None
+
+    # noinspection PyMissingConstructor
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, ArrayNode) and self.tree is other.tree and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    @property
+    def GameClass(self):
+        return self.tree.GameClass
+
+    @property
+    def verbose(self):
+        return self.tree.verbose
+
+    @property
+    def position(self):
+        return self.tree.get_position(self.index)
+
+    @property
+    def fully_expanded(self):
+        return self.tree.fully_expanded[self.index]
+
+    @property
+    def is_maximizing(self):
+        return self.tree.is_maximizing[self.index]
+
+    @property
+    def proof_depth(self):
+        proof_depth = self.tree.proof_depths[self.index]
+        return int(proof_depth) if proof_depth != -1 else None
+
+    @proof_depth.setter
+    def proof_depth(self, proof_depth):
+        self.tree.proof_depths[self.index] = -1 if proof_depth is None else proof_depth
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        return ArrayNode(self.tree, parent) if parent != -1 else None
+
+    @parent.setter
+    def parent(self, parent):
+        if parent is None:
+            self.index = self.tree.detach(self.index)
+        else:
+            self.tree.parents[self.index] = parent.index
+
+    @property
+    def children(self):
+        children = self.tree.get_children(self.index)
+        return [ArrayNode(self.tree, child) for child in range(children.start, children.stop)] \
+            if children is not None else None
+
+    def get_evaluation(self):
+        return self.tree.get_evaluations(slice(self.index, self.index + 1))[0]
+
+    def count_expansions(self):
+        return self.tree.visits[self.index]
+
+    def count_nodes(self):
+        return self.tree.count_subtree(self.index)
+
+    def get_nbytes_per_node(self):
+        return self.tree.get_nbytes_per_node()
+
+    def prune(self, max_nodes):
+        if self.parent is not None:
+            raise ValueError('Only the root of an array tree can be pruned')
+        self.index, removed_nodes = self.tree.prune(self.index, max_nodes)
+        return removed_nodes
+
+    def ensure_children(self, moves=None, network_call_results=None):
+        self.tree.ensure_children(self.index, moves, network_call_results)
+
+    @property
+    def virtual_losses(self):
+        return self.tree.virtual_losses[self.index]
+
+    @virtual_losses.setter
+    def virtual_losses(self, virtual_losses):
+        self.tree.virtual_losses[self.index] = virtual_losses
+
+    def get_children_statistics(self):
+        return self.tree.get_children_statistics(self.index)
+
+    @property
+    def search_statistics(self):
+        return self.tree.search_statistics
+
+    @property
+    def root_search(self):
+        return self.tree.root_search
+
+    @root_search.setter
+    def root_search(self, root_search):
+        self.tree.root_search = root_search
+
+    def get_child_priors(self):
+        return self.tree.priors[self.tree.get_children(self.index)]
+
+    def get_puct_heuristics(self, child_expansions):
+        return self.tree.get_puct_heuristics(self.index, child_expansions,
+                                             self.tree.priors[self.tree.get_children(self.index)])
+
+    def get_network_requests(self, moves):
+        return self.tree.get_network_requests(self.index, moves)
+
+    def expand(self, moves=None, network_call_results=None):
+        self.tree.expand(self.index, moves, network_call_results)
+
+    def backup(self, rollout_sum, rollout_count):
+        self.tree.backup_rollout(self.index, rollout_sum, rollout_count)
+
+    def set_fully_expanded(self, minimax_evaluation, fully_expanded, evaluations):
+        self.tree.set_fully_expanded(self.index, minimax_evaluation, fully_expanded, evaluations)
+
+    def choose_expansion_node(self):
+        node = self.tree.choose_expansion_node(self.index)
+        return ArrayNode(self.tree, node) if node != -1 else None
@@ -1,34 +1,120 @@
-from multiprocessing import Pipe, Pool
-from multiprocessing.context import Process
+import os
 from time import time
 import numpy as np
 from perfect_information_game.move_selection.mcts import HeuristicNode
 from perfect_information_game.move_selection.mcts import RolloutNode
+from perfect_information_game.move_selection.mcts import TranspositionTable
+from perfect_information_game.move_selection.mcts import TablebaseProbe
+from perfect_information_game.move_selection.mcts import TreeFile
+from perfect_information_game.move_selection.mcts import NodeBudget
+from perfect_information_game.move_selection.mcts import RolloutPool
+from perfect_information_game.move_selection.mcts import ArrayTree
+from perfect_information_game.move_selection.mcts import RootParallelSearch
+from perfect_information_game.move_selection.mcts import MCTS
 from perfect_information_game.move_selection import MoveChooser
+from perfect_information_game.move_selection import SearchStatistics
+from perfect_information_game.move_selection import PositionMailbox
 
 
 class AsyncMCTS(MoveChooser):
     """
     Implementation of Monte Carlo Tree Search that uses the other player's time to continue thinking.
-    This is achieved using multiprocessing, and a Pipe for transferring data to and from the worker process.
+    This is achieved using multiprocessing, with a Pipe for sending commands and bit-packed positions to the worker
+    process, and a PositionMailbox in shared memory through which it returns its chosen moves.
     """
 
-    def __init__(self, GameClass, starting_position, time_limit=3, network=None, c=np.sqrt(2), d=1, threads=1):
+    def __init__(self, GameClass, starting_position, time_limit=3, network=None, c=np.sqrt(2), d=1, threads=1,
+                 pack_positions=False, transpositions=False, array_tree=False, batch_size=1,
+                 evaluate_on_visit=False, root_parallel_workers=1, max_nodes=None, prune_nodes=True,
+                 tree_stats_callback=None, pipeline_depth=2, rollout_policy=None, tablebase_manager=None,
+                 time_manager=None, progressive_widening=None, gumbel_search=None, tree_path=None):
         """
         Either:
-        If network is provided, threads must be 1.
-        If network is not provided, then threads will be used for leaf parallelization
+        If network is provided, threads must be 1, and batch_size nodes will be selected using virtual losses and
+        evaluated together in a single network call.
+        If network is not provided, then threads will be used for leaf parallelization, with pipeline_depth leaves
+        having their rollouts executed by a RolloutPool at once.
+
+        :param pack_positions: If True, the search tree will store bit-packed positions to reduce memory usage.
+        :param transpositions: If True, move orders that lead to the same position will share a single node,
+                               using a TranspositionTable.
+        :param array_tree: If True, the search tree will be stored in an ArrayTree instead of as one object per node.
+                           Positions are always bit-packed in an ArrayTree.
+        :param evaluate_on_visit: If True, the network will only evaluate nodes when they are expanded,
+                                  instead of evaluating all of their children (see HeuristicNode).
+        :param root_parallel_workers: If greater than 1, then this many worker processes will each grow their own
+                                      search tree, and moves will be chosen using their merged statistics
+                                      (see RootParallelSearch). All other options apply to each worker's tree.
+        :param max_nodes: If given, the search tree is limited to this many nodes (see NodeBudget).
+        :param prune_nodes: If True, the least expanded subtrees are pruned once the tree has max_nodes nodes.
+                            Otherwise, thinking stops until the next move.
+        :param tree_stats_callback: An optional function that is called (in the worker process) with the size of the
+                                    tree and its estimated memory per node (see NodeBudget).
+        :param rollout_policy: The RolloutPolicy used when no network is given. Defaults to random moves until the
+                               end of the game.
+        :param tablebase_manager: If a ChessTablebaseManager is given, then nodes whose positions are in its tablebases
+                                  are fully expanded with the stored outcome, and rollouts stop as soon as they reach
+                                  such a position (see TablebaseProbe).
+        :param time_manager: If a TimeManager is given, then it decides (in the worker process) when to stop searching
+                             for each move, instead of always using the whole time limit.
+                             It isn't used with root parallelization.
+        :param progressive_widening: If a ProgressiveWidening is given, then the children of each node are added a few
+                                     at a time as it is expanded, instead of all at once. This requires
+                                     evaluate_on_visit when a network is given, and isn't supported by the array tree
+                                     or by root parallelization.
+        :param gumbel_search: If a GumbelSearch is given, then the children of the root are chosen by sequential
+                              halving instead of PUCT after choose_move is called, and the search stops once its
+                              simulation budget is used up (or the time limit is reached). Pondering still uses PUCT.
+                              It isn't supported with progressive widening or root parallelization.
+        :param tree_path: If given, and a tree that was saved by save_tree (see TreeFile) for the starting position
+                          exists at this path, then the search continues from that tree.
         """
         super().__init__(GameClass, starting_position)
         if network is not None and threads != 1:
-            raise ValueError('Threads != 1 with Network != None')
+            raise ValueError('Threads != 1 with Network != None, use batch_size instead')
+        if network is None and batch_size != 1:
+            raise ValueError('Batch_size != 1 with Network == None, use threads instead')
+        if array_tree and transpositions:
+            raise ValueError('Transpositions are not supported by the array tree')
+        if array_tree and tablebase_manager is not None:
+            raise ValueError('Tablebases are not supported by the array tree')
+        if progressive_widening is not None and (array_tree or root_parallel_workers > 1):
+            raise ValueError('Progressive widening is not supported by the array tree or by root parallelization')
+        if progressive_widening is not None and network is not None and not evaluate_on_visit:
+            raise ValueError('Progressive widening requires evaluate_on_visit')
+        if gumbel_search is not None and (progressive_widening is not None or root_parallel_workers > 1):
+            raise ValueError('Gumbel search is not supported with progressive widening or root parallelization')
+
+        self.time_limit = time_limit
+        self.root_parallel = None
+        if root_parallel_workers > 1:
+            # the workers keep searching while waiting for the user's move
+            self.root_parallel = RootParallelSearch(
+                GameClass, starting_position, root_parallel_workers, ponder=True, network=network, c=c, d=d,
+                threads=threads, pack_positions=pack_positions, transpositions=transpositions, array_tree=array_tree,
+                batch_size=batch_size, evaluate_on_visit=evaluate_on_visit, max_nodes=max_nodes,
+                prune_nodes=prune_nodes, tree_stats_callback=tree_stats_callback, pipeline_depth=pipeline_depth,
+                rollout_policy=rollout_policy, tablebase_manager=tablebase_manager)
+            return
 
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pipe, Process
+
+        self.mailbox = PositionMailbox(GameClass)
+        # the number of moves that the worker has been asked to choose, which tags its results in the mailbox
+        self.requests = 0
         self.parent_pipe, worker_pipe = Pipe()
         self.worker_process = Process(target=self.loop_func,
                                       args=(GameClass, starting_position, time_limit, network, c, d, threads,
-                                            worker_pipe))
+                                            worker_pipe, self.mailbox, pack_positions, transpositions, array_tree,
+                                            batch_size, evaluate_on_visit, max_nodes, prune_nodes, tree_stats_callback,
+                                            pipeline_depth, rollout_policy, tablebase_manager, time_manager,
+                                            progressive_widening, gumbel_search, tree_path))
 
     def start(self):
+        if self.root_parallel is not None:
+            self.root_parallel.start()
+            return
         self.worker_process.start()
 
     def report_user_move(self, user_chosen_move):
@@ -38,9 +124,22 @@ class AsyncMCTS(MoveChooser):
 
         :param user_chosen_move:
         """
-        self.parent_pipe.send(user_chosen_move)
+        if self.root_parallel is not None:
+            self.root_parallel.advance(user_chosen_move)
+        else:
+            self.parent_pipe.send(self.GameClass.pack_state(user_chosen_move))
         self.position = user_chosen_move
 
+    def save_tree(self, path):
+        """
+        Instructs the worker process to save its search tree to the given path (see TreeFile),
+        and waits until it has been saved.
+        """
+        if self.root_parallel is not None:
+            raise ValueError('Saving trees is not supported with root parallelization')
+        self.parent_pipe.send(('save', path))
+        self.parent_pipe.recv()
+
     def choose_move(self, return_distribution=False):
         """
         Instructs the worker thread to decide on an optimal move.
@@ -50,63 +149,180 @@ class AsyncMCTS(MoveChooser):
 
         :return: The moves chosen by monte carlo tree search.
         """
-        self.parent_pipe.send(None)
-        chosen_positions = self.parent_pipe.recv()
+        if self.root_parallel is not None:
+            self.search_statistics.start()
+            chosen_positions = self.root_parallel.choose_move(self.time_limit, self.search_statistics)
+            self.search_statistics.finish()
+        else:
+            self.parent_pipe.send(None)
+            self.requests += 1
+            _, positions, distributions, stats = self.mailbox.wait(self.requests)
+            chosen_positions = list(zip(positions, distributions))
+            # the search was done by the worker process
+            self.search_statistics.finish(stats)
         self.position = chosen_positions[-1][0]
         return chosen_positions if return_distribution else [position for position, _ in chosen_positions]
 
     def terminate(self):
+        if self.root_parallel is not None:
+            self.root_parallel.terminate()
+            return
         self.worker_process.terminate()
         self.worker_process.join()
+        self.mailbox.close()
 
     @staticmethod
-    def loop_func(GameClass, position, time_limit, network, c, d, threads, worker_pipe):
+    def loop_func(GameClass, position, time_limit, network, c, d, threads, worker_pipe, mailbox, pack_positions=False,
+                  transpositions=False, array_tree=False, batch_size=1, evaluate_on_visit=False, max_nodes=None,
+                  prune_nodes=True, tree_stats_callback=None, pipeline_depth=2, rollout_policy=None,
+                  tablebase_manager=None, time_manager=None, progressive_widening=None, gumbel_search=None,
+                  tree_path=None):
+        # the same table is used for the whole game, since unreachable nodes are automatically removed from it
+        transposition_table = TranspositionTable(GameClass) if transpositions else None
+        tablebase_probe = TablebaseProbe(tablebase_manager) if tablebase_manager is not None else None
+        search_statistics = SearchStatistics(AsyncMCTS.__name__)
         if network is None:
-            pool = Pool(threads) if threads > 1 else None
-            root = RolloutNode(position, parent=None, GameClass=GameClass, c=c, rollout_batch_size=threads, pool=pool,
-                               verbose=True)
+            pool = RolloutPool(GameClass, threads, pipeline_depth, rollout_policy, tablebase_probe) if threads > 1 \
+                else None
         else:
             network.initialize()
-            root = HeuristicNode(position, None, GameClass, network, c, d, verbose=True)
+            pool = None
 
-        while True:
-            best_node = root.choose_expansion_node()
+        def create_root(position):
+            if array_tree:
+                return ArrayTree(position, GameClass, network, c, d, rollout_batch_size=threads, pool=pool,
+                                 verbose=True, evaluate_on_visit=evaluate_on_visit, rollout_policy=rollout_policy,
+                                 search_statistics=search_statistics).root
+            elif network is None:
+                return RolloutNode(position, parent=None, GameClass=GameClass, c=c, rollout_batch_size=threads,
+                                   pool=pool, verbose=True, pack_position=pack_positions,
+                                   transposition_table=transposition_table, rollout_policy=rollout_policy,
+                                   tablebase_probe=tablebase_probe, progressive_widening=progressive_widening,
+                                   search_statistics=search_statistics)
+            else:
+                return HeuristicNode(position, None, GameClass, network, c, d, verbose=True,
+                                     pack_position=pack_positions, transposition_table=transposition_table,
+                                     evaluate_on_visit=evaluate_on_visit, tablebase_probe=tablebase_probe,
+                                     progressive_widening=progressive_widening,
+                                     search_statistics=search_statistics)
+
+        root = create_root(position)
+        if tree_path is not None and os.path.exists(tree_path):
+            try:
+                print(f'Loaded {TreeFile.load(tree_path, root)} nodes from {tree_path}')
+            except ValueError as e:
+                print(f'Not loading {tree_path}: {e}')
+                root = create_root(position)
+
+        batches = 0
+        batched_nodes = 0
+        node_budget = NodeBudget(max_nodes, prune_nodes, callback=tree_stats_callback)
+
+        def search():
+            """
+            Expands either a single node or a batch of nodes.
 
-            if best_node is not None:
-                best_node.expand()
+            :return: False if the tree is fully expanded, or if the node budget has been reached without pruning.
+            """
+            nonlocal batches, batched_nodes
+            if batch_size > 1:
+                # selection is timed separately by the nodes
+                with search_statistics.timer('expansion'):
+                    expanded_nodes = root.expand_batch(network, batch_size)
+                if expanded_nodes == 0:
+                    return False
+                batches += 1
+                batched_nodes += expanded_nodes
+            elif pool is not None:
+                with search_statistics.timer('expansion'):
+                    if not pool.step(root, threads):
+                        return False
+            else:
+                with search_statistics.timer('selection'):
+                    best_node = root.choose_expansion_node()
+                if best_node is None:
+                    return False
+                search_statistics.add_node(len(best_node.get_path()) - 1)
+                with search_statistics.timer('expansion'):
+                    best_node.expand()
+            with search_statistics.timer('pruning'):
+                return node_budget.check(root, pool.flush if pool is not None else None)
+
+        # the number of moves that have been chosen, which tags the results in the mailbox
+        requests = 0
+        while True:
+            if not search():
+                if root.children is None:
+                    # positions that were found in the tablebases are fully expanded without having children
+                    root.ensure_children()
+                # there is nothing left to think about until the next message arrives
+                worker_pipe.poll(None)
 
             if root.children is not None and worker_pipe.poll():
-                user_chosen_position = worker_pipe.recv()
+                if pool is not None:
+                    # the tree must not change while rollouts are in flight
+                    pool.flush()
+                message = worker_pipe.recv()
 
-                if user_chosen_position is not None:
+                if type(message) is tuple:
+                    # a request to save the search tree
+                    _, path = message
+                    print(f'Saved {TreeFile.save(root, path)} nodes to {path}')
+                    worker_pipe.send(True)
+                elif message is not None:
                     # an updated position has been received so we can truncate the tree
+                    user_chosen_position = GameClass.unpack_state(message)
                     for child in root.children:
                         if np.all(child.position == user_chosen_position):
                             root = child
                             root.parent = None
                             break
                     else:
-                        print(user_chosen_position)
-                        raise Exception('Invalid user chosen move!')
+                        if progressive_widening is None:
+                            print(user_chosen_position)
+                            raise Exception('Invalid user chosen move!')
+                        # with progressive widening, the user may have chosen a move that hasn't been added yet
+                        root = create_root(user_chosen_position)
+                    node_budget.reset()
 
                     if GameClass.is_over(root.position):
                         print('Game Over in Async MCTS: ', GameClass.get_winner(root.position))
                         return
                 else:
                     # this move chooser has been requested to decide on a move via the choose_move function
+                    # (the statistics only cover the search after the request, not the pondering before it)
+                    search_statistics.start()
+                    start_counts = MCTS.get_search_counts(transposition_table, tablebase_probe, node_budget)
+                    search_batches = batches
                     start_time = time()
-                    while time() - start_time < time_limit:
-                        best_node = root.choose_expansion_node()
-
-                        # best_node will be None if the tree is fully expanded
-                        if best_node is None:
+                    if time_manager is not None:
+                        time_manager.start(root, time_limit)
+                    if gumbel_search is not None:
+                        gumbel_search.start(root)
+                    while (not time_manager.should_stop(root) if time_manager is not None else
+                           time() - start_time < time_limit) and \
+                            (gumbel_search is None or not gumbel_search.is_finished()):
+                        if not search():
                             break
-
-                        best_node.expand()
+                    if pool is not None:
+                        pool.flush()
+                    if time_manager is not None:
+                        time_manager.finish()
+                    MCTS.record_search_counts(search_statistics, start_counts, MCTS.get_search_counts(
+                        transposition_table, tablebase_probe, node_budget))
+                    search_statistics.add_count('batches', batches - search_batches)
+                    search_statistics.tree_size = int(root.count_nodes())
 
                     is_ai_player_1 = GameClass.is_player_1_turn(root.position)
                     chosen_positions = []
                     print(f'MCTS choosing move based on {root.count_expansions()} expansions!')
+                    if transposition_table is not None:
+                        transposition_table.print_stats()
+                    if tablebase_probe is not None:
+                        tablebase_probe.print_stats()
+                    if batches > 0:
+                        print(f'Batch fill rate: {100 * batched_nodes / (batches * batch_size):.1f}% '
+                              f'({batched_nodes} nodes in {batches} batches)')
 
                     # choose moves as long as it is still the ai's turn
                     while GameClass.is_player_1_turn(root.position) == is_ai_player_1:
@@ -114,12 +330,25 @@ class AsyncMCTS(MoveChooser):
                             best_node = root.choose_expansion_node()
                             if best_node is not None:
                                 best_node.expand()
-                        root, distribution = root.choose_best_node(return_probability_distribution=True, optimal=True)
+                            # rollouts and positions that were found in the tablebases don't create children
+                            root.ensure_children()
+                        if gumbel_search is not None and gumbel_search.root is root:
+                            gumbel_search.finish()
+                            distribution = gumbel_search.get_improved_policy(root)
+                            root = gumbel_search.choose_child(root)
+                        else:
+                            root, distribution = root.choose_best_node(return_probability_distribution=True,
+                                                                       optimal=True)
                         chosen_positions.append((root.position, distribution))
 
+                    node_budget.report(root)
                     print('Expected outcome: ', root.get_evaluation())
                     root.parent = None  # delete references to the parent and siblings
-                    worker_pipe.send(chosen_positions)
+                    node_budget.reset()
+                    requests += 1
+                    mailbox.write([position for position, _ in chosen_positions],
+                                  [distribution for _, distribution in chosen_positions],
+                                  search_statistics.finish(), requests)
                     if GameClass.is_over(root.position):
                         print('Game Over in Async MCTS: ', GameClass.get_winner(root.position))
                         return
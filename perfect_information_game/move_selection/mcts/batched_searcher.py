@@ -0,0 +1,126 @@
+from copy import copy
+import numpy as np
+from perfect_information_game.move_selection.mcts import AbstractNode
+from perfect_information_game.move_selection.mcts import HeuristicNode
+from perfect_information_game.move_selection.mcts import ArrayTree
+
+
+class BatchedSearcher:
+    """
+    Grows many independent search trees in lockstep, so that the leaves chosen in all of them are evaluated together
+    in a single network call. This keeps the network busy when each tree on its own would only provide a few positions
+    per call, e.g. for self play, arena matches or analysing many positions at once.
+
+    Each tree is identified by the index returned by add_tree. Trees are searched until they have
+    expansions_per_move expansions (or until their GumbelSearch has used up its budget), after which a move can be
+    chosen and the tree advanced to it.
+    """
+
+    def __init__(self, GameClass, network, expansions_per_move=500, c=np.sqrt(2), d=1, leaves_per_tree=1,
+                 array_tree=False, evaluate_on_visit=False, gumbel_search=None):
+        """
+        :param leaves_per_tree: The number of leaves chosen in each tree per step, using virtual losses.
+        :param array_tree: If True, the trees will be stored in ArrayTrees.
+        :param evaluate_on_visit: If True, the network will only evaluate nodes when they are expanded,
+                                  instead of evaluating all of their children (see HeuristicNode).
+        :param gumbel_search: If a GumbelSearch is given, then each tree uses its own copy of it to choose the children
+                              of its root, with a budget of expansions_per_move simulations.
+        """
+        self.GameClass = GameClass
+        self.network = network
+        self.expansions_per_move = expansions_per_move
+        self.c = c
+        self.d = d
+        self.leaves_per_tree = leaves_per_tree
+        self.array_tree = array_tree
+        self.evaluate_on_visit = evaluate_on_visit
+        self.gumbel_search = gumbel_search
+        self.roots = []
+        self.searches = []
+
+    def create_root(self, position, network_call_results=None):
+        if self.array_tree:
+            return ArrayTree(position, self.GameClass, network=self.network, c=self.c, d=self.d,
+                             network_call_results=network_call_results, heuristic=True,
+                             evaluate_on_visit=self.evaluate_on_visit).root
+        return HeuristicNode(position, parent=None, GameClass=self.GameClass, network=self.network, c=self.c,
+                             d=self.d, network_call_results=network_call_results,
+                             evaluate_on_visit=self.evaluate_on_visit)
+
+    def add_tree(self, position, network_call_results=None):
+        """
+        :param network_call_results: The network call result for the position, if it is already known.
+        :return: The index of the new tree.
+        """
+        self.roots.append(None)
+        self.searches.append(copy(self.gumbel_search) if self.gumbel_search is not None else None)
+        self.reset_tree(len(self.roots) - 1, position, network_call_results)
+        return len(self.roots) - 1
+
+    def reset_tree(self, i, position, network_call_results=None):
+        """
+        Replaces tree i with a new tree for the given position.
+        """
+        self.set_root(i, self.create_root(position, network_call_results))
+
+    def get_root(self, i):
+        return self.roots[i]
+
+    def set_root(self, i, root):
+        """
+        Makes the given node (e.g. a child of the current root) the root of tree i, discarding the rest of the tree.
+        """
+        root.parent = None
+        self.roots[i] = root
+        if self.searches[i] is not None:
+            self.searches[i].start(root, self.expansions_per_move)
+
+    def is_search_finished(self, i):
+        """
+        :return: True if tree i has been searched enough to choose a move.
+        """
+        if self.searches[i] is not None:
+            return self.searches[i].is_finished()
+        return self.roots[i].count_expansions() >= self.expansions_per_move
+
+    def choose_best_node(self, i, optimal=False):
+        """
+        :return: The chosen child of the root of tree i, and the distribution over its children that is used as the
+                 policy training target.
+        """
+        root = self.roots[i]
+        if self.searches[i] is not None and self.searches[i].root is root:
+            self.searches[i].finish()
+            return self.searches[i].choose_child(root), self.searches[i].get_improved_policy(root)
+        return root.choose_best_node(return_probability_distribution=True, optimal=optimal)
+
+    def step(self, indices=None):
+        """
+        Chooses up to leaves_per_tree leaves in each of the given trees (all trees by default),
+        and expands all of them after a single network call.
+
+        :return: The indices of the trees that are fully expanded, in which no leaves were chosen.
+        """
+        indices = range(len(self.roots)) if indices is None else indices
+        nodes = []
+        fully_expanded = []
+        for i in indices:
+            tree_nodes, paths = self.roots[i].choose_expansion_nodes(self.leaves_per_tree)
+            if len(tree_nodes) == 0:
+                fully_expanded.append(i)
+            AbstractNode.remove_virtual_losses(paths)
+            nodes.extend(tree_nodes)
+
+        if len(nodes) > 0:
+            AbstractNode.expand_nodes(self.network, nodes)
+        return fully_expanded
+
+    def search(self, indices=None):
+        """
+        Steps the given trees (all trees by default) until every one of them is either fully expanded or
+        has been searched enough to choose a move.
+        """
+        remaining = list(range(len(self.roots)) if indices is None else indices)
+        while len(remaining) > 0:
+            fully_expanded = self.step(remaining)
+            remaining = [i for i in remaining if i not in fully_expanded and not self.is_search_finished(i)]
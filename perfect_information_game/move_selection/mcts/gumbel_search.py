@@ -0,0 +1,162 @@
+import math
+import numpy as np
+
+
+class GumbelSearch:
+    """
+    Chooses which child of the root to search using Gumbel top-k sampling and sequential halving, as in
+    "Policy improvement by planning with Gumbel" (Danihelka et al., 2022). Below the root, nodes are still selected
+    using PUCT. This makes much better use of small simulation budgets (e.g. a few hundred expansions per move).
+
+    When a search is started, considered_moves children are sampled without replacement using the Gumbel-top-k trick
+    on the priors of the root (uniform priors are used for RolloutNodes). The budget of simulations is then split
+    into phases, and after each phase only the better half of the remaining children (by gumbel + logit + sigma(q))
+    continue to be searched. The chosen move is the best of the final survivors, and get_improved_policy returns
+    softmax(logit + sigma(q)), which is the policy training target from the paper.
+    Instances are attached to a single root at a time, so each concurrent search needs its own copy.
+    """
+
+    def __init__(self, simulations=100, considered_moves=16, c_visit=50, c_scale=1, sample=True):
+        """
+        :param simulations: The default number of simulations for each search.
+        :param sample: If False, the gumbel noise is 0, so the search deterministically considers the moves with the
+                       highest priors and chooses the best one. This is more suitable for evaluation than self play.
+        """
+        self.simulations = simulations
+        self.considered_moves = considered_moves
+        self.c_visit = c_visit
+        self.c_scale = c_scale
+        self.sample = sample
+        self.root = None
+        self.schedule = []
+        self.simulation = 0
+        self.logits = None
+        self.gumbels = None
+        self.considered = None
+        self.visits = None
+
+    @staticmethod
+    def get_schedule(considered_moves, simulations):
+        """
+        :return: For each simulation, the number of visits that the child chosen for it must already have.
+                 A child whose visit count falls behind the schedule has been eliminated by sequential halving.
+        """
+        if considered_moves <= 1:
+            return list(range(simulations))
+        phases = math.ceil(math.log2(considered_moves))
+        schedule = []
+        visits = [0] * considered_moves
+        remaining = considered_moves
+        while len(schedule) < simulations:
+            extra_visits = max(1, int(simulations / (phases * remaining)))
+            for _ in range(extra_visits):
+                schedule.extend(visits[:remaining])
+                for i in range(remaining):
+                    visits[i] += 1
+            remaining = max(2, remaining // 2)
+        return schedule[:simulations]
+
+    def start(self, root, simulations=None):
+        """
+        Attaches this search to the given root, so that its children are selected by sequential halving.
+        """
+        if self.root is not None:
+            self.finish()
+        self.root = root
+        self.simulation = 0
+        self.logits = None
+        self.schedule = self.get_schedule(self.considered_moves,
+                                          self.simulations if simulations is None else simulations)
+        root.root_search = self
+
+    def finish(self):
+        """
+        Detaches this search from its root, which is selected using PUCT again.
+        """
+        if self.root is not None:
+            self.root.root_search = None
+            self.root = None
+
+    def is_finished(self):
+        """
+        :return: True if the simulation budget of the current search has been used up, or its root has been proven.
+        """
+        return self.root is not None and (self.simulation >= len(self.schedule) or self.root.fully_expanded)
+
+    def initialize(self, node):
+        priors = np.asarray(node.get_child_priors(), dtype=float)
+        if np.sum(priors) <= 0:
+            priors = np.ones_like(priors)
+        self.logits = np.log(np.maximum(priors / np.sum(priors), 1e-12))
+        self.gumbels = np.random.gumbel(size=len(priors)) if self.sample else np.zeros(len(priors))
+        self.considered = np.argsort(-(self.gumbels + self.logits), kind='stable')[:self.considered_moves]
+        self.visits = np.zeros(len(priors), dtype=int)
+        if len(self.considered) < self.considered_moves:
+            self.schedule = self.get_schedule(len(self.considered), len(self.schedule))
+
+    def get_completed_q(self, node, fully_expanded, child_expansions, evaluations):
+        """
+        :return: The evaluation of each child from the perspective of the player to move at node, rescaled to [0, 1].
+                 Children that haven't been expanded are assumed to be as good as node.
+        """
+        q = np.where(fully_expanded | (child_expansions > 0), evaluations, node.get_evaluation())
+        if not node.is_maximizing:
+            q = -q
+        return (q + 1) / 2
+
+    def sigma(self, completed_q, child_expansions, fully_expanded):
+        max_visits = np.max(child_expansions[~fully_expanded], initial=0)
+        return (self.c_visit + max_visits) * self.c_scale * completed_q
+
+    def get_scores(self, node, fully_expanded, child_expansions, evaluations):
+        return self.gumbels + self.logits + self.sigma(
+            self.get_completed_q(node, fully_expanded, child_expansions, evaluations), child_expansions,
+            fully_expanded)
+
+    def select_child(self, node, fully_expanded, child_expansions, evaluations):
+        """
+        Called by the root whenever it selects a child.
+
+        :return: The index of the child to search, or None if every considered child is fully expanded
+                 (in which case the root falls back to PUCT).
+        """
+        if self.logits is None:
+            self.initialize(node)
+        considered = self.considered[~fully_expanded[self.considered]]
+        if len(considered) == 0:
+            return None
+        target_visits = self.schedule[min(self.simulation, len(self.schedule) - 1)]
+        candidates = considered[self.visits[considered] == target_visits]
+        if len(candidates) == 0:
+            # fully expanded children don't need visits, so the schedule may run ahead of the remaining children
+            candidates = considered[self.visits[considered] == np.min(self.visits[considered])]
+        scores = self.get_scores(node, fully_expanded, child_expansions, evaluations)
+        i = candidates[np.argmax(scores[candidates])]
+        self.visits[i] += 1
+        self.simulation += 1
+        return i
+
+    def choose_child(self, root):
+        """
+        :return: The child of the root that survived sequential halving with the best score.
+        """
+        if root.fully_expanded or self.logits is None:
+            return root.choose_best_node(optimal=True)
+        fully_expanded, child_expansions, evaluations = root.get_children_statistics()
+        survivors = self.considered[fully_expanded[self.considered] |
+                                    (self.visits[self.considered] == np.max(self.visits[self.considered]))]
+        scores = self.get_scores(root, fully_expanded, child_expansions, evaluations)
+        return root.children[survivors[np.argmax(scores[survivors])]]
+
+    def get_improved_policy(self, root):
+        """
+        :return: The improved policy softmax(logit + sigma(q)) over the children of the root, which can be used as a
+                 training target instead of the visit distribution.
+        """
+        if root.fully_expanded or self.logits is None:
+            return root.choose_best_node(return_probability_distribution=True)[1]
+        fully_expanded, child_expansions, evaluations = root.get_children_statistics()
+        logits = self.logits + self.sigma(self.get_completed_q(root, fully_expanded, child_expansions, evaluations),
+                                          child_expansions, fully_expanded)
+        policy = np.exp(logits - np.max(logits))
+        return policy / np.sum(policy)
@@ -4,19 +4,43 @@ from perfect_information_game.move_selection.mcts import AbstractNode
 
 class HeuristicNode(AbstractNode):
     def __init__(self, position, parent, GameClass, network, c=np.sqrt(2), d=1, network_call_results=None,
-                 verbose=False):
-        super().__init__(position, parent, GameClass, c, verbose)
+                 verbose=False, pack_position=False, transposition_table=None, evaluate_on_visit=False,
+                 tablebase_probe=None, progressive_widening=None, search_statistics=None):
+        """
+        :param evaluate_on_visit: If True, expanding a node only evaluates the node itself instead of all of its
+                                  children. Children are created unevaluated, using only the policy of their parent,
+                                  and are evaluated when they are expanded for the first time.
+                                  This is required for progressive widening, where children are added in order of
+                                  the policy of their parent.
+        """
+        if progressive_widening is not None and not evaluate_on_visit:
+            raise ValueError('Progressive widening requires evaluate_on_visit')
+        super().__init__(position, parent, GameClass, c, verbose, pack_position, transposition_table,
+                         tablebase_probe, progressive_widening, search_statistics)
         self.network = network
         self.d = d
+        self.evaluate_on_visit = evaluate_on_visit
 
+        outcome = self.get_known_outcome(position)
         if self.fully_expanded:
-            self.heuristic = GameClass.get_winner(position)
+            self.heuristic = outcome
             self.policy = None
             self.expansions = np.inf
+            self.evaluated = True
+        elif evaluate_on_visit and network_call_results is None and parent is not None:
+            self.heuristic = None
+            self.policy = None
+            self.expansions = 0
+            self.evaluated = False
+        elif network_call_results is None:
+            with self.timer('inference'):
+                self.policy, self.heuristic = network.call(position[np.newaxis, ...])[0]
+            self.expansions = 0
+            self.evaluated = True
         else:
-            self.policy, self.heuristic = network.call(position[np.newaxis, ...])[0] if network_call_results is None \
-                else network_call_results
+            self.policy, self.heuristic = network_call_results
             self.expansions = 0
+            self.evaluated = True
 
     def count_expansions(self):
         return self.expansions
@@ -24,56 +48,140 @@ class HeuristicNode(AbstractNode):
     def get_evaluation(self):
         return self.heuristic
 
+    def get_network_requests(self, moves):
+        """
+        :param moves: The possible moves from the position of this node.
+        :return: The positions that the network needs to evaluate in order to expand this node.
+                 The corresponding network call results can then be passed to expand.
+        """
+        if not self.evaluate_on_visit:
+            return moves
+        return [] if self.evaluated else [self.position]
+
     def expand(self, moves=None, network_call_results=None):
+        """
+        :param network_call_results: The network call results for the positions given by get_network_requests.
+        """
         if self.children is not None:
             raise Exception('Node already has children!')
         if self.fully_expanded:
             raise Exception('Node is terminal!')
 
-        self.ensure_children(moves, network_call_results)
+        if self.evaluate_on_visit:
+            if not self.evaluated:
+                with self.timer('inference'):
+                    self.policy, self.heuristic = self.network.call(self.position[np.newaxis, ...])[0] \
+                        if network_call_results is None else network_call_results[0]
+                self.evaluated = True
+            self.ensure_children(moves)
+        else:
+            self.ensure_children(moves, network_call_results)
+            self.heuristic = self.get_minimax_heuristic()
         if self.children is None:
             raise Exception('Failed to create children!')
 
-        critical_value = max([child.heuristic for child in self.children]) if self.is_maximizing else \
-            min([child.heuristic for child in self.children])
-        self.heuristic = critical_value
-
-        # update heuristic for all parents if it beats their current best heuristic
-        node = self.parent
-        while node is not None:
-            if (node.is_maximizing and critical_value > node.heuristic) or \
-                    (not node.is_maximizing and critical_value < node.heuristic):
-                node.heuristic = critical_value
+        with self.timer('backup'):
+            # recompute the heuristic of all parents from their evaluated children, which can make it worse as well
+            node = self.parent
+            while node is not None:
+                heuristic = node.get_minimax_heuristic()
+                changed = heuristic != node.heuristic
+                node.heuristic = heuristic
                 node.expansions += 1
                 node = node.parent
-            else:
+                if not changed:
+                    # once a parent is reached whose heuristic doesn't change,
+                    # all further parents are also not affected
+                    break
+
+            # despite not updating heuristic values for further parents, continue to update their expansion counts
+            while node is not None:
                 node.expansions += 1
                 node = node.parent
-                # once a parent is reached that is not affected by the critical value,
-                # all further parents are also not affected
-                break
 
-        # despite not updating heuristic values for further parents, continue to update their expansion counts
-        while node is not None:
-            node.expansions += 1
-            node = node.parent
+    def get_minimax_heuristic(self):
+        """
+        :return: The best heuristic of the children of this node that have been evaluated, for the player to move.
+        """
+        heuristics = [child.heuristic for child in self.children if child.evaluated]
+        return max(heuristics) if self.is_maximizing else min(heuristics)
 
-    def set_fully_expanded(self, minimax_evaluation):
+    def get_statistics(self):
+        """
+        :return: The expansion count, value and policy of this node, which are saved by TreeFile.
+                 The value of nodes that haven't been evaluated yet is NaN.
+        """
+        return self.expansions, self.heuristic if self.evaluated else np.nan, self.policy
+
+    def set_statistics(self, expansions, value, policy):
+        self.expansions = expansions
+        self.evaluated = not np.isnan(value)
+        self.heuristic = value if self.evaluated else None
+        self.policy = policy
+
+    def set_fully_expanded(self, minimax_evaluation, fully_expanded, evaluations):
+        super().set_fully_expanded(minimax_evaluation, fully_expanded, evaluations)
         self.heuristic = minimax_evaluation
         self.expansions = np.inf
-        self.fully_expanded = True
 
-    def get_puct_heuristic_for_child(self, i):
-        exploration_term = self.c * np.sqrt(np.log(self.expansions) / (self.children[i].expansions + 1))
-        policy_term = self.d * self.policy[i]
-        return exploration_term + policy_term
+    def get_children_statistics(self):
+        fully_expanded = np.fromiter((child.fully_expanded for child in self.children), bool, len(self.children))
+        expansions = np.fromiter((child.expansions for child in self.children), float, len(self.children))
+        # children that haven't been evaluated yet are assumed to be as good as this node
+        heuristics = np.fromiter((child.heuristic if child.evaluated else self.heuristic for child in self.children),
+                                 float, len(self.children))
+        if self.virtual_losses > 0:
+            virtual_losses = np.fromiter((child.virtual_losses for child in self.children), float,
+                                         len(self.children))
+            expansions, heuristics = self.apply_virtual_losses(self.is_maximizing, fully_expanded, expansions,
+                                                               heuristics, virtual_losses)
+        return fully_expanded, expansions, heuristics
+
+    def get_puct_heuristics(self, child_expansions):
+        exploration_terms = self.c * np.sqrt(np.log(self.expansions + self.virtual_losses) / (child_expansions + 1))
+        policy_terms = self.d * self.get_child_priors()
+        return exploration_terms + policy_terms
 
     def ensure_children(self, moves=None, network_call_results=None):
-        if self.children is None:
-            moves = self.GameClass.get_possible_moves(self.position) if moves is None else moves
-            network_call_results = self.network.call(np.stack(moves, axis=0)) if network_call_results is None \
-                else network_call_results
-            self.children = [HeuristicNode(move, self, self.GameClass, self.network, self.c, self.d,
-                                           network_call_results=network_call_result, verbose=self.verbose)
-                             for move, network_call_result in zip(moves, network_call_results)]
-            self.expansions = 1
+        if self.progressive_widening is not None:
+            self.widen()
+            # nodes that were collapsed by prune keep their expansion count
+            self.expansions = max(self.expansions, 1)
+        elif self.children is None:
+            if moves is None:
+                with self.timer('move_generation'):
+                    moves = self.GameClass.get_possible_moves(self.position)
+            self.children = self.create_children(moves, network_call_results)
+            self.store_transpositions()
+            # nodes that were collapsed by prune keep their expansion count
+            self.expansions = max(self.expansions, 1)
+
+    def create_children(self, moves, network_call_results=None):
+        children = self.find_transpositions(moves)
+        if self.evaluate_on_visit:
+            # new children are evaluated when they are expanded
+            network_call_results = [None] * len(moves)
+        elif network_call_results is None:
+            # only evaluate moves that don't already have a node
+            new_indices = [i for i, child in enumerate(children) if child is None]
+            network_call_results = [None] * len(moves)
+            if len(new_indices) > 0:
+                with self.timer('inference'):
+                    new_network_call_results = self.network.call(np.stack([moves[i] for i in new_indices], axis=0))
+                for i, network_call_result in zip(new_indices, new_network_call_results):
+                    network_call_results[i] = network_call_result
+        return [HeuristicNode(move, self, self.GameClass, self.network, self.c, self.d,
+                              network_call_results=network_call_result, verbose=self.verbose,
+                              pack_position=self.pack_position, transposition_table=self.transposition_table,
+                              evaluate_on_visit=self.evaluate_on_visit, tablebase_probe=self.tablebase_probe,
+                              progressive_widening=self.progressive_widening,
+                              search_statistics=self.search_statistics)
+                if child is None else child
+                for move, child, network_call_result in zip(moves, children, network_call_results)]
+
+    def get_child_priors(self):
+        policy = np.asarray(self.policy)
+        return policy if self.move_indices is None else policy[self.move_indices]
+
+    def get_move_priors(self):
+        return self.policy
@@ -1,12 +1,15 @@
 from time import time
-from multiprocessing import Pool
 import numpy as np
 from perfect_information_game.move_selection import MoveChooser
 from perfect_information_game.move_selection.mcts import RolloutNode
 from perfect_information_game.move_selection.mcts import HeuristicNode
-
-
-# TODO: add hash table to keep track of multiple move combinations that lead to the same position
+from perfect_information_game.move_selection.mcts import TranspositionTable
+from perfect_information_game.move_selection.mcts import TablebaseProbe
+from perfect_information_game.move_selection.mcts import TreeFile
+from perfect_information_game.move_selection.mcts import NodeBudget
+from perfect_information_game.move_selection.mcts import RolloutPool
+from perfect_information_game.move_selection.mcts import ArrayTree
+from perfect_information_game.move_selection.mcts import RootParallelSearch
 
 
 class MCTS(MoveChooser):
@@ -15,23 +18,98 @@ class MCTS(MoveChooser):
     https://www.youtube.com/watch?v=UXW2yZndl7U
     """
 
-    def __init__(self, GameClass, starting_position=None, network=None, c=np.sqrt(2), d=1, threads=1):
+    def __init__(self, GameClass, starting_position=None, network=None, c=np.sqrt(2), d=1, threads=1,
+                 pack_positions=False, transpositions=False, array_tree=False, batch_size=1,
+                 evaluate_on_visit=False, reuse_tree=True, root_parallel_workers=1, max_nodes=None, prune_nodes=True,
+                 tree_stats_callback=None, pipeline_depth=2, rollout_policy=None, tablebase_manager=None,
+                 time_manager=None, progressive_widening=None, gumbel_search=None):
         """
         Either:
-        If network is provided, threads must be 1.
-        If network is not provided, then threads will be used for leaf parallelization
+        If network is provided, threads must be 1, and batch_size nodes will be selected using virtual losses and
+        evaluated together in a single network call.
+        If network is not provided, then threads will be used for leaf parallelization, with pipeline_depth leaves
+        having their rollouts executed by a RolloutPool at once.
+
+        :param pack_positions: If True, the search tree will store bit-packed positions to reduce memory usage.
+        :param transpositions: If True, move orders that lead to the same position will share a single node,
+                               using a TranspositionTable.
+        :param array_tree: If True, the search tree will be stored in an ArrayTree instead of as one object per node.
+                           Positions are always bit-packed in an ArrayTree.
+        :param evaluate_on_visit: If True, the network will only evaluate nodes when they are expanded,
+                                  instead of evaluating all of their children (see HeuristicNode).
+        :param reuse_tree: If True, the search tree will be kept between moves. The root is advanced to the chosen
+                           (or reported) position, and the rest of the tree is discarded.
+        :param root_parallel_workers: If greater than 1, then this many worker processes will each grow their own
+                                      search tree, and moves will be chosen using their merged statistics
+                                      (see RootParallelSearch). All other options apply to each worker's tree.
+        :param max_nodes: If given, the search tree is limited to this many nodes (see NodeBudget).
+        :param prune_nodes: If True, the least expanded subtrees are pruned once the tree has max_nodes nodes.
+                            Otherwise, the search stops early.
+        :param tree_stats_callback: An optional function that is called with the size of the tree and its estimated
+                                    memory per node (see NodeBudget).
+        :param rollout_policy: The RolloutPolicy used when no network is given. Defaults to random moves until the
+                               end of the game.
+        :param tablebase_manager: If a ChessTablebaseManager is given, then nodes whose positions are in its tablebases
+                                  are fully expanded with the stored outcome, and rollouts stop as soon as they reach
+                                  such a position (see TablebaseProbe).
+        :param time_manager: If a TimeManager is given, then it decides when to stop searching for each move,
+                             instead of always using the whole time limit. It isn't used with root parallelization.
+        :param progressive_widening: If a ProgressiveWidening is given, then the children of each node are added a few
+                                     at a time as it is expanded, instead of all at once. This requires
+                                     evaluate_on_visit when a network is given, and isn't supported by the array tree
+                                     or by root parallelization.
+        :param gumbel_search: If a GumbelSearch is given, then the children of the root are chosen by sequential
+                              halving instead of PUCT, and the search stops once its simulation budget is used up
+                              (or the time limit is reached). It isn't supported with progressive widening or
+                              root parallelization.
         """
         super().__init__(GameClass, starting_position)
         if network is not None and threads != 1:
-            raise Exception('Threads != 1 with Network != None')
+            raise ValueError('Threads != 1 with Network != None, use batch_size instead')
+        if network is None and batch_size != 1:
+            raise ValueError('Batch_size != 1 with Network == None, use threads instead')
+        if array_tree and transpositions:
+            raise ValueError('Transpositions are not supported by the array tree')
+        if array_tree and tablebase_manager is not None:
+            raise ValueError('Tablebases are not supported by the array tree')
+        if progressive_widening is not None and (array_tree or root_parallel_workers > 1):
+            raise ValueError('Progressive widening is not supported by the array tree or by root parallelization')
+        if progressive_widening is not None and network is not None and not evaluate_on_visit:
+            raise ValueError('Progressive widening requires evaluate_on_visit')
+        if gumbel_search is not None and (progressive_widening is not None or root_parallel_workers > 1):
+            raise ValueError('Gumbel search is not supported with progressive widening or root parallelization')
 
         self.network = network
-        if network is not None:
+        # with root parallelization, the network is only used (and initialized) by the worker processes
+        if network is not None and root_parallel_workers == 1:
             network.initialize()
         self.c = c
         self.d = d
         self.threads = threads
-        self.pool = Pool(threads) if threads > 1 else None
+        self.pack_positions = pack_positions
+        self.transpositions = transpositions
+        self.array_tree = array_tree
+        self.batch_size = batch_size
+        self.evaluate_on_visit = evaluate_on_visit
+        self.reuse_tree = reuse_tree
+        self.rollout_policy = rollout_policy
+        self.tablebase_probe = TablebaseProbe(tablebase_manager) if tablebase_manager is not None else None
+        self.time_manager = time_manager
+        self.progressive_widening = progressive_widening
+        self.gumbel_search = gumbel_search
+        self.root = None
+        self.transposition_table = None
+        self.batches = 0
+        self.batched_nodes = 0
+        self.node_budget = NodeBudget(max_nodes, prune_nodes, callback=tree_stats_callback)
+        self.root_parallel = RootParallelSearch(
+            GameClass, self.position, root_parallel_workers, network=network, c=c, d=d, threads=threads,
+            pack_positions=pack_positions, transpositions=transpositions, array_tree=array_tree,
+            batch_size=batch_size, evaluate_on_visit=evaluate_on_visit, max_nodes=max_nodes, prune_nodes=prune_nodes,
+            tree_stats_callback=tree_stats_callback, pipeline_depth=pipeline_depth, rollout_policy=rollout_policy,
+            tablebase_manager=tablebase_manager) if root_parallel_workers > 1 else None
+        self.pool = RolloutPool(GameClass, threads, pipeline_depth, rollout_policy, self.tablebase_probe) \
+            if threads > 1 and root_parallel_workers == 1 else None
 
     def choose_move(self, return_distribution=False, time_limit=10):
         if return_distribution:
@@ -40,25 +118,45 @@ class MCTS(MoveChooser):
         if self.GameClass.is_over(self.position):
             raise Exception('Game Finished!')
 
-        if self.network is None:
-            root = RolloutNode(self.position, parent=None, GameClass=self.GameClass, c=self.c,
-                               rollout_batch_size=self.threads, pool=self.pool, verbose=True)
-        else:
-            root = HeuristicNode(self.position, None, self.GameClass, self.network, self.c, self.d, verbose=True)
-
-        start_time = time()
-        while time() - start_time < time_limit:
-            best_node = root.choose_expansion_node()
+        self.search_statistics.start()
+        if self.root_parallel is not None:
+            if not self.root_parallel.is_started():
+                self.root_parallel.start()
+            chosen_positions = [position for position, _ in
+                                self.root_parallel.choose_move(time_limit, self.search_statistics)]
+            self.position = chosen_positions[-1]
+            self.search_statistics.finish()
+            return chosen_positions
 
-            # best_node will be None if the tree is fully expanded
-            if best_node is None:
-                break
+        if self.root is not None and np.all(self.root.position == self.position):
+            root = self.root
+            print(f'Reusing {root.count_expansions()} expansions from the previous search')
+        else:
+            root = self.create_root()
 
-            best_node.expand()
+        self.batches = 0
+        self.batched_nodes = 0
+        self.node_budget.reset()
+        start_counts = self.get_search_counts(self.transposition_table, self.tablebase_probe, self.node_budget)
+        if self.gumbel_search is not None:
+            self.gumbel_search.start(root)
+        self.search(root, time_limit, self.time_manager)
+        self.node_budget.report(root)
+        self.record_search_counts(self.search_statistics, start_counts, self.get_search_counts(
+            self.transposition_table, self.tablebase_probe, self.node_budget))
+        self.search_statistics.add_count('batches', self.batches)
+        self.search_statistics.tree_size = int(root.count_nodes())
 
         is_ai_player_1 = self.GameClass.is_player_1_turn(root.position)
         chosen_positions = []
         print(f'MCTS choosing move based on {root.count_expansions()} expansions!')
+        if self.transposition_table is not None:
+            self.transposition_table.print_stats()
+        if self.tablebase_probe is not None:
+            self.tablebase_probe.print_stats()
+        if self.batches > 0:
+            print(f'Batch fill rate: {100 * self.batched_nodes / (self.batches * self.batch_size):.1f}% '
+                  f'({self.batched_nodes} nodes in {self.batches} batches)')
 
         # choose moves as long as it is still the ai's turn
         while self.GameClass.is_player_1_turn(root.position) == is_ai_player_1:
@@ -66,8 +164,176 @@ class MCTS(MoveChooser):
                 best_node = root.choose_expansion_node()
                 if best_node is not None:
                     best_node.expand()
-            root = root.choose_best_node(optimal=True)
+                # rollouts and positions that were found in the tablebases don't create children
+                root.ensure_children()
+            if self.gumbel_search is not None and self.gumbel_search.root is root:
+                self.gumbel_search.finish()
+                root = self.gumbel_search.choose_child(root)
+            else:
+                root = root.choose_best_node(optimal=True)
             chosen_positions.append(root.position)
 
         print('Expected outcome: ', root.get_evaluation())
+        self.position = chosen_positions[-1]
+        self.advance_root(root)
+        self.search_statistics.finish()
         return chosen_positions
+
+    def search(self, root, time_limit, time_manager=None):
+        """
+        Expands the search tree below root for time_limit seconds, or until it is fully expanded.
+
+        :param time_manager: An optional TimeManager which decides when to stop instead.
+        :return: False if the tree is fully expanded, or if the node budget has been reached without pruning.
+        """
+        statistics = self.search_statistics
+        start_time = time()
+        if time_manager is not None:
+            time_manager.start(root, time_limit)
+        try:
+            while (not time_manager.should_stop(root) if time_manager is not None else
+                   time() - start_time < time_limit) and \
+                    (self.gumbel_search is None or not self.gumbel_search.is_finished()):
+                if self.batch_size > 1:
+                    # selection is timed separately by the nodes
+                    with statistics.timer('expansion'):
+                        expanded_nodes = root.expand_batch(self.network, self.batch_size)
+                    # no nodes will be expanded if the tree is fully expanded
+                    if expanded_nodes == 0:
+                        return False
+                    self.batches += 1
+                    self.batched_nodes += expanded_nodes
+                elif self.pool is not None:
+                    with statistics.timer('expansion'):
+                        if not self.pool.step(root, self.threads):
+                            return False
+                else:
+                    with statistics.timer('selection'):
+                        best_node = root.choose_expansion_node()
+
+                    # best_node will be None if the tree is fully expanded
+                    if best_node is None:
+                        return False
+
+                    statistics.add_node(len(best_node.get_path()) - 1)
+                    with statistics.timer('expansion'):
+                        best_node.expand()
+                with statistics.timer('pruning'):
+                    if not self.node_budget.check(root, self.flush):
+                        return False
+            return True
+        finally:
+            self.flush()
+            if time_manager is not None:
+                time_manager.finish()
+
+    @staticmethod
+    def get_search_counts(transposition_table, tablebase_probe, node_budget):
+        """
+        :return: The total lookups and hits of each cache so far, and the total number of pruned nodes.
+                 The counts from before and after a search are given to record_search_counts.
+        """
+        caches = {}
+        if transposition_table is not None:
+            caches['transpositions'] = transposition_table.lookups, transposition_table.hits
+        if tablebase_probe is not None:
+            caches['tablebases'] = tablebase_probe.probes, tablebase_probe.hits
+        return caches, node_budget.pruned_nodes
+
+    @staticmethod
+    def record_search_counts(search_statistics, start_counts, end_counts):
+        """
+        Adds the cache lookups and pruned nodes during a search to its statistics.
+        """
+        (start_caches, start_pruned_nodes), (end_caches, end_pruned_nodes) = start_counts, end_counts
+        for name, (lookups, hits) in end_caches.items():
+            # the cache may have been created after the start of the search
+            start_lookups, start_hits = start_caches.get(name, (0, 0))
+            search_statistics.add_cache(name, lookups - start_lookups, hits - start_hits)
+        search_statistics.add_count('pruned_nodes', end_pruned_nodes - start_pruned_nodes)
+
+    def flush(self):
+        """
+        Completes any expansions that are still in flight.
+        """
+        if self.pool is not None:
+            self.pool.flush()
+
+    def create_root(self):
+        # the same table is used until the tree is discarded, since unreachable nodes are automatically removed from it
+        self.transposition_table = TranspositionTable(self.GameClass) if self.transpositions else None
+        if self.array_tree:
+            return ArrayTree(self.position, self.GameClass, self.network, self.c, self.d,
+                             rollout_batch_size=self.threads, pool=self.pool, verbose=True,
+                             evaluate_on_visit=self.evaluate_on_visit, rollout_policy=self.rollout_policy,
+                             search_statistics=self.search_statistics).root
+        elif self.network is None:
+            return RolloutNode(self.position, parent=None, GameClass=self.GameClass, c=self.c,
+                               rollout_batch_size=self.threads, pool=self.pool, verbose=True,
+                               pack_position=self.pack_positions, transposition_table=self.transposition_table,
+                               rollout_policy=self.rollout_policy, tablebase_probe=self.tablebase_probe,
+                               progressive_widening=self.progressive_widening,
+                               search_statistics=self.search_statistics)
+        else:
+            return HeuristicNode(self.position, None, self.GameClass, self.network, self.c, self.d, verbose=True,
+                                 pack_position=self.pack_positions, transposition_table=self.transposition_table,
+                                 evaluate_on_visit=self.evaluate_on_visit, tablebase_probe=self.tablebase_probe,
+                                 progressive_widening=self.progressive_widening,
+                                 search_statistics=self.search_statistics)
+
+    def advance_root(self, root):
+        """
+        Makes the given node the root of the search tree for the next move, if the tree is being reused.
+        """
+        if not self.reuse_tree or root is None:
+            self.root = None
+            return
+        # delete references to the parent and siblings, so that they can be garbage collected
+        root.parent = None
+        self.root = root
+
+    def save_tree(self, path):
+        """
+        Saves the current search tree (see TreeFile), so that the search can be continued later with load_tree.
+        """
+        if self.root is None:
+            raise ValueError('There is no search tree to save')
+        self.flush()
+        print(f'Saved {TreeFile.save(self.root, path)} nodes to {path}')
+
+    def load_tree(self, path):
+        """
+        Loads a search tree that was saved by save_tree for the current position, which is used for the next move.
+        """
+        if self.array_tree or self.root_parallel is not None:
+            raise ValueError('Loading trees is not supported by the array tree or by root parallelization')
+        root = self.create_root()
+        print(f'Loaded {TreeFile.load(path, root)} nodes from {path}')
+        self.root = root
+
+    def report_user_move(self, user_chosen_position):
+        super().report_user_move(user_chosen_position)
+        if self.root_parallel is not None:
+            self.root_parallel.advance(user_chosen_position)
+            return
+        if self.root is None or self.root.children is None:
+            self.root = None
+            return
+        for child in self.root.children:
+            if np.all(child.position == user_chosen_position):
+                self.advance_root(child)
+                break
+        else:
+            self.root = None
+
+    def reset(self):
+        super().reset()
+        self.root = None
+        if self.root_parallel is not None:
+            self.root_parallel.reset(self.position)
+
+    def terminate(self):
+        if self.root_parallel is not None:
+            self.root_parallel.terminate()
+        if self.pool is not None:
+            self.pool.terminate()
@@ -0,0 +1,77 @@
+class NodeBudget:
+    """
+    Keeps the size of a search tree below max_nodes, by pruning the least expanded subtrees (see AbstractNode.prune)
+    or by stopping the search once the budget is reached.
+
+    Counting the nodes requires traversing the tree, so the tree is only counted once it could have reached the
+    budget, based on the number of nodes that were added per expansion since it was last counted.
+    """
+
+    def __init__(self, max_nodes=None, prune=True, prune_fraction=0.75, callback=None):
+        """
+        :param max_nodes: The maximum number of nodes in the tree, or None for no limit.
+        :param prune: If True, the tree is pruned down to prune_fraction * max_nodes nodes when the budget is reached.
+                      Otherwise, the search is stopped.
+        :param callback: An optional function that is called with a dict of the number of nodes in the tree,
+                         the estimated memory per node in bytes and the total number of nodes that have been pruned,
+                         each time the tree is counted.
+        """
+        self.max_nodes = max_nodes
+        self.prune = prune
+        self.prune_fraction = prune_fraction
+        self.callback = callback
+        self.pruned_nodes = 0
+        self.node_count = None
+        self.expansions_since_count = 0
+        self.expansions_until_count = 1
+
+    def reset(self):
+        """
+        Must be called when the root of the tree changes, because the previous node count is no longer valid.
+        """
+        self.node_count = None
+        self.expansions_since_count = 0
+        self.expansions_until_count = 1
+
+    def check(self, root, flush=None):
+        """
+        Must be called after each expansion.
+
+        :param flush: An optional function that completes any pending expansions, which is called before pruning.
+        :return: False if the budget has been reached and the search should stop.
+        """
+        if self.max_nodes is None:
+            return True
+        self.expansions_since_count += 1
+        if self.expansions_since_count < self.expansions_until_count:
+            return True
+
+        nodes = root.count_nodes()
+        growth = max(1, (nodes - self.node_count) / self.expansions_since_count) if self.node_count is not None \
+            else None
+        self.expansions_since_count = 0
+        if nodes > self.max_nodes:
+            if self.prune and flush is not None:
+                flush()
+            removed_nodes = root.prune(int(self.max_nodes * self.prune_fraction)) if self.prune else 0
+            if removed_nodes == 0:
+                # check again after the next expansion, in case the search is resumed from a smaller tree
+                self.expansions_until_count = 1
+                self.report(root, nodes)
+                return False
+            self.pruned_nodes += removed_nodes
+            nodes -= removed_nodes
+
+        self.node_count = nodes
+        # count again when halfway to the budget, until the growth rate is known
+        self.expansions_until_count = max(1, int((self.max_nodes - nodes) / (2 * growth))) if growth is not None \
+            else 1
+        self.report(root, nodes)
+        return True
+
+    def report(self, root, nodes=None):
+        if self.callback is None:
+            return
+        self.callback({'nodes': root.count_nodes() if nodes is None else nodes,
+                       'bytes_per_node': int(root.get_nbytes_per_node()),
+                       'pruned_nodes': self.pruned_nodes})
@@ -0,0 +1,120 @@
+from itertools import islice
+import numpy as np
+
+
+class ProgressiveWidening:
+    """
+    Limits the number of children of each node in the search tree, so that games with a large branching factor don't
+    create a node (with a full copy of the position) for every possible move as soon as a node is expanded.
+    A node with n expansions has at most ceil(constant * n ** exponent) children, which are added in order of their
+    priors as n grows. A node can only be proven once all of its moves have been added, unless one of its children is
+    already optimal.
+
+    The priors of a HeuristicNode are its policy. The moves of a RolloutNode are added in the order of
+    GameClass.iter_possible_moves, unless rank_by_heuristic is True, in which case they are ranked with
+    GameClass.heuristic_batch, evaluating chunk_size moves at a time. Note that ranking by heuristic evaluates every
+    possible move when a node is first widened, which takes O(n) time for n possible moves.
+    Each move is generated only once, by caching the moves that are passed over while moves are taken in order of
+    their priors (see LazyMoves). This can be limited to max_cached_moves per node, at the cost of generating moves
+    again.
+    """
+
+    def __init__(self, constant=1, exponent=0.5, rank_by_heuristic=False, chunk_size=256, max_cached_moves=None):
+        self.constant = constant
+        self.exponent = exponent
+        self.rank_by_heuristic = rank_by_heuristic
+        self.chunk_size = chunk_size
+        self.max_cached_moves = max_cached_moves
+
+    def get_child_limit(self, expansions):
+        """
+        :return: The maximum number of children of a node with the given number of expansions.
+        """
+        if np.isinf(expansions):
+            return np.inf
+        return max(1, int(np.ceil(self.constant * max(expansions, 1) ** self.exponent)))
+
+    def get_heuristic_priors(self, GameClass, state):
+        """
+        :return: The heuristic of each possible move for the player to move,
+                 in the order of GameClass.get_possible_moves. This evaluates every possible move.
+        """
+        moves = GameClass.iter_possible_moves(state)
+        heuristics = []
+        chunk = list(islice(moves, self.chunk_size))
+        while len(chunk) > 0:
+            heuristics.extend(GameClass.heuristic_batch(np.stack(chunk, axis=0)))
+            chunk = list(islice(moves, self.chunk_size))
+        heuristics = np.array(heuristics, dtype=float)
+        return heuristics if GameClass.is_player_1_turn(state) else -heuristics
+
+
+class LazyMoves:
+    """
+    Generates the possible moves of a position one at a time, using GameClass.iter_possible_moves.
+    If priors are given (one for each move, in the order of GameClass.get_possible_moves), then moves are taken in
+    order of decreasing prior. Moves that the generator passes before they are needed are cached, so every move is
+    generated only once. If max_cached is given, then at most that many moves are cached, and the generator is
+    restarted whenever a move that wasn't cached is needed.
+    """
+
+    def __init__(self, GameClass, state, priors=None, max_cached=None):
+        self.GameClass = GameClass
+        self.state = state
+        self.order = None if priors is None else np.argsort(-np.asarray(priors, dtype=float), kind='stable')
+        self.max_cached = max_cached
+        self.iterator = GameClass.iter_possible_moves(state)
+        # the index of the move that the iterator will generate next
+        self.next_index = 0
+        # the moves that have been generated but not taken yet, by their index
+        self.cache = {}
+        self.taken_indices = set()
+        self.exhausted = False
+
+    def take(self):
+        """
+        :return: The index of the next move (in the order of GameClass.get_possible_moves) and the move itself,
+                 or None if every move has been taken.
+        """
+        if self.exhausted:
+            return None
+        taken = len(self.taken_indices)
+        if self.order is not None and taken >= len(self.order):
+            self.exhausted = True
+            return None
+        index = taken if self.order is None else int(self.order[taken])
+        move = self.get_move(index)
+        if move is None:
+            self.exhausted = True
+            return None
+        self.taken_indices.add(index)
+        return index, move
+
+    def count_moves(self):
+        """
+        :return: The number of possible moves. Without priors, they are counted by generating every move again,
+                 unless all of them have already been taken.
+        """
+        if self.order is not None:
+            return len(self.order)
+        if self.exhausted:
+            return len(self.taken_indices)
+        return sum(1 for _ in self.GameClass.iter_possible_moves(self.state))
+
+    def get_move(self, index):
+        if index in self.cache:
+            return self.cache.pop(index)
+        if index < self.next_index:
+            # the move was passed without being cached
+            self.iterator = self.GameClass.iter_possible_moves(self.state)
+            self.next_index = 0
+        while self.next_index < index:
+            move = next(self.iterator, None)
+            if move is None:
+                return None
+            if self.next_index not in self.taken_indices and self.next_index not in self.cache and \
+                    (self.max_cached is None or len(self.cache) < self.max_cached):
+                self.cache[self.next_index] = move
+            self.next_index += 1
+        self.next_index += 1
+        return next(self.iterator, None)
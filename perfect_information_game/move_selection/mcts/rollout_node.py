@@ -1,15 +1,22 @@
 import numpy as np
 from perfect_information_game.move_selection.mcts import AbstractNode
+from perfect_information_game.move_selection.mcts import RolloutPolicy
 
 
 class RolloutNode(AbstractNode):
-    def __init__(self, position, parent, GameClass, c=np.sqrt(2), rollout_batch_size=1, pool=None, verbose=False):
-        super().__init__(position, parent, GameClass, c, verbose)
+    def __init__(self, position, parent, GameClass, c=np.sqrt(2), rollout_batch_size=1, pool=None, verbose=False,
+                 pack_position=False, transposition_table=None, rollout_policy=None, tablebase_probe=None,
+                 progressive_widening=None, search_statistics=None):
+        super().__init__(position, parent, GameClass, c, verbose, pack_position, transposition_table,
+                         tablebase_probe, progressive_widening, search_statistics)
         self.rollout_batch_size = rollout_batch_size
         self.pool = pool
+        # the default policy plays random moves until the end of the game
+        self.rollout_policy = RolloutPolicy() if rollout_policy is None else rollout_policy
 
+        outcome = self.get_known_outcome(position)
         if self.fully_expanded:
-            self.rollout_sum = GameClass.get_winner(position)
+            self.rollout_sum = outcome
             self.rollout_count = np.inf
         else:
             self.rollout_sum = 0
@@ -22,37 +29,80 @@ class RolloutNode(AbstractNode):
         return self.rollout_sum / self.rollout_count if not self.fully_expanded else self.rollout_sum
 
     def ensure_children(self):
-        if self.children is None:
-            self.children = [RolloutNode(move, self, self.GameClass, self.c, self.rollout_batch_size, self.pool,
-                                         self.verbose)
-                             for move in self.GameClass.get_possible_moves(self.position)]
+        if self.progressive_widening is not None:
+            self.widen()
+        elif self.children is None:
+            with self.timer('move_generation'):
+                moves = self.GameClass.get_possible_moves(self.position)
+            self.children = self.create_children(moves)
+            self.store_transpositions()
 
-    def set_fully_expanded(self, minimax_evaluation):
+    def create_children(self, moves):
+        """
+        :return: A list with a child node (or an existing node from the transposition table) for each of the moves.
+        """
+        return [RolloutNode(move, self, self.GameClass, self.c, self.rollout_batch_size, self.pool, self.verbose,
+                            self.pack_position, self.transposition_table, self.rollout_policy, self.tablebase_probe,
+                            self.progressive_widening, self.search_statistics)
+                if child is None else child
+                for move, child in zip(moves, self.find_transpositions(moves))]
+
+    def get_move_priors(self):
+        if not self.progressive_widening.rank_by_heuristic:
+            return None
+        return self.progressive_widening.get_heuristic_priors(self.GameClass, self.position)
+
+    def get_statistics(self):
+        """
+        :return: The expansion count, value and policy of this node, which are saved by TreeFile.
+        """
+        return self.rollout_count, self.rollout_sum, None
+
+    def set_statistics(self, expansions, value, policy):
+        self.rollout_count = expansions
+        self.rollout_sum = value
+
+    def set_fully_expanded(self, minimax_evaluation, fully_expanded, evaluations):
+        super().set_fully_expanded(minimax_evaluation, fully_expanded, evaluations)
         self.rollout_sum = minimax_evaluation
         self.rollout_count = np.inf
-        self.fully_expanded = True
 
-    def get_puct_heuristic_for_child(self, i):
-        exploration_term = self.c * np.sqrt(np.log(self.rollout_count) / self.children[i].rollout_count) \
-            if self.children[i].rollout_count > 0 else np.inf
-        return exploration_term
+    def get_children_statistics(self):
+        fully_expanded = np.fromiter((child.fully_expanded for child in self.children), bool, len(self.children))
+        rollout_counts = np.fromiter((child.rollout_count for child in self.children), float, len(self.children))
+        rollout_sums = np.fromiter((child.rollout_sum for child in self.children), float, len(self.children))
+        # avoid division by 0 for children without any rollouts
+        evaluations = np.where(fully_expanded, rollout_sums, rollout_sums / np.maximum(rollout_counts, 1))
+        if self.virtual_losses > 0:
+            virtual_losses = np.fromiter((child.virtual_losses for child in self.children), float,
+                                         len(self.children))
+            rollout_counts, evaluations = self.apply_virtual_losses(self.is_maximizing, fully_expanded, rollout_counts,
+                                                                    evaluations, virtual_losses)
+        return fully_expanded, rollout_counts, evaluations
+
+    def get_puct_heuristics(self, child_expansions):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(child_expansions > 0, self.c * np.sqrt(np.log(self.rollout_count) / child_expansions),
+                            np.inf)
 
     def expand(self):
-        rollout_sum = sum(self.pool.starmap(self.execute_single_rollout, [() for _ in range(self.rollout_batch_size)])
-                          if self.pool is not None else
-                          [self.execute_single_rollout() for _ in range(self.rollout_batch_size)])
+        with self.timer('rollout'):
+            rollout_sum = self.pool.rollout(self.position, self.rollout_batch_size) if self.pool is not None else \
+                sum(self.execute_single_rollout() for _ in range(self.rollout_batch_size))
+        self.backup(rollout_sum, self.rollout_batch_size)
 
-        # update this node and all its parents
-        node = self
-        while node is not None:
-            node.rollout_sum += rollout_sum
-            node.rollout_count += self.rollout_batch_size
-            node = node.parent
+    def backup(self, rollout_sum, rollout_count):
+        """
+        Updates this node and all its parents with the results of rollouts from this node.
+        """
+        with self.timer('backup'):
+            node = self
+            while node is not None:
+                # parents may have been proven to be fully expanded while the rollouts were in flight (see RolloutPool)
+                if not node.fully_expanded:
+                    node.rollout_sum += rollout_sum
+                    node.rollout_count += rollout_count
+                node = node.parent
 
     def execute_single_rollout(self):
-        state = self.position
-        while not self.GameClass.is_over(state):
-            sub_states = self.GameClass.get_possible_moves(state)
-            state = sub_states[np.random.randint(len(sub_states))]
-
-        return self.GameClass.get_winner(state)
+        return self.rollout_policy.rollout(self.GameClass, self.position, self.tablebase_probe)
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+class RolloutPolicy:
+    """
+    Chooses the moves that are played in the rollouts of RolloutNodes and ArrayTrees, and decides when to stop them.
+    The default policy plays uniformly random moves until the end of the game.
+
+    Rollouts can instead be truncated after max_depth moves, in which case the final position is scored using
+    GameClass.heuristic squashed into (-1, 1) by tanh(heuristic / heuristic_scale).
+    Moves can also be chosen greedily with respect to GameClass.heuristic_batch with probability 1 - epsilon,
+    and captures (see GameClass.get_captures) can be played before any other moves.
+    """
+
+    def __init__(self, max_depth=None, epsilon=1, heuristic_scale=1, captures_first=False):
+        """
+        :param max_depth: The maximum number of moves in each rollout, or None to play until the end of the game.
+        :param epsilon: The probability of playing a random move instead of the move with the best heuristic for the
+                        player to move. Greedy moves require an evaluation of every possible move, so they are slower.
+        :param heuristic_scale: The heuristic is divided by this before being squashed, which should be roughly the
+                                size of a decisive advantage (e.g. 10 for the material heuristic of Chess).
+        :param captures_first: If True, a random capture is played whenever one is possible.
+        """
+        self.max_depth = max_depth
+        self.epsilon = epsilon
+        self.heuristic_scale = heuristic_scale
+        self.captures_first = captures_first
+
+    def choose_move(self, GameClass, state, moves):
+        if self.captures_first:
+            captures = np.flatnonzero(GameClass.get_captures(state, moves))
+            if len(captures) > 0:
+                return moves[captures[np.random.randint(len(captures))]]
+        if self.epsilon >= 1 or np.random.random() < self.epsilon:
+            return moves[np.random.randint(len(moves))]
+        heuristics = GameClass.heuristic_batch(moves)
+        return moves[np.argmax(heuristics) if GameClass.is_player_1_turn(state) else np.argmin(heuristics)]
+
+    def evaluate(self, GameClass, state):
+        """
+        :return: The squashed heuristic of a position where a rollout was truncated.
+        """
+        return np.tanh(GameClass.heuristic(state) / self.heuristic_scale)
+
+    def rollout(self, GameClass, state, tablebase_probe=None):
+        """
+        Plays moves from the given state until the end of the game, or until max_depth moves have been played.
+
+        :param tablebase_probe: If a TablebaseProbe is given, then the rollout stops as soon as it reaches a position
+                                that is in the tablebases.
+        :return: The outcome of the game, or the squashed heuristic of the final position if it was truncated.
+        """
+        depth = 0
+        while not GameClass.is_over(state):
+            if tablebase_probe is not None:
+                result = tablebase_probe.probe(state)
+                if result is not None:
+                    return result[0]
+            if self.max_depth is not None and depth >= self.max_depth:
+                return self.evaluate(GameClass, state)
+            moves = GameClass.get_possible_moves(state)
+            if self.captures_first or self.epsilon < 1:
+                moves = np.array(moves)
+            state = self.choose_move(GameClass, state, moves)
+            depth += 1
+
+        return GameClass.get_winner(state)
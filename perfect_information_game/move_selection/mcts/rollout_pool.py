@@ -0,0 +1,107 @@
+from collections import deque
+import numpy as np
+from perfect_information_game.move_selection.mcts import RolloutPolicy
+
+# the GameClass, RolloutPolicy and TablebaseProbe of each worker process, which are set once when the worker is started
+worker_GameClass = None
+worker_rollout_policy = None
+worker_tablebase_probe = None
+
+
+def initialize_worker(GameClass, rollout_policy, tablebase_probe):
+    global worker_GameClass, worker_rollout_policy, worker_tablebase_probe
+    worker_GameClass = GameClass
+    worker_rollout_policy = rollout_policy
+    worker_tablebase_probe = tablebase_probe
+    # forked workers would otherwise share the random state of the parent process, and execute identical rollouts
+    np.random.seed()
+
+
+def execute_packed_rollout(packed_position):
+    return worker_rollout_policy.rollout(worker_GameClass, worker_GameClass.unpack_state(packed_position),
+                                         worker_tablebase_probe)
+
+
+class RolloutPool:
+    """
+    A pool of long-lived worker processes which execute random rollouts for RolloutNodes and ArrayTrees.
+    The workers are given the GameClass and RolloutPolicy once when they are started, so each task only contains a
+    bit-packed position and each result is only the outcome of the rollout.
+
+    step keeps up to pipeline_depth leaves in flight at once, using virtual losses to choose different leaves,
+    so that the search tree is traversed while the workers are busy instead of waiting for each leaf in turn.
+    """
+
+    def __init__(self, GameClass, workers, pipeline_depth=2, rollout_policy=None, tablebase_probe=None):
+        """
+        :param tablebase_probe: If given, each worker uses its own copy of the TablebaseProbe to stop rollouts early,
+                                so its statistics don't include the probes made by the workers.
+        """
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pool
+
+        self.GameClass = GameClass
+        self.pipeline_depth = pipeline_depth
+        rollout_policy = RolloutPolicy() if rollout_policy is None else rollout_policy
+        self.pool = Pool(workers, initializer=initialize_worker, initargs=(GameClass, rollout_policy, tablebase_probe))
+        # the node, the path that received virtual losses, and the pending result for each leaf in flight
+        self.in_flight = deque()
+
+    def submit(self, position, rollouts):
+        """
+        :return: An AsyncResult for the outcomes of the given number of rollouts from the given position.
+        """
+        return self.pool.map_async(execute_packed_rollout, [self.GameClass.pack_state(position)] * rollouts,
+                                   chunksize=1)
+
+    def rollout(self, position, rollouts):
+        """
+        :return: The sum of the outcomes of the given number of rollouts from the given position.
+        """
+        return sum(self.submit(position, rollouts).get())
+
+    def step(self, root, rollouts):
+        """
+        Chooses leaves to expand until pipeline_depth leaves have rollouts in flight, and then waits for the oldest
+        leaf and backs up its results.
+
+        :return: False if there were no leaves to expand, because the tree is fully expanded.
+        """
+        while len(self.in_flight) < self.pipeline_depth:
+            with root.timer('selection'):
+                node = root.choose_expansion_node()
+            # stop early if virtual losses weren't enough to choose a different leaf
+            if node is None or node in [pending_node for pending_node, _, _ in self.in_flight]:
+                break
+            path = node.get_path()
+            if root.search_statistics is not None:
+                root.search_statistics.add_node(len(path) - 1)
+            for ancestor in path:
+                ancestor.virtual_losses += 1
+            self.in_flight.append((node, path, self.submit(node.position, rollouts)))
+
+        if len(self.in_flight) == 0:
+            return False
+        self.complete_oldest()
+        return True
+
+    def complete_oldest(self):
+        node, path, result = self.in_flight.popleft()
+        with node.timer('rollout'):
+            outcomes = result.get()
+        for ancestor in path:
+            ancestor.virtual_losses -= 1
+        node.backup(sum(outcomes), len(outcomes))
+
+    def flush(self):
+        """
+        Backs up the results of all leaves in flight. Must be called before the tree is changed (e.g. by pruning or
+        advancing the root) or used to choose a move.
+        """
+        while len(self.in_flight) > 0:
+            self.complete_oldest()
+
+    def terminate(self):
+        self.in_flight.clear()
+        self.pool.terminate()
+        self.pool.join()
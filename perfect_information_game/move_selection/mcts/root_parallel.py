@@ -0,0 +1,242 @@
+import numpy as np
+
+
+class RootParallelSearch:
+    """
+    Root parallelization of Monte Carlo Tree Search.
+    Each worker process grows its own independent search tree (using a different random seed) from the same position,
+    and periodically writes the statistics of the children of its root into shared memory.
+    Moves are chosen using the statistics of all workers merged together.
+    """
+
+    def __init__(self, GameClass, position, workers, merge_interval=0.1, ponder=False, **mcts_kwargs):
+        """
+        :param workers: The number of worker processes, each with its own search tree.
+        :param merge_interval: The number of seconds between each time a worker publishes its root statistics.
+        :param ponder: If True, the workers will continue searching while waiting for the next command,
+                       which allows the other player's time to be used.
+        :param mcts_kwargs: The arguments used to create the MCTS of each worker.
+        """
+        self.GameClass = GameClass
+        self.position = position
+        self.workers = workers
+        self.merge_interval = merge_interval
+        self.ponder = ponder
+        self.mcts_kwargs = mcts_kwargs
+        # the maximum number of children of any node
+        self.max_children = int(np.prod(GameClass.MOVE_SHAPE)) if hasattr(GameClass, 'MOVE_SHAPE') else 1024
+        self.shared_memory = None
+        self.statistics = None
+        self.pipes = []
+        self.processes = []
+
+    def is_started(self):
+        return self.shared_memory is not None
+
+    def start(self):
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pipe, Process
+        from multiprocessing.shared_memory import SharedMemory
+
+        # for each worker, the first row is [number of children, root expansions, unused],
+        # and the following rows are [expansions, evaluation, fully expanded] for each child of the root
+        shape = (self.workers, self.max_children + 1, 3)
+        self.shared_memory = SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(float).itemsize)
+        self.statistics = np.ndarray(shape, dtype=float, buffer=self.shared_memory.buf)
+        self.statistics[...] = 0
+
+        seeds = np.random.randint(2 ** 31, size=self.workers)
+        for worker, seed in enumerate(seeds):
+            parent_pipe, worker_pipe = Pipe()
+            process = Process(target=self.worker_loop,
+                              args=(self.GameClass, self.position, worker, seed, self.shared_memory.name, shape,
+                                    worker_pipe, self.merge_interval, self.ponder, self.mcts_kwargs))
+            process.start()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+
+    def terminate(self):
+        if not self.is_started():
+            return
+        for pipe in self.pipes:
+            pipe.send(None)
+        for process in self.processes:
+            process.join()
+        self.pipes = []
+        self.processes = []
+        self.statistics = None
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+        self.shared_memory = None
+
+    def search(self, time_limit):
+        """
+        Instructs all workers to search for time_limit seconds, and waits for them to publish their statistics.
+
+        :return: The total number of expansions over all workers.
+        """
+        for pipe in self.pipes:
+            pipe.send(('search', time_limit))
+        return sum(pipe.recv() for pipe in self.pipes)
+
+    def advance(self, position):
+        """
+        Advances the root of every worker's search tree to the given position.
+        """
+        for pipe in self.pipes:
+            pipe.send(('advance', position))
+        self.position = position
+
+    def reset(self, position):
+        for pipe in self.pipes:
+            pipe.send(('reset', position))
+        self.position = position
+
+    def get_merged_statistics(self):
+        """
+        Merges the statistics of the children of the root of each worker's tree.
+        Expansions are summed, evaluations are averaged (weighted by expansions),
+        and a child is fully expanded if any worker has proven its value.
+
+        :return: fully_expanded, expansions, evaluations
+        """
+        child_count = int(self.statistics[0, 0, 0])
+        if np.any(self.statistics[:, 0, 0] != child_count):
+            raise Exception('Workers have different root positions!')
+        children = self.statistics[:, 1:child_count + 1, :]
+        worker_expansions, worker_evaluations, worker_fully_expanded = \
+            children[..., 0], children[..., 1], children[..., 2] != 0
+
+        finite_expansions = np.where(worker_fully_expanded, 0, worker_expansions)
+        expansions = np.sum(finite_expansions, axis=0)
+        weighted_evaluations = np.sum(finite_expansions * np.nan_to_num(worker_evaluations), axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            evaluations = np.where(expansions > 0, weighted_evaluations / expansions,
+                                   np.mean(np.nan_to_num(worker_evaluations), axis=0))
+
+        fully_expanded = np.any(worker_fully_expanded, axis=0)
+        proving_workers = np.argmax(worker_fully_expanded, axis=0)
+        evaluations = np.where(fully_expanded, worker_evaluations[proving_workers, np.arange(child_count)],
+                               evaluations)
+        expansions = np.where(fully_expanded, np.inf, expansions)
+        return fully_expanded, expansions, evaluations
+
+    def choose_best_child(self):
+        """
+        :return: The position of the best child of the root using the merged statistics,
+                 and the probability distribution over all children.
+        """
+        is_maximizing = self.GameClass.is_player_1_turn(self.position)
+        optimal_value = 1 if is_maximizing else -1
+        fully_expanded, expansions, evaluations = self.get_merged_statistics()
+
+        proven_optimal = fully_expanded & (evaluations == optimal_value)
+        if np.any(proven_optimal):
+            distribution = proven_optimal.astype(float)
+        else:
+            # use the best evaluation as a proxy for the chance of winning the game, as in AbstractNode
+            winning_chance = (np.max(evaluations * optimal_value)) / 2 + 0.5
+            total_expansions = np.sum(expansions[~fully_expanded]) + 1
+            distribution = np.where(fully_expanded,
+                                    np.where(evaluations == -optimal_value, 0,
+                                             total_expansions * (1 - winning_chance)),
+                                    expansions)
+        distribution = distribution / np.sum(distribution) if np.sum(distribution) > 0 else \
+            np.full_like(distribution, 1 / len(distribution), dtype=float)
+        moves = self.GameClass.get_possible_moves(self.position)
+        return moves[int(np.argmax(distribution))], distribution
+
+    def choose_move(self, time_limit, search_statistics=None):
+        """
+        Searches for time_limit seconds, and then chooses moves using the merged statistics
+        as long as it is still the same player's turn.
+
+        :param search_statistics: An optional SearchStatistics, to which the expansions of all workers are added.
+
+        :return: A list of the chosen positions and their probability distributions.
+        """
+        is_ai_player_1 = self.GameClass.is_player_1_turn(self.position)
+        chosen_positions = []
+        while self.GameClass.is_player_1_turn(self.position) == is_ai_player_1 and \
+                not self.GameClass.is_over(self.position):
+            expansions = self.search(time_limit if len(chosen_positions) == 0 else 0)
+            if search_statistics is not None:
+                search_statistics.add_nodes(expansions)
+            if len(chosen_positions) == 0:
+                print(f'Root parallel MCTS choosing move based on {expansions} expansions '
+                      f'from {self.workers} workers!')
+            position, distribution = self.choose_best_child()
+            self.advance(position)
+            chosen_positions.append((position, distribution))
+        return chosen_positions
+
+    @staticmethod
+    def worker_loop(GameClass, position, worker, seed, shared_memory_name, shape, worker_pipe, merge_interval,
+                    ponder, mcts_kwargs):
+        # Note: these imports are within functions to avoid a circular import with MCTS
+        from multiprocessing.shared_memory import SharedMemory
+        from perfect_information_game.move_selection.mcts import MCTS
+
+        np.random.seed(seed)
+        shared_memory = SharedMemory(name=shared_memory_name)
+        statistics = np.ndarray(shape, dtype=float, buffer=shared_memory.buf)[worker]
+        mcts = MCTS(GameClass, position, reuse_tree=True, **mcts_kwargs)
+        mcts.root = mcts.create_root()
+
+        def write_statistics():
+            root = mcts.root
+            if root.children is None:
+                statistics[0, :] = [0, root.count_expansions(), 0]
+                return
+            fully_expanded, expansions, evaluations = root.get_children_statistics()
+            statistics[1:len(fully_expanded) + 1, 0] = expansions
+            statistics[1:len(fully_expanded) + 1, 1] = evaluations
+            statistics[1:len(fully_expanded) + 1, 2] = fully_expanded
+            statistics[0, :] = [len(fully_expanded), root.count_expansions(), 0]
+
+        def search(time_limit):
+            """
+            Searches for time_limit seconds, publishing the root statistics every merge_interval seconds.
+
+            :return: False if the tree is fully expanded.
+            """
+            searching = True
+            while time_limit > 0 and searching:
+                searching = mcts.search(mcts.root, min(time_limit, merge_interval))
+                time_limit -= merge_interval
+                write_statistics()
+            return searching
+
+        pondering = ponder
+        while True:
+            if pondering and not worker_pipe.poll():
+                pondering = search(merge_interval)
+                continue
+
+            command = worker_pipe.recv()
+            if command is None:
+                break
+            command, argument = command
+            if command == 'search':
+                search(argument)
+                if mcts.root.children is None and not GameClass.is_over(mcts.position):
+                    mcts.root.ensure_children()
+                write_statistics()
+                worker_pipe.send(mcts.root.count_expansions())
+                # stay idle until the chosen move is reported, so that the statistics aren't modified while merging
+                pondering = False
+                continue
+
+            if command == 'advance':
+                mcts.report_user_move(argument)
+            elif command == 'reset':
+                mcts.position = argument
+                mcts.root = None
+            if mcts.root is None:
+                mcts.root = mcts.create_root()
+            mcts.node_budget.reset()
+            pondering = ponder and not GameClass.is_over(mcts.position)
+
+        mcts.terminate()
+        del statistics
+        shared_memory.close()
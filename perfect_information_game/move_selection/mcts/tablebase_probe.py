@@ -0,0 +1,48 @@
+from time import time
+import numpy as np
+
+
+class TablebaseProbe:
+    """
+    Looks up positions that are reached during a search in the tablebases of a ChessTablebaseManager,
+    so that nodes and rollouts whose outcome is already known don't need to be searched.
+    Positions with more pieces than the largest available tablebase are skipped without being looked up.
+    """
+    # the tablebases store draws (e.g. by repetition) with an infinite terminal distance, which is replaced by the
+    # largest distance that they can encode, so that proof depths remain integers
+    DRAW_DISTANCE = 2 ** 10 - 1
+
+    def __init__(self, tablebase_manager):
+        self.tablebase_manager = tablebase_manager
+        self.GameClass = tablebase_manager.GameClass
+        self.max_pieces = max((sum(character.isalpha() for character in descriptor)
+                               for descriptor in tablebase_manager.available_tablebases), default=0)
+        self.probes = 0
+        self.hits = 0
+        self.probe_time = 0
+
+    def probe(self, state):
+        """
+        :return: The outcome and terminal distance of the given position, or None if it isn't in the tablebases.
+        """
+        if np.sum(state[..., :12]) > self.max_pieces:
+            return None
+        start_time = time()
+        outcome, terminal_distance = self.tablebase_manager.query_position(state, outcome_only=True)
+        self.probe_time += time() - start_time
+        self.probes += 1
+        if np.isnan(outcome):
+            return None
+        self.hits += 1
+        if np.isinf(terminal_distance):
+            terminal_distance = self.DRAW_DISTANCE
+        return outcome, int(terminal_distance)
+
+    def get_stats(self):
+        return {'probes': self.probes, 'hits': self.hits, 'hit_rate': self.hits / max(self.probes, 1),
+                'probe_time': self.probe_time}
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f'Tablebases: {stats["hits"]} hits out of {stats["probes"]} probes ({100 * stats["hit_rate"]:.1f}%), '
+              f'{stats["probe_time"]:.2f}s spent probing')
@@ -0,0 +1,123 @@
+from time import time
+import numpy as np
+
+
+class TimeManager:
+    """
+    Decides when to stop searching for a move, instead of always using the whole time limit.
+
+    The search is stopped early if there is only one legal move, if the root has been proven, or if the most
+    expanded child of the root can't be overtaken by the runner-up in the remaining time, at the rate of expansions
+    so far. Fully expanded children aren't compared, because they aren't chosen based on their expansion counts.
+    If max_extension is greater than 0, then the search may continue past the time limit (by up to
+    max_extension * time_limit) while the position is unstable, meaning that the most expanded child changed during
+    the last 10% of the time limit or that it doesn't have the best evaluation.
+    """
+
+    def __init__(self, early_stopping=True, max_extension=0, check_interval=0.05, verbose=True):
+        """
+        :param check_interval: The number of seconds between each time the statistics of the root are checked.
+        :param verbose: If True, the time that was saved (or the extra time that was used) is printed after each move.
+        """
+        self.early_stopping = early_stopping
+        self.max_extension = max_extension
+        self.check_interval = check_interval
+        self.verbose = verbose
+        self.total_time_saved = 0
+        self.start_time = None
+        self.time_limit = None
+        self.start_expansions = None
+        self.next_check = None
+        self.best_child = None
+        self.best_child_changed = None
+        self.reason = None
+
+    def start(self, root, time_limit):
+        self.start_time = time()
+        self.time_limit = time_limit
+        self.start_expansions = root.count_expansions()
+        self.next_check = self.start_time
+        self.best_child = None
+        self.best_child_changed = self.start_time
+        self.reason = None
+        if root.fully_expanded:
+            self.reason = 'root proven'
+        elif self.early_stopping and len(root.GameClass.get_possible_moves(root.position)) == 1:
+            self.reason = 'only one legal move'
+
+    def should_stop(self, root):
+        """
+        Must be called before each expansion.
+        """
+        if self.reason is not None:
+            return True
+        now = time()
+        if now < self.next_check:
+            return False
+        elapsed = now - self.start_time
+        # always check at the time limit itself
+        self.next_check = now + self.check_interval if elapsed >= self.time_limit else \
+            min(now + self.check_interval, self.start_time + self.time_limit)
+
+        if root.fully_expanded:
+            self.reason = 'root proven'
+            return True
+        if root.children is None:
+            if elapsed >= self.time_limit:
+                self.reason = 'time limit'
+            return self.reason is not None
+
+        fully_expanded, expansions, evaluations = root.get_children_statistics()
+        unproven = np.flatnonzero(~fully_expanded)
+        if len(unproven) == 0:
+            # the root will be proven by the next selection
+            return False
+        order = unproven[np.argsort(expansions[unproven])[::-1]]
+        if order[0] != self.best_child:
+            self.best_child = order[0]
+            self.best_child_changed = now
+
+        if elapsed >= self.time_limit:
+            if elapsed >= self.time_limit * (1 + self.max_extension):
+                self.reason = 'time limit' if self.max_extension == 0 else 'extended time limit'
+                return True
+            if self.is_unstable(root, now, order, expansions, evaluations):
+                return False
+            self.reason = 'time limit'
+            return True
+
+        new_expansions = root.count_expansions() - self.start_expansions
+        # the expansion rate is only estimated after the first check interval
+        if self.early_stopping and elapsed >= self.check_interval and new_expansions > 0:
+            expansion_rate = new_expansions / elapsed
+            remaining_expansions = expansion_rate * (self.time_limit - elapsed)
+            runner_up_expansions = expansions[order[1]] if len(order) > 1 else 0
+            if expansions[order[0]] - runner_up_expansions > remaining_expansions:
+                self.reason = 'runner-up cannot catch up'
+                return True
+        return False
+
+    def is_unstable(self, root, now, order, expansions, evaluations):
+        if now - self.best_child_changed < 0.1 * self.time_limit:
+            return True
+        explored = order[expansions[order] > 0]
+        if len(explored) == 0:
+            return False
+        best_evaluated = explored[np.argmax(evaluations[explored]) if root.is_maximizing
+                                  else np.argmin(evaluations[explored])]
+        return best_evaluated != order[0]
+
+    def finish(self):
+        """
+        Must be called when the search stops, including when it stops because the tree is fully expanded.
+
+        :return: The number of seconds that were saved, which is negative if the time limit was extended.
+        """
+        elapsed = time() - self.start_time
+        time_saved = self.time_limit - elapsed
+        self.total_time_saved += time_saved
+        if self.verbose:
+            print(f'Stopped searching after {elapsed:.2f}s of {self.time_limit}s '
+                  f'({self.reason if self.reason is not None else "search finished"}), saved {time_saved:.2f}s '
+                  f'({self.total_time_saved:.2f}s in total)')
+        return time_saved
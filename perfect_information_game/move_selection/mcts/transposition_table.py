@@ -0,0 +1,54 @@
+from weakref import WeakValueDictionary
+import numpy as np
+
+
+class TranspositionTable:
+    """
+    Maps positions to the search tree nodes that represent them,
+    so that different move orders which reach the same position share a single node (turning the tree into a DAG).
+
+    Nodes are keyed by their depth as well as their position. Transpositions almost always occur at the same depth,
+    and including it guarantees that the graph stays acyclic in games where positions can repeat (i.e. Chess).
+    Nodes are stored using weak references, so subtrees that are no longer reachable from the root are discarded.
+    """
+
+    def __init__(self, GameClass):
+        self.GameClass = GameClass
+        self.nodes = WeakValueDictionary()
+
+        self.lookups = 0
+        self.hits = 0
+        # number of position evaluations (i.e. network calls or terminal checks) avoided by reusing nodes
+        self.saved_evaluations = 0
+        # number of expansions that had already been done on reused nodes, and would otherwise need to be repeated
+        self.saved_expansions = 0
+
+    def get_key(self, position, depth):
+        return depth, self.GameClass.pack_state(position)
+
+    def lookup(self, position, depth):
+        """
+        :return: The existing node for the given position and depth, or None if there is no such node.
+        """
+        self.lookups += 1
+        node = self.nodes.get(self.get_key(position, depth))
+        if node is not None:
+            self.hits += 1
+            self.saved_evaluations += 1
+            if not np.isinf(node.count_expansions()):
+                self.saved_expansions += node.count_expansions()
+        return node
+
+    def store(self, node):
+        self.nodes[self.get_key(node.position, node.depth)] = node
+
+    def get_stats(self):
+        return {'positions': len(self.nodes), 'lookups': self.lookups, 'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups > 0 else 0,
+                'saved_evaluations': self.saved_evaluations, 'saved_expansions': self.saved_expansions}
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f'Transposition table: {stats["hits"]} hits out of {stats["lookups"]} lookups '
+              f'({100 * stats["hit_rate"]:.1f}%), saved {stats["saved_evaluations"]} evaluations and '
+              f'{stats["saved_expansions"]} expansions')
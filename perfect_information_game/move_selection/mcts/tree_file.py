@@ -0,0 +1,189 @@
+import json
+import numpy as np
+
+
+class TreeFile:
+    """
+    Saves search trees of RolloutNodes or HeuristicNodes to disk, and loads them so that the search can be continued
+    (e.g. over several sessions, or in another process).
+
+    The file starts with a JSON header line, followed by chunks of at most chunk_size records, so that neither saving
+    nor loading needs the whole file in memory at once. Each chunk starts with its record and policy counts,
+    followed by the records and then the policies of the nodes in the chunk.
+    There is one record for each parent-child edge, in breadth first order starting with the root (which has a parent
+    of -1), so the children of each node are consecutive. The record of the first edge to a node stores the node
+    itself: its bit-packed position, expansion count, value, proof depth and the policy that gives the priors of its
+    children. The records of further edges to a node that is shared due to transpositions only link to it.
+    """
+
+    VERSION = 1
+
+    @staticmethod
+    def get_dtype(position_bytes):
+        return np.dtype([('parent', '<i8'), ('link', '<i8'), ('expansions', '<f8'), ('value', '<f8'),
+                         ('fully_expanded', '?'), ('proof_depth', '<i4'), ('child_count', '<i4'),
+                         ('policy_length', '<i4'), ('position', np.uint8, (position_bytes,))])
+
+    @staticmethod
+    def get_node_type(node):
+        if hasattr(node, 'rollout_count'):
+            return 'rollout'
+        if hasattr(node, 'heuristic'):
+            return 'heuristic'
+        raise ValueError(f'{type(node).__name__} trees can not be saved')
+
+    @staticmethod
+    def save(root, path, chunk_size=4096):
+        """
+        Saves the subtree of root to the given path.
+
+        :return: The number of distinct nodes that were saved.
+        """
+        if root.progressive_widening is not None:
+            raise ValueError('Trees that use progressive widening can not be saved')
+        GameClass = root.GameClass
+        position_bytes = len(GameClass.pack_state(root.position))
+        dtype = TreeFile.get_dtype(position_bytes)
+        header = {'version': TreeFile.VERSION, 'game': GameClass.__name__, 'node_type': TreeFile.get_node_type(root),
+                  'position_bytes': position_bytes}
+
+        with open(path, 'wb') as fout:
+            fout.write((json.dumps(header) + '\n').encode())
+            records = np.zeros(chunk_size, dtype=dtype)
+            policies = []
+            count = 0
+
+            def write_chunk():
+                nonlocal policies, count
+                policy_values = np.concatenate(policies).astype('<f4') if len(policies) > 0 else np.zeros(0, '<f4')
+                fout.write(np.array([count, len(policy_values)], dtype='<i8').tobytes())
+                fout.write(records[:count].tobytes())
+                fout.write(policy_values.tobytes())
+                policies = []
+                count = 0
+
+            # ids of the nodes that have been saved, which are their indices in the order that they are saved
+            ids = {}
+            queue = [(-1, root)]
+            i = 0
+            while i < len(queue):
+                parent, node = queue[i]
+                i += 1
+                record = records[count]
+                record['parent'] = parent
+                if id(node) in ids:
+                    record['link'] = ids[id(node)]
+                else:
+                    ids[id(node)] = len(ids)
+                    record['link'] = -1
+                    expansions, value, policy = node.get_statistics()
+                    record['expansions'] = expansions
+                    record['value'] = value
+                    record['fully_expanded'] = node.fully_expanded
+                    record['proof_depth'] = -1 if node.proof_depth is None else node.proof_depth
+                    record['child_count'] = -1 if node.children is None else len(node.children)
+                    record['policy_length'] = -1 if policy is None else len(policy)
+                    record['position'] = np.frombuffer(GameClass.pack_state(node.position), dtype=np.uint8)
+                    if policy is not None:
+                        policies.append(np.asarray(policy, dtype=float))
+                    if node.children is not None:
+                        queue.extend((ids[id(node)], child) for child in node.children)
+                count += 1
+                if count == chunk_size:
+                    write_chunk()
+                # the queue only needs to hold the nodes that haven't been saved yet
+                if i >= chunk_size:
+                    queue = queue[i:]
+                    i = 0
+            write_chunk()
+        return len(ids)
+
+    @staticmethod
+    def read_header(fin):
+        header = json.loads(fin.readline().decode())
+        if header.get('version') != TreeFile.VERSION:
+            raise ValueError(f'Unsupported tree file version: {header.get("version")}')
+        return header
+
+    @staticmethod
+    def read_records(fin, dtype):
+        """
+        Generates each record and its policy (or None), reading one chunk at a time.
+        """
+        while True:
+            counts = np.frombuffer(fin.read(16), dtype='<i8')
+            if len(counts) < 2 or counts[0] == 0:
+                return
+            records = np.frombuffer(fin.read(int(counts[0]) * dtype.itemsize), dtype=dtype)
+            policy_values = np.frombuffer(fin.read(int(counts[1]) * 4), dtype='<f4')
+            pos = 0
+            for record in records:
+                policy = None
+                if record['link'] == -1 and record['policy_length'] >= 0:
+                    policy = policy_values[pos:pos + record['policy_length']].astype(float)
+                    pos += record['policy_length']
+                yield record, policy
+
+    @staticmethod
+    def load(path, root):
+        """
+        Loads a saved tree into root, which must be a new node of the same type for the position of the saved root.
+        The rest of the configuration (e.g. the network or transposition table) is taken from root.
+
+        :return: The number of distinct nodes that were loaded.
+        """
+        GameClass = root.GameClass
+        with open(path, 'rb') as fin:
+            header = TreeFile.read_header(fin)
+            if header['game'] != GameClass.__name__ or header['node_type'] != TreeFile.get_node_type(root):
+                raise ValueError(f'The tree file contains a {header["game"]} tree of {header["node_type"]} nodes')
+            records = TreeFile.read_records(fin, TreeFile.get_dtype(header['position_bytes']))
+
+            nodes = []
+            # the children of each node are consecutive, so they are created together once all have been read
+            group = []
+
+            def add_children():
+                parent = nodes[group[0][0]['parent']]
+                new_records = [(record, policy) for record, policy in group if record['link'] == -1]
+                positions = [GameClass.unpack_state(record['position'].tobytes()) for record, _ in new_records]
+                if len(positions) == 0:
+                    new_children = iter([])
+                elif header['node_type'] == 'heuristic':
+                    # the saved evaluations are used instead of calling the network again
+                    new_children = iter(parent.create_children(positions, [(policy, record['value'])
+                                                                           for record, policy in new_records]))
+                else:
+                    new_children = iter(parent.create_children(positions))
+                children = []
+                for record, policy in group:
+                    if record['link'] == -1:
+                        child = next(new_children)
+                        TreeFile.set_node(child, record, policy)
+                        nodes.append(child)
+                    else:
+                        child = nodes[record['link']]
+                    children.append(child)
+                parent.children = children
+                parent.store_transpositions()
+
+            for record, policy in records:
+                if record['parent'] == -1:
+                    if not np.array_equal(GameClass.unpack_state(record['position'].tobytes()), root.position):
+                        raise ValueError('The saved tree is for a different position')
+                    TreeFile.set_node(root, record, policy)
+                    nodes.append(root)
+                    continue
+                if len(group) > 0 and record['parent'] != group[0][0]['parent']:
+                    add_children()
+                    group = []
+                group.append((record, policy))
+            if len(group) > 0:
+                add_children()
+        return len(nodes)
+
+    @staticmethod
+    def set_node(node, record, policy):
+        node.set_statistics(record['expansions'], record['value'], policy)
+        node.fully_expanded = bool(record['fully_expanded'])
+        node.proof_depth = None if record['proof_depth'] == -1 else int(record['proof_depth'])
@@ -0,0 +1,392 @@
+from time import time, sleep
+import numpy as np
+from perfect_information_game.move_selection import MoveChooser
+from perfect_information_game.move_selection.mcts import AbstractNode
+from perfect_information_game.move_selection.mcts import ArrayTree, ArrayNode
+from perfect_information_game.move_selection.mcts import RolloutPolicy
+
+
+class SharedArrayTree(ArrayTree):
+    """
+    An ArrayTree whose arrays live in a single multiprocessing.shared_memory block with a fixed capacity,
+    so that several worker processes can grow the same search tree at once (tree parallelization).
+
+    Statistics are read without locking, and are only updated while holding the lock of the node being updated.
+    To keep the number of locks small, nodes share a fixed number of lock stripes (node % lock_stripes).
+    Workers apply virtual losses along the path to the node that they are expanding, so that other workers are
+    steered towards different nodes. If a worker still selects a node that another worker is already expanding,
+    then this is counted as a collision and the selection is retried.
+
+    If a network is given, then each node is evaluated when it is expanded (like evaluate_on_visit in ArrayTree),
+    so that each worker only evaluates one position at a time. Otherwise, random rollouts are used.
+    """
+
+    def __init__(self, position, GameClass, network=None, c=np.sqrt(2), d=1, rollout_batch_size=1, verbose=False,
+                 capacity=2 ** 16, lock_stripes=64, virtual_loss=3, rollout_policy=None):
+        """
+        :param virtual_loss: The number of virtual losses added to each node on the path to a node being expanded.
+        """
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Lock
+        from multiprocessing.shared_memory import SharedMemory
+
+        self.GameClass = GameClass
+        self.network = network
+        self.heuristic = network is not None
+        self.evaluate_on_visit = self.heuristic
+        self.c = c
+        self.d = d
+        self.rollout_batch_size = rollout_batch_size
+        self.pool = None
+        self.rollout_policy = RolloutPolicy() if rollout_policy is None else rollout_policy
+        self.verbose = verbose
+        # the workers search in their own processes, so their time isn't measured
+        self.search_statistics = None
+        self.policies = {}
+        self.capacity = capacity
+        self.virtual_loss = virtual_loss
+        self.locks = [Lock() for _ in range(lock_stripes)]
+        self.allocation_lock = Lock()
+
+        self.shared_memory = SharedMemory(create=True, size=self.get_layout_size())
+        self.owner = True
+        self.attach_arrays()
+        self.reset(position)
+
+    def get_layout(self):
+        """
+        :return: The name, dtype and shape of each array in the shared memory block, starting with the header.
+        """
+        packed_length = len(self.GameClass.pack_state(self.GameClass.STARTING_STATE))
+        return [('header', np.int64, (1,)), ('parents', np.int32, (self.capacity,)),
+                ('first_children', np.int32, (self.capacity,)), ('child_counts', np.int32, (self.capacity,)),
+                ('visits', float, (self.capacity,)), ('values', float, (self.capacity,)),
+                ('priors', np.float32, (self.capacity,)), ('fully_expanded', bool, (self.capacity,)),
+                ('is_maximizing', bool, (self.capacity,)), ('claimed', bool, (self.capacity,)),
+                ('virtual_losses', np.int32, (self.capacity,)), ('proof_depths', np.int32, (self.capacity,)),
+                ('positions', np.uint8, (self.capacity, packed_length))]
+
+    def get_layout_size(self):
+        # every array starts at a multiple of 8 bytes
+        return sum(-(-np.dtype(dtype).itemsize * int(np.prod(shape)) // 8) * 8
+                   for _, dtype, shape in self.get_layout())
+
+    def attach_arrays(self):
+        offset = 0
+        for name, dtype, shape in self.get_layout():
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shared_memory.buf, offset=offset)
+            setattr(self, name, array)
+            offset += -(-array.nbytes // 8) * 8
+
+    def __getstate__(self):
+        # worker processes attach to the same shared memory block instead of copying the arrays
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in ['shared_memory', 'root'] + [name for name, _, _ in self.get_layout()]}
+        state['shared_memory_name'] = self.shared_memory.name
+        return state
+
+    def __setstate__(self, state):
+        from multiprocessing.shared_memory import SharedMemory
+
+        shared_memory_name = state.pop('shared_memory_name')
+        self.__dict__.update(state)
+        self.shared_memory = SharedMemory(name=shared_memory_name)
+        self.owner = False
+        self.attach_arrays()
+        self.root = ArrayNode(self, 0)
+
+    def close(self):
+        for name, _, _ in self.get_layout():
+            delattr(self, name)
+        self.root = None
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+
+    @property
+    def size(self):
+        return int(self.header[0])
+
+    @size.setter
+    def size(self, size):
+        self.header[0] = size
+
+    def reset(self, position):
+        """
+        Discards the whole tree, and starts a new one from the given position.
+        This must not be called while workers are searching.
+        """
+        self.size = 0
+        self.add_nodes(-1, [position], priors=[1])
+        self.root = ArrayNode(self, 0)
+
+    def get_lock(self, node):
+        return self.locks[node % len(self.locks)]
+
+    def get_nbytes_per_node(self):
+        return sum(np.dtype(dtype).itemsize * int(np.prod(shape[1:]))
+                   for name, dtype, shape in self.get_layout() if name != 'header')
+
+    def ensure_capacity(self, count):
+        if self.size + count > self.capacity:
+            raise MemoryError('The shared tree is full!')
+
+    def allocate(self, count):
+        with self.allocation_lock:
+            start = self.size
+            self.ensure_capacity(count)
+            self.size = start + count
+        self.claimed[start:start + count] = False
+        return start
+
+    def ensure_children(self, node, moves=None, network_call_results=None, priors=None):
+        if self.first_children[node] != -1:
+            return
+
+        with self.get_lock(node):
+            # another worker may have created the children while waiting for the lock
+            if self.first_children[node] != -1:
+                return
+            moves = self.GameClass.get_possible_moves(self.get_position(node)) if moves is None else moves
+            first_child = self.add_nodes(node, moves, priors=priors)
+            # the child count must be visible before the children are, since other workers read without locking
+            self.child_counts[node] = len(moves)
+            self.first_children[node] = first_child
+            if self.heuristic:
+                self.visits[node] = 1
+
+    def add_virtual_loss(self, node):
+        with self.get_lock(node):
+            self.virtual_losses[node] += self.virtual_loss
+
+    def remove_virtual_loss(self, node):
+        with self.get_lock(node):
+            self.virtual_losses[node] -= self.virtual_loss
+
+    def select_leaf(self, node):
+        """
+        Equivalent to ArrayTree.choose_expansion_node, except that virtual losses are applied to every node on the
+        path to the chosen node, and the chosen node is claimed so that no other worker will expand it.
+
+        :return: The id of the node to expand (or -1 if the tree is fully expanded) and the path to it,
+                 or None if the chosen node is already being expanded by another worker.
+        """
+        path = [node]
+        self.add_virtual_loss(node)
+        try:
+            while len(path) > 0:
+                node = path[-1]
+                if not self.fully_expanded[node]:
+                    if self.visits[node] == 0:
+                        with self.get_lock(node):
+                            claimed = self.claimed[node]
+                            self.claimed[node] = True
+                        if claimed:
+                            self.remove_virtual_losses(path)
+                            return None
+                        return node, path
+
+                    self.ensure_children(node)
+                    children = self.get_children(node)
+                    fully_expanded, child_visits, evaluations = self.get_children_statistics(node)
+                    i, minimax_evaluation = AbstractNode.select_child(
+                        self.is_maximizing[node], fully_expanded, evaluations,
+                        self.get_puct_heuristics(node, child_visits, self.priors[children]))
+                    if minimax_evaluation is None:
+                        path.append(children.start + i)
+                        self.add_virtual_loss(children.start + i)
+                        continue
+
+                    with self.get_lock(node):
+                        self.set_fully_expanded(node, minimax_evaluation, fully_expanded, evaluations)
+                    if self.verbose and len(path) == 1:
+                        print('Fully expanded tree!')
+
+                # this node is fully expanded (possibly by another worker), so choose again from its parent
+                self.remove_virtual_loss(path.pop())
+            return -1, path
+        except MemoryError:
+            self.remove_virtual_losses(path)
+            raise
+
+    def remove_virtual_losses(self, path):
+        for node in path:
+            self.remove_virtual_loss(node)
+
+    def expand(self, node, moves=None, network_call_results=None, remove_virtual_losses=False):
+        """
+        Expands the given node, and updates the statistics of all of its parents while holding their locks.
+        Parents that have been proven to be fully expanded in the meantime are not updated.
+
+        :param remove_virtual_losses: If True, the virtual losses added by select_leaf are removed.
+        """
+        path = []
+        parent = node
+        while parent != -1:
+            path.append(parent)
+            parent = self.parents[parent]
+
+        if not self.heuristic:
+            position = self.get_position(node)
+            rollout_sum = sum(self.rollout_policy.rollout(self.GameClass, position)
+                              for _ in range(self.rollout_batch_size))
+            for parent in path:
+                with self.get_lock(parent):
+                    if not self.fully_expanded[parent]:
+                        self.values[parent] += rollout_sum
+                        self.visits[parent] += self.rollout_batch_size
+                    if remove_virtual_losses:
+                        self.virtual_losses[parent] -= self.virtual_loss
+            return
+
+        if self.first_children[node] != -1:
+            raise Exception('Node already has children!')
+        policy, self.values[node] = self.network.call(self.get_position(node)[np.newaxis, ...])[0] \
+            if network_call_results is None else network_call_results[0]
+        self.ensure_children(node, moves, priors=policy)
+        if remove_virtual_losses:
+            self.remove_virtual_loss(node)
+
+        # recompute the value of all parents from their evaluated children, which can make it worse as well
+        changed = True
+        for parent in path[1:]:
+            with self.get_lock(parent):
+                if not self.fully_expanded[parent]:
+                    if changed:
+                        value = self.get_minimax_value(parent)
+                        changed = value != self.values[parent]
+                        self.values[parent] = value
+                    self.visits[parent] += 1
+                if remove_virtual_losses:
+                    self.virtual_losses[parent] -= self.virtual_loss
+
+    def search(self, time_limit):
+        """
+        Expands nodes for time_limit seconds, or until the tree is fully expanded or full.
+
+        :return: The number of nodes that were expanded, and the number of collisions with other workers.
+        """
+        expansions = 0
+        collisions = 0
+        start_time = time()
+        try:
+            while time() - start_time < time_limit:
+                leaf = self.select_leaf(0)
+                if leaf is None:
+                    collisions += 1
+                    # give the worker that is expanding the node a chance to finish
+                    sleep(0)
+                    continue
+                node, path = leaf
+                if node == -1:
+                    break
+                self.expand(node, remove_virtual_losses=True)
+                expansions += 1
+        except MemoryError:
+            if self.verbose:
+                print('Shared tree is full!')
+        return expansions, collisions
+
+
+class TreeParallelMCTS(MoveChooser):
+    """
+    Monte Carlo Tree Search where several worker processes grow a single search tree together,
+    which is stored in shared memory (see SharedArrayTree).
+    """
+
+    def __init__(self, GameClass, starting_position=None, network=None, c=np.sqrt(2), d=1, workers=2,
+                 capacity=2 ** 20, lock_stripes=64, rollout_batch_size=1, rollout_policy=None):
+        """
+        :param workers: The number of worker processes that search the tree.
+        :param capacity: The maximum number of nodes in the tree. Searching stops early once it is full.
+        :param rollout_policy: The RolloutPolicy used when no network is given.
+        """
+        super().__init__(GameClass, starting_position)
+        self.network = network
+        self.workers = workers
+        self.tree = SharedArrayTree(self.position, GameClass, network, c, d, rollout_batch_size, verbose=True,
+                                    capacity=capacity, lock_stripes=lock_stripes, rollout_policy=rollout_policy)
+        self.pipes = []
+        self.processes = []
+
+    def start(self):
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pipe, Process
+
+        for seed in np.random.randint(2 ** 31, size=self.workers):
+            parent_pipe, worker_pipe = Pipe()
+            process = Process(target=self.worker_loop, args=(self.tree, self.network, worker_pipe, seed))
+            process.start()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+
+    def terminate(self):
+        for pipe in self.pipes:
+            pipe.send(None)
+        for process in self.processes:
+            process.join()
+        self.pipes = []
+        self.processes = []
+        if self.tree.shared_memory is not None:
+            self.tree.close()
+            self.tree.shared_memory = None
+
+    def search(self, time_limit):
+        """
+        Searches from the current position for time_limit seconds using all workers.
+
+        :return: The number of nodes that were expanded, and the number of collisions between workers.
+        """
+        if len(self.processes) == 0:
+            self.start()
+        self.tree.reset(self.position)
+        for pipe in self.pipes:
+            pipe.send(time_limit)
+        results = [pipe.recv() for pipe in self.pipes]
+        return sum(expansions for expansions, _ in results), sum(collisions for _, collisions in results)
+
+    def choose_move(self, return_distribution=False, time_limit=10):
+        if self.GameClass.is_over(self.position):
+            raise Exception('Game Finished!')
+
+        self.search_statistics.start()
+        start_time = time()
+        expansions, collisions = self.search(time_limit)
+        self.search_statistics.add_nodes(expansions)
+        self.search_statistics.add_count('collisions', collisions)
+        self.search_statistics.tree_size = int(self.tree.size)
+        print(f'MCTS choosing move based on {expansions} expansions from {self.workers} workers '
+              f'({expansions / (time() - start_time):.0f} expansions/s, {collisions} collisions)!')
+
+        root = self.tree.root
+        is_ai_player_1 = self.GameClass.is_player_1_turn(root.position)
+        chosen_positions = []
+        # choose moves as long as it is still the ai's turn
+        while self.GameClass.is_player_1_turn(root.position) == is_ai_player_1:
+            if root.children is None:
+                best_node = root.choose_expansion_node()
+                if best_node is not None:
+                    if self.network is not None:
+                        self.network.initialize()
+                    best_node.expand()
+            root, distribution = root.choose_best_node(return_probability_distribution=True, optimal=True)
+            chosen_positions.append((root.position, distribution))
+
+        print('Expected outcome: ', root.get_evaluation())
+        self.position = chosen_positions[-1][0]
+        self.search_statistics.finish()
+        return chosen_positions if return_distribution else [position for position, _ in chosen_positions]
+
+    @staticmethod
+    def worker_loop(tree, network, worker_pipe, seed):
+        np.random.seed(seed)
+        # with the fork start method the tree is copied instead of being unpickled, but only the parent may unlink it
+        tree.owner = False
+        if network is not None:
+            network.initialize()
+        while True:
+            time_limit = worker_pipe.recv()
+            if time_limit is None:
+                break
+            worker_pipe.send(tree.search(time_limit))
+        tree.close()
@@ -1,4 +1,5 @@
 import numpy as np
+from time import time
 from perfect_information_game.move_selection import MoveChooser
 
 
@@ -18,6 +19,9 @@ class MiniMax(MoveChooser):
         super().__init__(GameClass, starting_position)
         self.heuristic_func = heuristic_func if heuristic_func is not None else GameClass.heuristic
         self.depth = depth
+        # the time spent in each phase of the current search, which is added to the search statistics at the end
+        self.move_generation_time = 0
+        self.evaluation_time = 0
 
     @staticmethod
     def from_network(GameClass, starting_position=None, network=None, depth=5):
@@ -44,20 +48,30 @@ class MiniMax(MoveChooser):
         if self.GameClass.is_over(self.position):
             raise Exception('Game Finished!')
 
+        self.search_statistics.start()
         is_maximizing = self.GameClass.is_player_1_turn(self.position)
         best_move = None
         best_heuristic = -np.inf if is_maximizing else np.inf
         heuristics = []
 
-        for move in self.GameClass.get_possible_moves(self.position):
-            heuristic = self.evaluate_position_recursive(move, self.depth - 1, not is_maximizing, best_heuristic)
-            heuristics.append(heuristic)
-
-            if (is_maximizing and heuristic > best_heuristic) or (not is_maximizing and heuristic < best_heuristic):
-                best_heuristic = heuristic
-                best_move = move
+        # the recursion adds up the time spent generating moves and evaluating positions instead of using timers,
+        # and everything else (the minimax comparisons and the recursion itself) is counted as backup
+        self.move_generation_time = 0
+        self.evaluation_time = 0
+        with self.search_statistics.timer('backup'):
+            for move in self.GameClass.get_possible_moves(self.position):
+                heuristic = self.evaluate_position_recursive(move, self.depth - 1, not is_maximizing, best_heuristic)
+                heuristics.append(heuristic)
+
+                if (is_maximizing and heuristic > best_heuristic) or \
+                        (not is_maximizing and heuristic < best_heuristic):
+                    best_heuristic = heuristic
+                    best_move = move
+            self.search_statistics.add_time('move_generation', self.move_generation_time)
+            self.search_statistics.add_time('evaluation', self.evaluation_time)
 
         self.position = best_move
+        self.search_statistics.finish()
 
         if return_distribution:
             # create an exponentially scaled distribution based on the heuristic values
@@ -67,25 +81,38 @@ class MiniMax(MoveChooser):
         else:
             return self.position
 
-    def evaluate_position_recursive(self, position, depth, is_maximizing, value_to_beat):
+    def evaluate_position_recursive(self, position, depth, is_maximizing, value_to_beat, ply=1):
+        """
+        :param ply: The number of moves from the root of the search to the position.
+        """
+        self.search_statistics.add_node(ply)
         if self.GameClass.is_over(position):
             return self.GameClass.get_winner(position)
 
         if depth == 0:
-            return self.heuristic_func(position)
+            start_time = time()
+            heuristic = self.heuristic_func(position)
+            self.evaluation_time += time() - start_time
+            return heuristic
 
         best_heuristic = -np.inf if is_maximizing else np.inf
-        for child_position in self.GameClass.get_possible_moves(position):
-            heuristic = self.evaluate_position_recursive(child_position, depth - 1, not is_maximizing, best_heuristic)
+        start_time = time()
+        child_positions = self.GameClass.get_possible_moves(position)
+        self.move_generation_time += time() - start_time
+        for child_position in child_positions:
+            heuristic = self.evaluate_position_recursive(child_position, depth - 1, not is_maximizing, best_heuristic,
+                                                         ply + 1)
 
             if is_maximizing and heuristic > best_heuristic:
                 if heuristic > value_to_beat:
                     # prune
+                    self.search_statistics.add_count('cutoffs')
                     return heuristic
                 best_heuristic = heuristic
             if not is_maximizing and heuristic < best_heuristic:
                 if heuristic < value_to_beat:
                     # prune
+                    self.search_statistics.add_count('cutoffs')
                     return heuristic
                 best_heuristic = heuristic
 
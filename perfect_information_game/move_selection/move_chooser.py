@@ -1,11 +1,26 @@
 from abc import ABC, abstractmethod
 import numpy as np
+from perfect_information_game.move_selection import SearchStatistics
 
 
 class MoveChooser(ABC):
     def __init__(self, GameClass, starting_position=None):
         self.GameClass = GameClass
         self.position = starting_position if starting_position is not None else GameClass.STARTING_STATE
+        self.search_statistics = SearchStatistics(type(self).__name__)
+
+    def get_statistics(self):
+        """
+        :return: A dict of statistics about the search for the most recently chosen move (see SearchStatistics),
+                 or None if no move has been chosen yet.
+        """
+        return self.search_statistics.get_stats()
+
+    def log_statistics(self, log_path):
+        """
+        Appends the statistics of the search for each following move to the given JSON lines file.
+        """
+        self.search_statistics.log_path = log_path
 
     def start(self):
         pass
@@ -0,0 +1,143 @@
+import pickle
+from time import sleep
+import numpy as np
+
+
+class PositionMailbox:
+    """
+    A shared memory block through which a worker process publishes its latest result to the parent process:
+    a few positions, an optional probability distribution for each of them, and a small object of extra information
+    (e.g. search statistics). Positions are stored bit-packed (see GameClass.pack_state), so they don't need to be
+    pickled and sent through a pipe.
+
+    Each write replaces the previous result, so reading only ever returns the latest one, no matter how many results
+    have been written since the last read. Every write is tagged with a number (e.g. how many moves the worker has been
+    told about), which the reader uses to wait for a result that is up to date.
+    The sequence number in the header is odd while a write is in progress, so that the reader can retry instead of
+    reading a partially written result. Only a single process may write.
+    """
+
+    def __init__(self, GameClass, max_positions=16, max_children=None, max_info_bytes=2 ** 16):
+        """
+        :param max_positions: The maximum number of positions in a single result.
+        :param max_children: The maximum length of each distribution. Defaults to the size of GameClass.MOVE_SHAPE.
+        :param max_info_bytes: The maximum size of the pickled extra information.
+        """
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing.shared_memory import SharedMemory
+
+        self.GameClass = GameClass
+        self.max_positions = max_positions
+        if max_children is None:
+            max_children = int(np.prod(GameClass.MOVE_SHAPE)) if hasattr(GameClass, 'MOVE_SHAPE') else 1024
+        self.max_children = max_children
+        self.max_info_bytes = max_info_bytes
+
+        self.shared_memory = SharedMemory(create=True, size=self.get_layout_size())
+        self.owner = True
+        self.attach_arrays()
+        # [sequence number, tag, number of positions, size of the pickled information]
+        self.header[:] = [0, -1, 0, 0]
+
+    def get_layout(self):
+        """
+        :return: The name, dtype and shape of each array in the shared memory block, starting with the header.
+        """
+        packed_length = len(self.GameClass.pack_state(self.GameClass.STARTING_STATE))
+        return [('header', np.int64, (4,)), ('positions', np.uint8, (self.max_positions, packed_length)),
+                ('distribution_lengths', np.int64, (self.max_positions,)),
+                ('distributions', float, (self.max_positions, self.max_children)),
+                ('info', np.uint8, (self.max_info_bytes,))]
+
+    def get_layout_size(self):
+        # every array starts at a multiple of 8 bytes
+        return sum(-(-np.dtype(dtype).itemsize * int(np.prod(shape)) // 8) * 8
+                   for _, dtype, shape in self.get_layout())
+
+    def attach_arrays(self):
+        offset = 0
+        for name, dtype, shape in self.get_layout():
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shared_memory.buf, offset=offset)
+            setattr(self, name, array)
+            offset += -(-array.nbytes // 8) * 8
+
+    def __getstate__(self):
+        # worker processes attach to the same shared memory block instead of copying the arrays
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in ['shared_memory'] + [name for name, _, _ in self.get_layout()]}
+        state['shared_memory_name'] = self.shared_memory.name
+        return state
+
+    def __setstate__(self, state):
+        from multiprocessing.shared_memory import SharedMemory
+
+        shared_memory_name = state.pop('shared_memory_name')
+        self.__dict__.update(state)
+        self.shared_memory = SharedMemory(name=shared_memory_name)
+        self.owner = False
+        self.attach_arrays()
+
+    def close(self):
+        for name, _, _ in self.get_layout():
+            delattr(self, name)
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+
+    def write(self, positions, distributions=None, info=None, tag=0):
+        """
+        Replaces the current result.
+
+        :param distributions: An optional distribution (or None) for each position.
+        :param info: Any small picklable object, or None.
+        """
+        if len(positions) > self.max_positions:
+            raise ValueError(f'Results are limited to {self.max_positions} positions')
+        info = pickle.dumps(info) if info is not None else b''
+        if len(info) > self.max_info_bytes:
+            raise ValueError(f'The information is larger than {self.max_info_bytes} bytes')
+        if distributions is not None and any(len(distribution) > self.max_children for distribution in distributions
+                                             if distribution is not None):
+            raise ValueError(f'Distributions are limited to {self.max_children} children')
+
+        self.header[0] += 1
+        self.positions[:len(positions)] = self.GameClass.pack_states(np.stack(positions, axis=0))
+        for i in range(len(positions)):
+            distribution = distributions[i] if distributions is not None else None
+            self.distribution_lengths[i] = -1 if distribution is None else len(distribution)
+            if distribution is not None:
+                self.distributions[i, :len(distribution)] = distribution
+        self.info[:len(info)] = np.frombuffer(info, dtype=np.uint8)
+        self.header[1:] = [tag, len(positions), len(info)]
+        self.header[0] += 1
+
+    def read(self):
+        """
+        :return: The tag, positions, distributions and extra information of the latest result.
+                 The tag is -1 if nothing has been written yet.
+        """
+        while True:
+            sequence = int(self.header[0])
+            if sequence % 2 == 1:
+                # a write is in progress
+                sleep(0)
+                continue
+            tag, count, info_length = (int(value) for value in self.header[1:])
+            positions = list(self.GameClass.unpack_states(self.positions[:count]))
+            distributions = [self.distributions[i, :length].copy() if length >= 0 else None
+                             for i, length in enumerate(self.distribution_lengths[:count])]
+            info = self.info[:info_length].tobytes()
+            if int(self.header[0]) == sequence:
+                return tag, positions, distributions, pickle.loads(info) if info_length > 0 else None
+
+    def wait(self, tag, poll_interval=0.001):
+        """
+        Waits until a result with at least the given tag has been written.
+
+        :return: The same as read.
+        """
+        while True:
+            result = self.read()
+            if result[0] >= tag:
+                return result
+            sleep(poll_interval)
@@ -16,12 +16,16 @@ class RandomMoveChooser(MoveChooser):
         if self.delay > 0:
             sleep(self.delay)
 
+        self.search_statistics.start()
         is_ai_player_1 = self.GameClass.is_player_1_turn(self.position)
         chosen_moves = []
 
         while self.GameClass.is_player_1_turn(self.position) == is_ai_player_1:
-            moves = self.GameClass.get_possible_moves(self.position)
+            with self.search_statistics.timer('move_generation'):
+                moves = self.GameClass.get_possible_moves(self.position)
+            self.search_statistics.add_node(0)
             self.position = choose_random(moves)
             chosen_moves.append((self.position, np.full_like(moves, 1 / len(moves)))
                                 if return_distribution else self.position)
+        self.search_statistics.finish()
         return chosen_moves
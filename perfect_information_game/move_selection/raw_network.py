@@ -21,12 +21,16 @@ class RawNetwork(MoveChooser):
         if self.delay > 0:
             sleep(self.delay)
 
+        self.search_statistics.start()
         is_ai_player_1 = self.GameClass.is_player_1_turn(self.position)
         chosen_moves = []
 
         while self.GameClass.is_player_1_turn(self.position) == is_ai_player_1:
-            self.position, distribution = self.network.choose_move(self.position, return_distribution=True,
-                                                                   optimal=self.optimal)
+            with self.search_statistics.timer('inference'):
+                self.position, distribution = self.network.choose_move(self.position, return_distribution=True,
+                                                                       optimal=self.optimal)
+            self.search_statistics.add_node(0)
             chosen_moves.append((self.position, distribution)
                                 if return_distribution else self.position)
+        self.search_statistics.finish()
         return chosen_moves
@@ -0,0 +1,109 @@
+import json
+from contextlib import contextmanager
+from time import time
+
+
+class SearchStatistics:
+    """
+    Collects statistics about the search that a MoveChooser does for each move. Once the move has been chosen,
+    they are available from get_stats as a dict with the following entries:
+    chooser: the name of the MoveChooser class,
+    time: the duration of the search in seconds,
+    nodes: the number of nodes that were searched (expanded leaves for MCTS, evaluated positions for alpha-beta),
+    nodes_per_second,
+    depths: a histogram of the depth below the root at which each node was selected or evaluated,
+    times: the number of seconds spent in each phase of the search (e.g. move_generation, inference or backup).
+           Phases can be nested, in which case the time of the inner phase is only counted for the inner phase,
+    caches: the lookups, hits and hit rate of each cache (e.g. transpositions or tablebases),
+    tree_size: the number of nodes in the search tree after the search, or None if there is no tree,
+    counts: other counts, such as the number of pruned nodes or alpha-beta cutoffs.
+
+    If log_path is given, then the dict of each search is also appended to it as a line of JSON.
+    """
+
+    def __init__(self, chooser, log_path=None):
+        self.chooser = chooser
+        self.log_path = log_path
+        self.stats = None
+        self.start()
+
+    def start(self):
+        """
+        Resets the statistics at the start of a new search.
+        """
+        self.start_time = time()
+        self.nodes = 0
+        self.depths = {}
+        self.times = {}
+        self.caches = {}
+        self.tree_size = None
+        self.counts = {}
+        # the time spent in nested phases, for each phase that is currently being timed
+        self.nested_times = []
+
+    @contextmanager
+    def timer(self, phase):
+        """
+        Adds the time spent in the with block to the given phase.
+        """
+        start_time = time()
+        self.nested_times.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time() - start_time
+            self.times[phase] = self.times.get(phase, 0) + elapsed - self.nested_times.pop()
+            if len(self.nested_times) > 0:
+                self.nested_times[-1] += elapsed
+
+    def add_time(self, phase, seconds):
+        """
+        Adds time that was measured without a timer, e.g. in loops where the overhead of a timer would be too large.
+        If this is called within a timer, then the time isn't counted for the phase of that timer.
+        """
+        self.times[phase] = self.times.get(phase, 0) + seconds
+        if len(self.nested_times) > 0:
+            self.nested_times[-1] += seconds
+
+    def add_node(self, depth):
+        self.nodes += 1
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+
+    def add_nodes(self, count):
+        """
+        Adds nodes whose depths aren't known, e.g. because they were searched in other processes.
+        """
+        self.nodes += int(count)
+
+    def add_cache(self, name, lookups, hits):
+        lookups += self.caches.get(name, {}).get('lookups', 0)
+        hits += self.caches.get(name, {}).get('hits', 0)
+        self.caches[name] = {'lookups': lookups, 'hits': hits, 'hit_rate': hits / lookups if lookups > 0 else 0}
+
+    def add_count(self, name, count=1):
+        self.counts[name] = self.counts.get(name, 0) + count
+
+    def finish(self, stats=None):
+        """
+        Ends the search, and logs its statistics.
+
+        :param stats: The statistics of a search that was done in another process, which are used instead.
+        :return: The dict of statistics.
+        """
+        if stats is None:
+            elapsed = time() - self.start_time
+            stats = {'chooser': self.chooser, 'time': elapsed, 'nodes': self.nodes,
+                     'nodes_per_second': self.nodes / elapsed if elapsed > 0 else 0,
+                     'depths': dict(sorted(self.depths.items())), 'times': dict(self.times),
+                     'caches': dict(self.caches), 'tree_size': self.tree_size, 'counts': dict(self.counts)}
+        self.stats = stats
+        if self.log_path is not None:
+            with open(self.log_path, 'a') as fout:
+                fout.write(json.dumps(stats) + '\n')
+        return stats
+
+    def get_stats(self):
+        """
+        :return: The statistics of the most recent search, or None if no search has finished.
+        """
+        return self.stats
@@ -1,20 +1,23 @@
 from time import sleep
 from perfect_information_game.move_selection import MoveChooser
-from perfect_information_game.tablebases import TablebaseManager
+from perfect_information_game.tablebases import ChessTablebaseManager
 
 
 class TablebaseChooser(MoveChooser):
     def __init__(self, GameClass, backup_move_chooser=None, starting_position=None, delay=1):
         super().__init__(GameClass, starting_position)
         self.backup_move_chooser = backup_move_chooser
-        self.tablebase_manager = TablebaseManager(GameClass)
+        self.tablebase_manager = ChessTablebaseManager(GameClass)
         self.delay = delay
 
     def choose_move(self, return_distribution=False):
         if self.GameClass.is_over(self.position):
             raise Exception('Game Finished!')
 
-        move, outcome, distance = self.tablebase_manager.query_position(self.position)
+        self.search_statistics.start()
+        with self.search_statistics.timer('tablebase_probe'):
+            move, outcome, distance = self.tablebase_manager.query_position(self.position)
+        self.search_statistics.add_cache('tablebases', 1, int(move is not None))
 
         if move is None:
             if self.backup_move_chooser is None:
@@ -22,8 +25,13 @@ class TablebaseChooser(MoveChooser):
             self.backup_move_chooser.position = self.position
             move = self.backup_move_chooser.choose_move(return_distribution)
             self.position = move[-1]
+            # the search was done by the backup move chooser
+            self.search_statistics.finish(self.backup_move_chooser.get_statistics())
             return move
-        elif self.delay > 0:
+
+        self.search_statistics.add_node(0)
+        self.search_statistics.finish()
+        if self.delay > 0:
             sleep(self.delay)
 
         print(f'Outcome: {outcome}, distance: {distance}')
@@ -3,7 +3,9 @@ import numpy as np
 import tensorflow as tf
 from keras import Sequential
 from keras.layers import Conv2D, Flatten, Dense
-from perfect_information_game.move_selection.mcts import RolloutNode
+from perfect_information_game.move_selection.mcts import RolloutNode, TreeParallelMCTS, RolloutPolicy, \
+    GumbelSearch, BatchedSearcher, MCTS
+from perfect_information_game.heuristics import HeuristicNetwork
 from perfect_information_game.games import Chess as GameClass
 
 
@@ -55,8 +57,112 @@ def benchmark_rollouts(trials=5):
     print(np.std(times))
 
 
+def benchmark_tree_parallel_scaling(worker_counts=(1, 2, 4, 8, 16), time_limit=10, network=None):
+    """
+    Reports the number of expansions per second of TreeParallelMCTS for each number of workers.
+    Only worker counts up to the number of available cores are expected to scale.
+    """
+    rates = []
+    for workers in worker_counts:
+        mcts = TreeParallelMCTS(GameClass, network=network, workers=workers)
+        try:
+            # the first search also includes starting the worker processes
+            mcts.search(0)
+            start_time = time()
+            expansions, collisions = mcts.search(time_limit)
+            rates.append(expansions / (time() - start_time))
+        finally:
+            mcts.terminate()
+        print(f'{workers} workers: {rates[-1]:.0f} expansions/s ({rates[-1] / rates[0]:.2f}x), '
+              f'{collisions} collisions')
+    return rates
+
+
+def benchmark_rollout_policy(rollout_policy=RolloutPolicy(max_depth=20, epsilon=0.5, heuristic_scale=10,
+                                                            captures_first=True),
+                             games=10, time_limit=1, max_moves=200):
+    """
+    Plays games between single threaded MCTS using the given RolloutPolicy and MCTS using random rollouts,
+    with the same time limit per move so that their playing strength per CPU-second is compared.
+    The players alternate colours, and games that are not finished after max_moves moves are counted as draws.
+
+    :return: The score of the given policy (1 per win and 0.5 per draw) divided by the number of games.
+    """
+    score = 0
+    for game in range(games):
+        policy_is_player_1 = game % 2 == 0
+        players = [MCTS(GameClass, rollout_policy=rollout_policy), MCTS(GameClass)]
+        if not policy_is_player_1:
+            players.reverse()
+        position = GameClass.STARTING_STATE
+        moves = 0
+        while not GameClass.is_over(position) and moves < max_moves:
+            player, opponent = players if GameClass.is_player_1_turn(position) else players[::-1]
+            for move in player.choose_move(time_limit=time_limit):
+                opponent.report_user_move(move)
+                position = move
+            moves += 1
+
+        outcome = GameClass.get_winner(position) if GameClass.is_over(position) else 0
+        score += (outcome if policy_is_player_1 else -outcome) / 2 + 0.5
+        print(f'Game {game + 1}: outcome {outcome}, policy score {score}/{game + 1}')
+    return score / games
+
+
+def benchmark_gumbel_search(simulations=(8, 16, 32), games=20, considered_moves=8, network=None, max_moves=200):
+    """
+    Plays games between searches whose root children are chosen by a GumbelSearch and searches using PUCT at the root,
+    with the same number of simulations per move (and no tree reuse), so that their playing strength per simulation
+    is compared. All games are played at once using a BatchedSearcher for each side.
+    Gumbel noise is only sampled for the first 4 moves of each game, so that the games differ.
+    The players alternate colours, and games that are not finished after max_moves moves are counted as draws.
+
+    :param network: The network that evaluates positions, which defaults to a HeuristicNetwork.
+    :return: The score of the GumbelSearch (1 per win and 0.5 per draw) divided by the number of games,
+             for each number of simulations.
+    """
+    network = HeuristicNetwork(GameClass) if network is None else network
+    network.initialize()
+
+    scores = []
+    for budget in simulations:
+        gumbel_searcher = BatchedSearcher(GameClass, network, budget, evaluate_on_visit=True,
+                                          gumbel_search=GumbelSearch(considered_moves=considered_moves))
+        puct_searcher = BatchedSearcher(GameClass, network, budget, evaluate_on_visit=True)
+        positions = [GameClass.STARTING_STATE] * games
+        for position in positions:
+            gumbel_searcher.add_tree(position)
+            puct_searcher.add_tree(position)
+
+        for moves in range(max_moves):
+            if all(GameClass.is_over(position) for position in positions):
+                break
+            for searcher, is_gumbel in [(gumbel_searcher, True), (puct_searcher, False)]:
+                # the gumbel search is player 1 in even games
+                to_move = [game for game in range(games) if not GameClass.is_over(positions[game]) and
+                           (GameClass.is_player_1_turn(positions[game]) == (game % 2 == 0)) == is_gumbel]
+                for game in to_move:
+                    searcher.reset_tree(game, positions[game])
+                    if is_gumbel:
+                        searcher.searches[game].sample = moves < 4
+                searcher.search(to_move)
+                for game in to_move:
+                    positions[game] = searcher.choose_best_node(game, optimal=True)[0].position
+
+        score = 0
+        for game, position in enumerate(positions):
+            outcome = GameClass.get_winner(position) if GameClass.is_over(position) else 0
+            score += (outcome if game % 2 == 0 else -outcome) / 2 + 0.5
+        print(f'{budget} simulations: gumbel score {score}/{games}')
+        scores.append(score / games)
+    return scores
+
+
 if __name__ == '__main__':
     tf.config.experimental.list_physical_devices()
     # tf.debugging.set_log_device_placement(True)
     benchmark_inference()
     # benchmark_rollouts()
+    # benchmark_tree_parallel_scaling()
+    # benchmark_rollout_policy()
+    # benchmark_gumbel_search()
@@ -1,5 +1,3 @@
-from keras.models import load_model
-import tensorflowjs as tfjs
 from perfect_information_game.utils import get_training_path
 from perfect_information_game.games import Chess as GameClass
 import os
@@ -7,6 +5,10 @@ import fileinput
 
 
 def main():
+    # Note: keras and tensorflowjs imports are within functions because they are very slow to import
+    from keras.models import load_model
+    import tensorflowjs as tfjs
+
     for difficulty in ['easy', 'medium', 'hard']:
         output_folder = f'{get_training_path(GameClass)}/models/tfjs_models'
         output_json = f'{output_folder}/othello_{difficulty}_model.json'
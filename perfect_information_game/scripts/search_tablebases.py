@@ -13,10 +13,10 @@ def search_for_draws():
             print(descriptor)
             print('1: ', sum([GameClass.parse_move_bytes(move_bytes)[1] == 1 for move_bytes in nodes.values()]))
             print('0: ', sum([GameClass.parse_move_bytes(move_bytes)[1] == 0 for move_bytes in nodes.values()]))
-            print('0 (not immediate stalemate): ', [GameClass.encode_fen(GameClass.parse_board_bytes(board_bytes))
-                                                    for board_bytes, move_bytes in nodes.items()
-                                                    if GameClass.parse_move_bytes(move_bytes)[1] == 0 and
-                                                    not GameClass.is_over(GameClass.parse_board_bytes(board_bytes))])
+            drawn_states = GameClass.parse_board_bytes_batch([board_bytes for board_bytes, move_bytes in nodes.items()
+                                                              if GameClass.parse_move_bytes(move_bytes)[1] == 0])
+            print('0 (not immediate stalemate): ', [GameClass.encode_fen(state) for state in drawn_states
+                                                    if not GameClass.is_over(state)])
             print('-1: ', sum([GameClass.parse_move_bytes(data)[1] == -1 for data in nodes.values()]))
 
 
@@ -44,9 +44,10 @@ def search_for_draw_by_repetition():
         with open(f'{get_training_path(GameClass)}/tablebases/{descriptor}.pickle', 'rb') as file:
             nodes = pickle.load(file)
             print(descriptor)
-            print('0 (draw by repetition): ', [GameClass.encode_fen(GameClass.parse_board_bytes(board_bytes))
-                                               for board_bytes, move_bytes in nodes.items()
-                                               if GameClass.parse_move_bytes(move_bytes)[-1] == np.inf])
+            repetition_board_bytes = [board_bytes for board_bytes, move_bytes in nodes.items()
+                                      if GameClass.parse_move_bytes(move_bytes)[-1] == np.inf]
+            repetition_states = GameClass.parse_board_bytes_batch(repetition_board_bytes)
+            print('0 (draw by repetition): ', [GameClass.encode_fen(state) for state in repetition_states])
 
 
 if __name__ == '__main__':
@@ -9,7 +9,8 @@ def view_game(path):
         training_data, result = pickle.load(fin)
     print('Result: ', result)
 
-    positions = [position for position, _ in training_data]
+    positions = [GameClass.unpack_state(position) if type(position) is bytes else position
+                 for position, _ in training_data]
     distributions = [f'Distribution: {distribution}' for _, distribution in training_data]
 
     ui = PygameUI(GameClass)
@@ -1,7 +1,6 @@
 from abc import ABC, abstractmethod
 from os import listdir
 from sys import getsizeof
-from cachetools import LRUCache
 import pickle
 from perfect_information_game.utils import get_training_path
 from perfect_information_game.utils import choose_random
@@ -29,6 +28,9 @@ class AbstractTablebaseManager(ABC):
         """
         self.GameClass = GameClass
 
+        # Note: cachetools is imported within functions to keep importing this file fast
+        from cachetools import LRUCache
+
         # cache mapping descriptors to tablebases
         self.tablebases = LRUCache(tablebase_cache_mb * 2 ** 20, getsizeof)
 
@@ -55,6 +57,7 @@ class AbstractTablebaseManager(ABC):
 
         if tablebase_size > self.tablebases.maxsize:
             # create new LRUCache with enough size
+            from cachetools import LRUCache
             new_tablebases = LRUCache(tablebase_size, getsizeof)
             new_tablebases.update(self.tablebases)
             self.tablebases = new_tablebases
@@ -57,13 +57,14 @@ class ChessTablebaseGenerator:
                 self.terminal_distance = np.inf
 
             # populate children, but leave references to other nodes as board_bytes for now
+            transformed_moves = []
             for move in self.GameClass.get_possible_moves(state):
                 # need to compare descriptors (piece count is not robust to pawn promotions)
                 move_descriptor = self.GameClass.get_position_descriptor(move, pawn_ranks=True)
                 if move_descriptor == descriptor:
                     symmetry_transform = SymmetryTransform(self.GameClass, move)
-                    move_board_bytes = self.GameClass.encode_board_bytes(symmetry_transform.transform_state(move))
-                    self.children.append(move_board_bytes)
+                    transformed_moves.append(symmetry_transform.transform_state(move))
+                    self.children.append(None)  # placeholder for the move's board_bytes
                     self.children_symmetry_transforms.append(symmetry_transform)
                 else:
                     # create this node with require_terminal=True so that if it is not terminal a TablebaseException
@@ -73,6 +74,11 @@ class ChessTablebaseGenerator:
                     self.children.append(node)
                     self.children_symmetry_transforms.append(SymmetryTransform.identity(self.GameClass))
 
+            if len(transformed_moves) > 0:
+                # encode all the board_bytes at once
+                moves_board_bytes = iter(self.GameClass.encode_board_bytes_batch(np.stack(transformed_moves, axis=0)))
+                self.children = [next(moves_board_bytes) if child is None else child for child in self.children]
+
         def init_children(self, nodes):
             # replace move_board_bytes with references to actual nodes
             self.children = [nodes[child] if type(child) is bytes else child for child in self.children]
@@ -1 +1,6 @@
-from perfect_information_game.ui.pygame_ui import PygameUI
+def __getattr__(name):
+    # PygameUI is imported lazily so that pygame is only imported once the UI is actually used
+    if name == 'PygameUI':
+        from perfect_information_game.ui.pygame_ui import PygameUI
+        return PygameUI
+    raise AttributeError(f'module {__name__} has no attribute {name}')
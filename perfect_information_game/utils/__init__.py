@@ -1,2 +1,2 @@
 from perfect_information_game.utils.utils import OptionalPool, STRAIGHT_DIRECTIONS, DIAGONAL_DIRECTIONS, DIRECTIONS_8, \
-    get_training_path, choose_random, one_hot, iter_product, get_np_uint_type, alternate_iterables
+    get_training_path, choose_random, one_hot, iter_product, get_np_uint_type, alternate_iterables, lru_cached
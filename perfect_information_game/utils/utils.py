@@ -1,10 +1,13 @@
 import numpy as np
 from itertools import product
-from multiprocessing import Pool
+from collections import OrderedDict
+from functools import wraps
 
 
 class OptionalPool:
     def __init__(self, threads=1):
+        # Note: multiprocessing imports are within functions to keep importing this file fast
+        from multiprocessing import Pool
         self.pool = Pool(threads) if threads > 1 else None
 
     def map(self, func, iterable, chunksize=None):
@@ -94,6 +97,31 @@ def alternate_iterables(*iterables):
             break
 
 
+def lru_cached(maxsize, key):
+    """
+    A decorator that caches the results of the most recently used maxsize keys, where the key of a call is computed
+    by calling key with the same arguments.
+    This is equivalent to cachetools.cached(cache=LRUCache(maxsize), key=key), without needing to import cachetools.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            if cache_key in cache:
+                cache.move_to_end(cache_key)
+                return cache[cache_key]
+
+            result = func(*args, **kwargs)
+            cache[cache_key] = result
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+
 def test():
     for i, j, k, l in iter_product((2, 3, 4), ['a', 'b', 'c']):
         print(i, j, k, l)
@@ -0,0 +1,17 @@
+import numpy as np
+
+
+def get_random_positions(GameClass, count=20, seed=0):
+    """
+    :return: A list of positions from random games, starting a new game whenever one ends.
+    """
+    random = np.random.RandomState(seed)
+    positions = []
+    state = GameClass.STARTING_STATE
+    while len(positions) < count:
+        if GameClass.is_over(state):
+            state = GameClass.STARTING_STATE
+        positions.append(state)
+        moves = GameClass.get_possible_moves(state)
+        state = moves[random.randint(len(moves))]
+    return positions
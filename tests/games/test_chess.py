@@ -108,6 +108,55 @@ class TestChess(unittest.TestCase):
             for move in Chess.get_possible_moves(state):
                 self.test_encodings(move)
 
+    def test_board_bytes_format(self):
+        # expected values were generated by the original per-square implementation
+        expected_board_bytes = {
+            'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1':
+                b'\xff\xff\x00\x00\x00\x00\xff\xff\xfc\xb9\x8b\xcf\xdd\xdd\xdd\xddUUUUt1cG',
+            'r3k2r/8/8/3pP3/8/8/8/R3K2R w Kq d6 0 1': b'\x91\x00\x00\x18\x00\x00\x00\x91\xf8\xafRg',
+            '8/8/8/8/k7/8/2K5/7R b - - 0 1': b'\x00\x00\x00\x00\x01\x00\x04\x80\x0e\x02',
+        }
+        for fen, board_bytes in expected_board_bytes.items():
+            state = Chess.parse_fen(fen)
+            self.assertEqual(Chess.encode_board_bytes(state), board_bytes)
+            self.assertEqual(Chess.encode_board_bytes_batch(state[np.newaxis, ...]), [board_bytes])
+            self.assertTrue(np.all(Chess.parse_board_bytes(board_bytes) == state))
+
+    def test_board_bytes_batch(self):
+        with open('chess_test_cases.json') as f:
+            test_cases = json.load(f)
+
+        states = []
+        for test_case in test_cases:
+            state = Chess.parse_fen(test_case['fen'])
+            states.append(state)
+            states.extend(Chess.get_possible_moves(state))
+        states = np.stack(states, axis=0)
+
+        board_bytes_batch = Chess.encode_board_bytes_batch(states)
+        self.assertEqual(board_bytes_batch, [Chess.encode_board_bytes(state) for state in states])
+        self.assertTrue(np.all(Chess.parse_board_bytes_batch(board_bytes_batch) == states))
+
+    def test_benchmark_board_bytes(self):
+        test_cases, total_cases = self.get_benchmark_test_cases()
+        states = np.stack([state for test_case in test_cases for state in test_case['positions']], axis=0)
+        print(f'Starting benchmark with {len(states)} positions...')
+
+        start_time = time()
+        board_bytes_batch = [Chess.encode_board_bytes(state) for state in states]
+        print(f'encode_board_bytes: {time() - start_time}')
+        start_time = time()
+        Chess.encode_board_bytes_batch(states)
+        print(f'encode_board_bytes_batch: {time() - start_time}')
+
+        start_time = time()
+        for board_bytes in board_bytes_batch:
+            Chess.parse_board_bytes(board_bytes)
+        print(f'parse_board_bytes: {time() - start_time}')
+        start_time = time()
+        Chess.parse_board_bytes_batch(board_bytes_batch)
+        print(f'parse_board_bytes_batch: {time() - start_time}')
+
     def test_encodings(self, state):
         if not np.all(state == Chess.parse_board_bytes(Chess.encode_board_bytes(state))):
             raise AssertionError(f'Failed to consistently process board_bytes: {Chess.encode_fen(state)}')
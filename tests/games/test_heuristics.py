@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Othello, Connect4
+from perfect_information_game.move_selection import MiniMax
+from random_positions import get_random_positions
+
+
+class TestHeuristics(unittest.TestCase):
+    def check_batch(self, GameClass):
+        states = np.stack(get_random_positions(GameClass, count=100), axis=0)
+        heuristics = GameClass.heuristic_batch(states)
+        self.assertEqual(heuristics.shape, (len(states),))
+        self.assertTrue(np.allclose(heuristics, [GameClass.heuristic(state) for state in states]))
+        self.assertTrue(np.all(np.abs(heuristics) < 1))
+
+        # swapping the players' pieces must negate the evaluation
+        swapped_states = np.concatenate((states[..., 1:2], states[..., 0:1], states[..., 2:]), axis=-1)
+        self.assertTrue(np.allclose(GameClass.heuristic_batch(swapped_states), -heuristics))
+
+    def test_othello_batch(self):
+        self.check_batch(Othello)
+
+    def test_connect4_batch(self):
+        self.check_batch(Connect4)
+
+    def test_othello_legal_moves_batch(self):
+        for state in get_random_positions(Othello, count=100):
+            friendly_index = 0 if Othello.is_player_1_turn(state) else 1
+            legal_moves = Othello.get_legal_moves_batch(state[np.newaxis, :, :, friendly_index] == 1,
+                                                        state[np.newaxis, :, :, 1 - friendly_index] == 1)[0]
+            self.assertTrue(np.all(legal_moves == Othello.get_legal_moves(state)))
+
+    def test_othello_corner(self):
+        state = np.copy(Othello.STARTING_STATE)
+        self.assertEqual(Othello.heuristic(state), 0)
+        state[0, 0, 0] = 1
+        self.assertGreater(Othello.heuristic(state), 0)
+
+    def test_connect4_threat(self):
+        state = np.copy(Connect4.STARTING_STATE)
+        state[5, 0:3, 0] = 1  # open three for player 1 on the bottom row
+        state[4, 0:2, 1] = 1
+        self.assertGreater(Connect4.heuristic(state), 0.5)
+
+    def test_mini_max_uses_heuristic(self):
+        # player 1 has 3 in a row on the bottom row, so it should complete it
+        state = np.copy(Connect4.STARTING_STATE)
+        state[5, 1:4, 0] = 1
+        state[4, 1:4, 1] = 1
+        move = MiniMax(Connect4, state, depth=2).choose_move()
+        self.assertEqual(Connect4.get_winner(move), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
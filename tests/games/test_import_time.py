@@ -0,0 +1,43 @@
+import unittest
+import sys
+import subprocess
+
+
+class TestImportTime(unittest.TestCase):
+    MODULES = ['perfect_information_game.games', 'perfect_information_game.tablebases',
+               'perfect_information_game.move_selection', 'perfect_information_game.move_selection.mcts',
+               'perfect_information_game.move_selection.iterative_deepening']
+    HEAVY_MODULES = ['easygui', 'tkinter', 'pygame', 'keras', 'tensorflow', 'tensorflowjs', 'cachetools',
+                     'multiprocessing']
+    # time allowed for importing the package after numpy (including numpy.random) has already been imported
+    IMPORT_TIME_BUDGET = 0.1
+
+    @classmethod
+    def run_import(cls):
+        code = '\n'.join([
+            'import sys',
+            'from time import perf_counter',
+            'import numpy.random',
+            'start_time = perf_counter()',
+            *[f'import {module}' for module in cls.MODULES],
+            'print(perf_counter() - start_time)',
+            'print(" ".join(sorted({module.split(".")[0] for module in sys.modules})))',
+        ])
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        import_time, modules = output.splitlines()
+        return float(import_time), modules.split()
+
+    def test_heavy_modules_not_imported(self):
+        _, modules = self.run_import()
+        for module in self.HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    def test_import_time(self):
+        # take the best of a few runs to reduce noise from the operating system
+        import_time = min(self.run_import()[0] for _ in range(3))
+        print(f'Import time: {1000 * import_time:.1f} ms')
+        self.assertLess(import_time, self.IMPORT_TIME_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4, Othello, Checkers, Chess
+from perfect_information_game.move_selection.mcts import RolloutNode
+from random_positions import get_random_positions
+
+
+class TestStatePacking(unittest.TestCase):
+    def test_round_trip(self):
+        for GameClass in [TicTacToe, Connect4, Othello, Checkers, Chess]:
+            positions = get_random_positions(GameClass)
+            for position in positions:
+                packed_position = GameClass.pack_state(position)
+                self.assertEqual(len(packed_position), int(np.ceil(np.prod(GameClass.STATE_SHAPE) / 8)))
+                self.assertTrue(np.all(GameClass.unpack_state(packed_position) == position))
+
+            packed_positions = GameClass.pack_states(np.stack(positions, axis=0))
+            for packed_position, position in zip(packed_positions, positions):
+                self.assertEqual(packed_position.tobytes(), GameClass.pack_state(position))
+            self.assertTrue(np.all(GameClass.unpack_states(packed_positions) == np.stack(positions, axis=0)))
+
+    def test_packed_tree(self):
+        root = RolloutNode(Connect4.STARTING_STATE, parent=None, GameClass=Connect4, pack_position=True)
+        for _ in range(50):
+            root.choose_expansion_node().expand()
+        self.assertIsNone(root.unpacked_position)
+        self.assertTrue(np.all(root.position == Connect4.STARTING_STATE))
+        for child in root.children:
+            self.assertIsNone(child.unpacked_position)
+            self.assertTrue(child.pack_position)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4, Othello, Checkers
+from random_positions import get_random_positions
+
+
+class TestStateTransform(unittest.TestCase):
+    def check_game(self, GameClass):
+        for state in get_random_positions(GameClass):
+            canonical_state, transform = GameClass.canonicalize(state)
+            self.assertTrue(np.all(transform.untransform_state(canonical_state) == state))
+
+            for symmetry in GameClass.get_symmetry_transforms():
+                # every symmetric position must share the same canonical representative
+                symmetric_canonical_state, _ = GameClass.canonicalize(symmetry.transform_state(state))
+                self.assertTrue(np.all(symmetric_canonical_state == canonical_state))
+
+                # the rules must be invariant under the symmetry
+                symmetric_state = symmetry.transform_state(state)
+                self.assertEqual(GameClass.is_over(symmetric_state), GameClass.is_over(state))
+                self.assertTrue(np.all(symmetry.untransform_policy(GameClass.get_legal_moves(symmetric_state)) ==
+                                       GameClass.get_legal_moves(state)))
+                if GameClass.is_over(state):
+                    self.assertEqual(symmetry.transform_outcome(GameClass.get_winner(symmetric_state)),
+                                     GameClass.get_winner(state))
+                    continue
+
+                moves = {move.tobytes() for move in GameClass.get_possible_moves(state)}
+                symmetric_moves = {np.ascontiguousarray(symmetry.untransform_state(move)).tobytes()
+                                   for move in GameClass.get_possible_moves(symmetric_state)}
+                self.assertEqual(moves, symmetric_moves)
+
+            # distributions over the canonical state's legal moves must map back onto the original legal moves
+            legal_move_count = np.sum(GameClass.get_legal_moves(canonical_state))
+            distribution = np.arange(legal_move_count) / max(legal_move_count, 1)
+            self.assertEqual(len(transform.untransform_distribution(canonical_state, distribution)),
+                             legal_move_count)
+
+    def test_tic_tac_toe(self):
+        self.check_game(TicTacToe)
+
+    def test_connect4(self):
+        self.check_game(Connect4)
+
+    def test_othello(self):
+        self.check_game(Othello)
+
+    def test_checkers(self):
+        self.check_game(Checkers)
+
+    def test_symmetric_positions_share_canonical_form(self):
+        state = TicTacToe.get_possible_moves(TicTacToe.STARTING_STATE)[0]  # X in the top left corner
+        corners = [move for move in TicTacToe.get_possible_moves(TicTacToe.STARTING_STATE)
+                   if np.all(TicTacToe.canonicalize(move)[0] == TicTacToe.canonicalize(state)[0])]
+        self.assertEqual(len(corners), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
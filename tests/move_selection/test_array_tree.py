@@ -0,0 +1,144 @@
+import unittest
+import tracemalloc
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import RolloutNode, HeuristicNode, ArrayTree
+
+
+class OptimisticNetwork:
+    """
+    Evaluates the starting position of Connect4 as very good for player 1, but every other position as bad for them.
+    """
+    @staticmethod
+    def call(states):
+        return [(np.full(7, 1 / 7), 0.9 if np.all(state == Connect4.STARTING_STATE) else -0.5) for state in states]
+
+
+class TestArrayTree(unittest.TestCase):
+    @staticmethod
+    def search(root, expansions):
+        for _ in range(expansions):
+            best_node = root.choose_expansion_node()
+            if best_node is None:
+                break
+            best_node.expand()
+
+    @staticmethod
+    def count_nodes(root):
+        count = 0
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            count += 1
+            if node.children is not None:
+                stack.extend(node.children)
+        return count
+
+    def assert_same_search(self, array_root, object_root, expansions):
+        for _ in range(expansions):
+            array_node = array_root.choose_expansion_node()
+            object_node = object_root.choose_expansion_node()
+            self.assertEqual(array_node is None, object_node is None)
+            if object_node is None:
+                break
+            self.assertTrue(np.all(array_node.position == object_node.position))
+
+            # both trees must use the same random numbers for their rollouts
+            random_state = np.random.get_state()
+            array_node.expand()
+            np.random.set_state(random_state)
+            object_node.expand()
+
+        self.assertEqual(array_root.count_expansions(), object_root.count_expansions())
+        self.assertEqual(array_root.get_evaluation(), object_root.get_evaluation())
+        self.assertEqual([child.count_expansions() for child in array_root.children],
+                         [child.count_expansions() for child in object_root.children])
+
+    def test_matches_rollout_node(self):
+        np.random.seed(0)
+        # a small initial capacity makes sure that the arrays are grown several times
+        self.assert_same_search(ArrayTree(TicTacToe.STARTING_STATE, TicTacToe, capacity=4).root,
+                                RolloutNode(TicTacToe.STARTING_STATE, None, TicTacToe), 500)
+
+    def test_matches_heuristic_node(self):
+        network = HeuristicNetwork(Connect4)
+        self.assert_same_search(ArrayTree(Connect4.STARTING_STATE, Connect4, network).root,
+                                HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network), 300)
+
+    def test_matches_heuristic_node_evaluate_on_visit(self):
+        array_network = HeuristicNetwork(Connect4)
+        object_network = HeuristicNetwork(Connect4)
+        self.assert_same_search(ArrayTree(Connect4.STARTING_STATE, Connect4, array_network,
+                                          evaluate_on_visit=True).root,
+                                HeuristicNode(Connect4.STARTING_STATE, None, Connect4, object_network,
+                                              evaluate_on_visit=True), 300)
+        # each expansion only evaluates a single position (the root is evaluated when it is created instead)
+        self.assertEqual(array_network.evaluated_positions, 300)
+        self.assertEqual(object_network.evaluated_positions, 300)
+
+    def test_evaluate_on_visit_backup(self):
+        for root in [ArrayTree(Connect4.STARTING_STATE, Connect4, OptimisticNetwork(), evaluate_on_visit=True).root,
+                     HeuristicNode(Connect4.STARTING_STATE, None, Connect4, OptimisticNetwork(),
+                                   evaluate_on_visit=True)]:
+            self.search(root, 2)
+            # the value of the root comes from its evaluated child, even though that is worse than its own evaluation
+            self.assertEqual(root.get_evaluation(), -0.5)
+
+    def test_detach_compacts_tree(self):
+        root = ArrayTree(Connect4.STARTING_STATE, Connect4, HeuristicNetwork(Connect4)).root
+        self.search(root, 300)
+        tree = root.tree
+
+        best_node = root.choose_best_node(optimal=True)
+        expansions = best_node.count_expansions()
+        nodes = self.count_nodes(best_node)
+        position = best_node.position
+        best_node.parent = None
+
+        self.assertIsNone(best_node.parent)
+        self.assertEqual(best_node.index, 0)
+        self.assertEqual(tree.size, nodes)
+        self.assertEqual(best_node.count_expansions(), expansions)
+        self.assertTrue(np.all(best_node.position == position))
+        self.search(best_node, 100)
+        self.assertEqual(best_node.count_expansions(), expansions + 100)
+
+    def test_memory_per_node(self):
+        memory_per_node = []
+        for create_root in [lambda network: HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network),
+                            lambda network: HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network,
+                                                          pack_position=True),
+                            lambda network: ArrayTree(Connect4.STARTING_STATE, Connect4, network).root]:
+            network = HeuristicNetwork(Connect4)
+            tracemalloc.start()
+            root = create_root(network)
+            self.search(root, 300)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            memory_per_node.append(memory / self.count_nodes(root))
+
+        print(f'Memory per node: {memory_per_node[0]:.0f} bytes (objects), {memory_per_node[1]:.0f} bytes '
+              f'(objects with packed positions), {memory_per_node[2]:.0f} bytes (array tree)')
+        self.assertLess(memory_per_node[2], memory_per_node[1])
+        self.assertLess(memory_per_node[1], memory_per_node[0])
+
+    def test_custom_turn_encoding(self):
+        class ReversedTicTacToe(TicTacToe):
+            # the last feature plane is set when it is player 2's turn instead
+            @classmethod
+            def is_player_1_turn(cls, state):
+                return not np.all(state[..., -1])
+
+        root = ArrayTree(TicTacToe.STARTING_STATE, ReversedTicTacToe).root
+        self.search(root, 20)
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            self.assertEqual(node.is_maximizing, ReversedTicTacToe.is_player_1_turn(node.position))
+            if node.children is not None:
+                stack.extend(node.children)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import BatchedSearcher, GumbelSearch
+
+
+class CountingNetwork(HeuristicNetwork):
+    """
+    Returns a uniform policy and an evaluation of 0 for every position, and counts the calls that are made.
+    """
+
+    def __init__(self, GameClass):
+        super().__init__(GameClass)
+        self.calls = 0
+
+    def predict(self, states):
+        self.calls += 1
+        return np.ones((states.shape[0],) + self.GameClass.MOVE_SHAPE), np.zeros(states.shape[0])
+
+
+class TestBatchedSearcher(unittest.TestCase):
+    def test_single_network_call_per_step(self):
+        for array_tree in [False, True]:
+            network = CountingNetwork(Connect4)
+            searcher = BatchedSearcher(Connect4, network, expansions_per_move=20, leaves_per_tree=2,
+                                       array_tree=array_tree, evaluate_on_visit=True)
+            for _ in range(4):
+                searcher.add_tree(Connect4.STARTING_STATE)
+            # the roots are evaluated when they are created, so only their children need to be evaluated
+            searcher.step()
+            network.calls = 0
+            searcher.step()
+            self.assertEqual(network.calls, 1)
+
+            searcher.search()
+            for i in range(4):
+                self.assertTrue(searcher.is_search_finished(i))
+                best_node, distribution = searcher.choose_best_node(i)
+                self.assertEqual(len(distribution), 7)
+                searcher.set_root(i, best_node)
+                self.assertFalse(searcher.is_search_finished(i))
+
+    def test_fully_expanded_trees(self):
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0, 6, 2]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        searcher = BatchedSearcher(TicTacToe, CountingNetwork(TicTacToe), expansions_per_move=10 ** 6,
+                                   gumbel_search=GumbelSearch(considered_moves=4))
+        searcher.add_tree(TicTacToe.STARTING_STATE)
+        searcher.add_tree(position)
+        fully_expanded = []
+        while len(fully_expanded) == 0:
+            fully_expanded = searcher.step()
+        # only the tree of the position that is almost over is proven
+        self.assertEqual(fully_expanded, [1])
+        self.assertTrue(searcher.get_root(1).fully_expanded)
+        self.assertTrue(searcher.is_search_finished(1))
+        self.assertFalse(searcher.is_search_finished(0))
+
+        searcher.reset_tree(1, TicTacToe.STARTING_STATE)
+        self.assertEqual(searcher.get_root(1).count_expansions(), 0)
+        np.testing.assert_array_equal(searcher.get_root(1).position, TicTacToe.STARTING_STATE)
+
+
+if __name__ == '__main__':
+    unittest.main()
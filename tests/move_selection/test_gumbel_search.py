@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import GumbelSearch, HeuristicNode, ArrayTree, MCTS
+
+
+class TestGumbelSearch(unittest.TestCase):
+    def test_schedule(self):
+        schedule = GumbelSearch.get_schedule(4, 20)
+        self.assertEqual(len(schedule), 20)
+        # every considered move is visited once before any move is visited twice
+        self.assertEqual(schedule[:4], [0, 0, 0, 0])
+        # only the best 2 moves are visited in the final phase
+        self.assertEqual(schedule[-4:], [6, 6, 7, 7])
+
+    def test_sequential_halving(self):
+        network = HeuristicNetwork(Connect4)
+        for array_tree in [False, True]:
+            root = ArrayTree(Connect4.STARTING_STATE, Connect4, network, evaluate_on_visit=True).root \
+                if array_tree else HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network,
+                                                 evaluate_on_visit=True)
+            search = GumbelSearch(considered_moves=4, sample=False)
+            search.start(root, 32)
+            while not search.is_finished():
+                root.choose_expansion_node().expand()
+            # without gumbel noise and with uniform priors, the first 4 moves are considered
+            self.assertEqual(np.count_nonzero(search.visits), 4)
+            self.assertEqual(np.sum(search.visits), 32)
+            self.assertEqual(sorted(search.visits[search.visits > 0]), [4, 4, 12, 12])
+
+            search.finish()
+            self.assertIsNone(root.root_search)
+            best_child = search.choose_child(root)
+            self.assertIn(list(root.children).index(best_child), np.flatnonzero(search.visits == 12))
+            policy = search.get_improved_policy(root)
+            self.assertAlmostEqual(np.sum(policy), 1)
+            self.assertEqual(len(policy), 7)
+
+    def test_mcts(self):
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0, 6]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        # the only move that doesn't lose is blocking the diagonal
+        mcts = MCTS(TicTacToe, position, gumbel_search=GumbelSearch(simulations=200, considered_moves=6))
+        chosen_position = mcts.choose_move(time_limit=30)[-1]
+        np.testing.assert_array_equal(chosen_position, TicTacToe.get_possible_moves(position)[1])
+
+        gumbel_search = GumbelSearch(simulations=16)
+        mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), batch_size=4, evaluate_on_visit=True,
+                    gumbel_search=gumbel_search)
+        mcts.choose_move(time_limit=30)
+        self.assertEqual(gumbel_search.simulation, 16)
+        self.assertIsNone(gumbel_search.root)
+
+
+if __name__ == '__main__':
+    unittest.main()
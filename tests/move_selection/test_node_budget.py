@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import HeuristicNode, ArrayTree, MCTS
+
+
+class TestNodeBudget(unittest.TestCase):
+    @staticmethod
+    def search(root, expansions):
+        for _ in range(expansions):
+            best_node = root.choose_expansion_node()
+            if best_node is None:
+                break
+            best_node.expand()
+
+    def check_prune(self, root):
+        self.search(root, 300)
+        nodes = root.count_nodes()
+        expansions = root.count_expansions()
+        evaluation = root.get_evaluation()
+
+        removed_nodes = root.prune(100)
+        self.assertGreater(removed_nodes, 0)
+        self.assertLessEqual(root.count_nodes(), 100)
+        self.assertEqual(root.count_nodes(), nodes - removed_nodes)
+        # the statistics of the remaining nodes are kept
+        self.assertEqual(root.count_expansions(), expansions)
+        self.assertEqual(root.get_evaluation(), evaluation)
+
+        # collapsed nodes are expanded again when they are selected
+        self.search(root, 100)
+        self.assertEqual(root.count_expansions(), expansions + 100)
+
+    def test_prune(self):
+        network = HeuristicNetwork(Connect4)
+        self.check_prune(HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network))
+        self.check_prune(HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network, evaluate_on_visit=True))
+        self.check_prune(ArrayTree(Connect4.STARTING_STATE, Connect4, network).root)
+        self.check_prune(ArrayTree(Connect4.STARTING_STATE, Connect4, network, evaluate_on_visit=True).root)
+
+    def test_mcts_node_budget(self):
+        for array_tree in [False, True]:
+            tree_stats = []
+            mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), array_tree=array_tree, max_nodes=500,
+                        tree_stats_callback=tree_stats.append)
+            mcts.choose_move(time_limit=2)
+            self.assertGreater(tree_stats[-1]['pruned_nodes'], 0)
+            self.assertTrue(np.all([stats['nodes'] <= 500 for stats in tree_stats]))
+            self.assertGreater(tree_stats[-1]['bytes_per_node'], 0)
+
+    def test_stop_without_pruning(self):
+        mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), max_nodes=500, prune_nodes=False)
+        root = mcts.create_root()
+        self.assertFalse(mcts.search(root, 10))
+        # the tree can only exceed the budget by the nodes added since it was last counted
+        self.assertLess(root.count_nodes(), 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from multiprocessing import Process
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.move_selection import PositionMailbox
+from perfect_information_game.move_selection.mcts import AsyncMCTS
+from perfect_information_game.move_selection.iterative_deepening import AsyncIterativeDeepening
+
+
+def write_moves(mailbox, count):
+    position = TicTacToe.STARTING_STATE
+    for tag in range(1, count + 1):
+        position = TicTacToe.get_possible_moves(position)[0]
+        mailbox.write([position], info={'tag': tag}, tag=tag)
+
+
+class TestPositionMailbox(unittest.TestCase):
+    def test_write_read(self):
+        mailbox = PositionMailbox(TicTacToe, max_positions=2)
+        try:
+            self.assertEqual(mailbox.read(), (-1, [], [], None))
+            moves = TicTacToe.get_possible_moves(TicTacToe.STARTING_STATE)
+            mailbox.write(moves[:2], [np.full(9, 1 / 9), None], info={'nodes': 10}, tag=1)
+            # only the latest result is kept
+            mailbox.write(moves[2:4], [np.full(9, 1 / 9), np.arange(3.)], info={'nodes': 20}, tag=2)
+            tag, positions, distributions, info = mailbox.read()
+            self.assertEqual(tag, 2)
+            self.assertTrue(all(np.all(position == move) for position, move in zip(positions, moves[2:4])))
+            np.testing.assert_array_equal(distributions[1], np.arange(3.))
+            self.assertEqual(info, {'nodes': 20})
+
+            with self.assertRaises(ValueError):
+                mailbox.write(moves[:3])
+            # a failed write leaves the previous result untouched
+            self.assertEqual(mailbox.read()[0], 2)
+        finally:
+            mailbox.close()
+
+    def test_worker_process(self):
+        mailbox = PositionMailbox(TicTacToe, max_positions=1)
+        try:
+            process = Process(target=write_moves, args=(mailbox, 5))
+            process.start()
+            tag, (position,), _, info = mailbox.wait(5)
+            process.join()
+            self.assertEqual(info, {'tag': 5})
+            self.assertEqual(np.sum(position[..., :2]), 5)
+        finally:
+            mailbox.close()
+
+    def test_async_move_choosers(self):
+        async_mcts = AsyncMCTS(Connect4, Connect4.STARTING_STATE, time_limit=0.5)
+        async_mcts.start()
+        try:
+            position = async_mcts.choose_move()[-1]
+            self.assertIn(position.tobytes(), [move.tobytes() for move in
+                                               Connect4.get_possible_moves(Connect4.STARTING_STATE)])
+            user_move = Connect4.get_possible_moves(position)[0]
+            async_mcts.report_user_move(user_move)
+            position = async_mcts.choose_move()[-1]
+            self.assertIn(position.tobytes(), [move.tobytes() for move in Connect4.get_possible_moves(user_move)])
+            self.assertGreater(async_mcts.get_statistics()['nodes'], 0)
+        finally:
+            async_mcts.terminate()
+
+        async_iterative_deepening = AsyncIterativeDeepening(Connect4, time_limit=0.5)
+        async_iterative_deepening.start()
+        try:
+            position = async_iterative_deepening.choose_move()[-1]
+            self.assertIn(position.tobytes(), [move.tobytes() for move in
+                                               Connect4.get_possible_moves(Connect4.STARTING_STATE)])
+            self.assertGreater(async_iterative_deepening.get_statistics()['nodes'], 0)
+        finally:
+            async_iterative_deepening.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
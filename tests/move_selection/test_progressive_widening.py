@@ -0,0 +1,99 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4, Gomoku, Amazons
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import ProgressiveWidening, LazyMoves, RolloutNode, HeuristicNode, \
+    MCTS
+
+
+class TestProgressiveWidening(unittest.TestCase):
+    def test_iter_possible_moves(self):
+        for GameClass in [Gomoku, Amazons, Connect4]:
+            moves = GameClass.get_possible_moves(GameClass.STARTING_STATE)
+            lazy_moves = list(GameClass.iter_possible_moves(GameClass.STARTING_STATE))
+            self.assertEqual(len(moves), len(lazy_moves))
+            for move, lazy_move in zip(moves, lazy_moves):
+                np.testing.assert_array_equal(move, lazy_move)
+
+    def test_lazy_moves(self):
+        moves = Gomoku.get_possible_moves(Gomoku.STARTING_STATE)
+        priors = np.random.random(len(moves))
+        lazy_moves = LazyMoves(Gomoku, Gomoku.STARTING_STATE, priors)
+        for expected_index in np.argsort(-priors)[:20]:
+            index, move = lazy_moves.take()
+            self.assertEqual(index, expected_index)
+            np.testing.assert_array_equal(move, moves[index])
+
+        # every move that has been generated is either taken or cached, so none are generated twice
+        self.assertEqual(len(lazy_moves.cache) + 20, lazy_moves.next_index)
+
+        # limiting the cache doesn't change the order
+        lazy_moves = LazyMoves(Gomoku, Gomoku.STARTING_STATE, priors, max_cached=4)
+        for expected_index in np.argsort(-priors)[:20]:
+            index, move = lazy_moves.take()
+            self.assertEqual(index, expected_index)
+            np.testing.assert_array_equal(move, moves[index])
+        self.assertLessEqual(len(lazy_moves.cache), 4)
+
+        # without priors, moves are taken in order until they run out
+        lazy_moves = LazyMoves(Connect4, Connect4.STARTING_STATE)
+        self.assertEqual([lazy_moves.take()[0] for _ in range(7)], list(range(7)))
+        self.assertIsNone(lazy_moves.take())
+        self.assertTrue(lazy_moves.exhausted)
+
+    def test_child_limit(self):
+        widening = ProgressiveWidening(constant=2, exponent=0.5)
+        root = RolloutNode(Connect4.STARTING_STATE, None, Connect4, progressive_widening=widening)
+        for _ in range(10):
+            root.choose_expansion_node().expand()
+            self.assertLessEqual(len(root.children) if root.children is not None else 0,
+                                 widening.get_child_limit(root.count_expansions()))
+        # children are added when a node is selected, which was last done with 9 expansions
+        self.assertEqual(len(root.children), widening.get_child_limit(9))
+        # the distribution covers every possible move, including those that haven't been added yet
+        _, distribution = root.choose_best_node(return_probability_distribution=True)
+        self.assertEqual(len(distribution), 7)
+        self.assertAlmostEqual(np.sum(distribution[root.move_indices]), 1)
+        self.assertTrue(np.all(np.delete(distribution, root.move_indices) == 0))
+
+        # the most promising move is added first when moves are ranked by their heuristic
+        root = RolloutNode(Connect4.STARTING_STATE, None, Connect4,
+                           progressive_widening=ProgressiveWidening(rank_by_heuristic=True))
+        root.choose_expansion_node().expand()
+        root.ensure_children()
+        self.assertEqual(root.move_indices, [3])
+
+    def test_proof(self):
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0, 6]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        root = RolloutNode(position, None, TicTacToe, progressive_widening=ProgressiveWidening())
+        best_node = root.choose_expansion_node()
+        while best_node is not None:
+            best_node.expand()
+            best_node = root.choose_expansion_node()
+        # the node isn't proven to be a draw until every move has been added
+        self.assertEqual(len(root.children), len(TicTacToe.get_possible_moves(position)))
+        self.assertEqual(root.get_evaluation(), 0)
+
+    def test_heuristic_node(self):
+        network = HeuristicNetwork(Connect4)
+        with self.assertRaises(ValueError):
+            HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network, progressive_widening=ProgressiveWidening())
+
+        root = HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network, evaluate_on_visit=True,
+                             progressive_widening=ProgressiveWidening())
+        for _ in range(16):
+            root.choose_expansion_node().expand()
+        self.assertEqual(len(root.children), 4)
+        self.assertEqual(len(root.get_puct_heuristics(root.get_children_statistics()[1])), 4)
+
+        mcts = MCTS(Connect4, network=network, evaluate_on_visit=True, batch_size=4,
+                    progressive_widening=ProgressiveWidening())
+        self.assertEqual(len(mcts.choose_move(time_limit=0.5)), 1)
+        with self.assertRaises(ValueError):
+            MCTS(Connect4, array_tree=True, progressive_widening=ProgressiveWidening())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import AbstractNode, RolloutNode, HeuristicNode, ArrayTree
+
+
+class TestPUCTSelection(unittest.TestCase):
+    def test_best_combined_heuristic(self):
+        fully_expanded = np.array([False, False, False])
+        evaluations = np.array([0.5, 0.2, -0.3])
+        puct_heuristics = np.array([0.1, 0.5, 0.2])
+        self.assertEqual(AbstractNode.select_child(True, fully_expanded, evaluations, puct_heuristics), (1, None))
+        self.assertEqual(AbstractNode.select_child(False, fully_expanded, evaluations, puct_heuristics), (2, None))
+
+    def test_unexplored_child(self):
+        fully_expanded = np.array([False, False, False])
+        evaluations = np.array([0.9, 0, 0])
+        puct_heuristics = np.array([0.1, np.inf, np.inf])
+        self.assertEqual(AbstractNode.select_child(True, fully_expanded, evaluations, puct_heuristics), (1, None))
+
+    def test_fully_expanded_children_are_masked(self):
+        fully_expanded = np.array([True, False, True])
+        evaluations = np.array([0, 0.1, -1])
+        puct_heuristics = np.array([2, 0.1, 2])
+        self.assertEqual(AbstractNode.select_child(True, fully_expanded, evaluations, puct_heuristics), (1, None))
+
+    def test_proven_win(self):
+        fully_expanded = np.array([False, True, False])
+        evaluations = np.array([0.5, -1, 0.2])
+        puct_heuristics = np.array([0.1, 0.5, 0.2])
+        self.assertEqual(AbstractNode.select_child(False, fully_expanded, evaluations, puct_heuristics), (None, -1))
+
+        # an unexplored child that comes first is still chosen before the proven win is found
+        puct_heuristics[0] = np.inf
+        self.assertEqual(AbstractNode.select_child(False, fully_expanded, evaluations, puct_heuristics), (0, None))
+
+    def test_all_fully_expanded(self):
+        fully_expanded = np.array([True, True, True])
+        evaluations = np.array([0, -1, 0])
+        puct_heuristics = np.array([0.1, 0.5, 0.2])
+        self.assertEqual(AbstractNode.select_child(True, fully_expanded, evaluations, puct_heuristics), (None, 0))
+
+    def test_virtual_losses(self):
+        fully_expanded = np.array([False, False, True])
+        expansions = np.array([3, 3, np.inf])
+        evaluations = np.array([0.5, 0.5, 1])
+        expansions, evaluations = AbstractNode.apply_virtual_losses(True, fully_expanded, expansions, evaluations,
+                                                                    np.array([1, 0, 0]))
+        self.assertTrue(np.all(expansions == [4, 3, np.inf]))
+        # the pending child looks worse to the maximizing player, fully expanded children are unaffected
+        self.assertTrue(np.allclose(evaluations, [0.2, 0.5, 1]))
+
+    def check_expand_batch(self, root, network):
+        # the root is the only node that can be expanded at first
+        self.assertEqual(root.expand_batch(network, 4), 1)
+        for _ in range(4):
+            self.assertEqual(root.expand_batch(network, 4), 4)
+        self.assertEqual(root.count_expansions(), 1 + 4 * 4)
+
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            self.assertEqual(node.virtual_losses, 0)
+            if node.children is not None:
+                stack.extend(node.children)
+
+    def test_expand_batch(self):
+        network = HeuristicNetwork(Connect4)
+        self.check_expand_batch(HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network), network)
+        self.check_expand_batch(ArrayTree(Connect4.STARTING_STATE, Connect4, network).root, network)
+        self.check_expand_batch(HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network,
+                                              evaluate_on_visit=True), network)
+
+    def get_reference_depth(self, node):
+        """
+        Recursively searches the proven subtree, which is what the cached proof depths replace.
+        """
+        if node.children is None:
+            return 0
+        depths = [self.get_reference_depth(child) for child in node.children
+                  if child.fully_expanded and child.get_evaluation() == node.get_evaluation()]
+        optimal_value = 1 if node.is_maximizing else -1
+        return 1 + (min(depths) if node.get_evaluation() == optimal_value else max(depths))
+
+    def check_proof_depths(self, root):
+        best_node = root.choose_expansion_node()
+        while best_node is not None:
+            best_node.expand()
+            best_node = root.choose_expansion_node()
+        self.assertTrue(root.fully_expanded)
+
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.fully_expanded:
+                self.assertEqual(node.depth_to_end_game(), self.get_reference_depth(node))
+            if node.children is not None:
+                stack.extend(node.children)
+
+    def test_proof_depths(self):
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        self.check_proof_depths(RolloutNode(position, None, TicTacToe))
+        self.check_proof_depths(ArrayTree(position, TicTacToe).root)
+
+    def test_set_fully_expanded(self):
+        # X can win immediately by completing the top row
+        position = TicTacToe.STARTING_STATE.copy()
+        position[0, :2, 0] = 1
+        position[1, :2, 1] = 1
+        for root in [RolloutNode(position, None, TicTacToe), ArrayTree(position, TicTacToe).root]:
+            root.ensure_children()
+            fully_expanded, _, evaluations = root.get_children_statistics()
+            # the proof depth is set even when the node isn't proven by choose_expansion_node
+            root.set_fully_expanded(1, fully_expanded, evaluations)
+            self.assertTrue(root.fully_expanded)
+            self.assertEqual(root.depth_to_end_game(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
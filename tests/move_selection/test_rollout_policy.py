@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Chess, Connect4
+from perfect_information_game.move_selection.mcts import RolloutPolicy, RolloutNode, ArrayTree
+
+
+class TestRolloutPolicy(unittest.TestCase):
+    def test_truncated_rollout(self):
+        position = Chess.parse_fen('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')
+        self.assertAlmostEqual(RolloutPolicy(max_depth=0, heuristic_scale=10).rollout(Chess, position), np.tanh(0.5))
+        # the outcome is used if the game ends before max_depth
+        self.assertIn(RolloutPolicy(max_depth=100).rollout(Connect4, Connect4.STARTING_STATE), [-1, 0, 1])
+        outcome = RolloutPolicy(max_depth=10).rollout(Connect4, Connect4.STARTING_STATE)
+        self.assertTrue(-1 <= outcome <= 1)
+
+    def test_captures_first(self):
+        # the only capture is the rook taking the queen
+        position = Chess.parse_fen('4k3/8/8/3q4/8/8/3R4/p3K3 w - - 0 1')
+        moves = np.array(Chess.get_possible_moves(position))
+        captures = Chess.get_captures(position, moves)
+        self.assertEqual(np.sum(captures), 1)
+
+        policy = RolloutPolicy(captures_first=True)
+        for _ in range(5):
+            self.assertTrue(np.all(policy.choose_move(Chess, position, moves) == moves[captures][0]))
+
+    def test_greedy_moves(self):
+        position = Chess.parse_fen('4k3/8/8/3q4/8/8/3R4/4K3 b - - 0 1')
+        moves = np.array(Chess.get_possible_moves(position))
+        chosen_move = RolloutPolicy(epsilon=0).choose_move(Chess, position, moves)
+        # black's best move by the material heuristic is to capture the rook
+        self.assertEqual(Chess.heuristic(chosen_move), -9 + 100 - 100)
+
+    def test_search(self):
+        policy = RolloutPolicy(max_depth=8, epsilon=0.5)
+        for root in [RolloutNode(Connect4.STARTING_STATE, None, Connect4, rollout_policy=policy),
+                     ArrayTree(Connect4.STARTING_STATE, Connect4, rollout_policy=policy).root]:
+            for _ in range(50):
+                root.choose_expansion_node().expand()
+            self.assertEqual(root.count_expansions(), 50)
+            self.assertTrue(-1 <= root.get_evaluation() <= 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Connect4
+from perfect_information_game.move_selection.mcts import RolloutNode, ArrayTree, RolloutPool, MCTS
+
+
+class TestRolloutPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = RolloutPool(Connect4, 2, pipeline_depth=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.terminate()
+
+    def check_pipeline(self, root):
+        for _ in range(30):
+            self.assertTrue(self.pool.step(root, 2))
+        self.pool.flush()
+        # each step backs up one leaf, and the leaves that were still in flight are backed up by flush
+        self.assertGreaterEqual(root.count_expansions(), 2 * 30)
+        self.assertEqual(root.count_expansions() % 2, 0)
+
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            self.assertEqual(node.virtual_losses, 0)
+            if node.children is not None:
+                stack.extend(node.children)
+
+    def test_pipeline(self):
+        self.check_pipeline(RolloutNode(Connect4.STARTING_STATE, None, Connect4, pool=self.pool))
+        self.check_pipeline(ArrayTree(Connect4.STARTING_STATE, Connect4, pool=self.pool).root)
+
+    def test_rollout(self):
+        outcomes = self.pool.submit(Connect4.STARTING_STATE, 20).get()
+        self.assertEqual(len(outcomes), 20)
+        self.assertTrue(np.all(np.isin(outcomes, [-1, 0, 1])))
+        self.assertIn(self.pool.rollout(Connect4.STARTING_STATE, 4), range(-4, 5))
+
+    def test_mcts(self):
+        mcts = MCTS(Connect4, threads=2)
+        try:
+            chosen_position = mcts.choose_move(time_limit=1)[-1]
+            self.assertTrue(any(np.all(chosen_position == move)
+                                for move in Connect4.get_possible_moves(Connect4.STARTING_STATE)))
+            self.assertEqual(mcts.root.virtual_losses, 0)
+        finally:
+            mcts.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.move_selection.mcts import MCTS, AsyncMCTS, RootParallelSearch
+
+
+def is_legal(GameClass, position, move):
+    return any(np.all(move == possible_move) for possible_move in GameClass.get_possible_moves(position))
+
+
+class TestRootParallel(unittest.TestCase):
+    def test_merged_statistics(self):
+        search = RootParallelSearch(Connect4, Connect4.STARTING_STATE, 2)
+        search.statistics = np.zeros((2, search.max_children + 1, 3))
+        search.statistics[:, 0, 0] = 3
+        # [expansions, evaluation, fully expanded] for each child of each worker's root
+        search.statistics[0, 1:4] = [[10, 0.5, 0], [30, 0.1, 0], [np.inf, -1, 1]]
+        search.statistics[1, 1:4] = [[30, 0.1, 0], [10, 0.5, 0], [5, 0.2, 0]]
+        fully_expanded, expansions, evaluations = search.get_merged_statistics()
+
+        self.assertTrue(np.all(fully_expanded == [False, False, True]))
+        self.assertTrue(np.all(expansions == [40, 40, np.inf]))
+        # a proof from any worker is used, since it is exact
+        self.assertTrue(np.allclose(evaluations, [0.2, 0.2, -1]))
+
+        _, distribution = search.choose_best_child()
+        # player 1 must never choose the proven loss
+        self.assertEqual(distribution[2], 0)
+
+    def test_mcts(self):
+        mcts = MCTS(TicTacToe, root_parallel_workers=2)
+        try:
+            position = mcts.position
+            chosen_position = mcts.choose_move(time_limit=0.5)[-1]
+            self.assertTrue(is_legal(TicTacToe, position, chosen_position))
+
+            user_chosen_position = TicTacToe.get_possible_moves(chosen_position)[0]
+            mcts.report_user_move(user_chosen_position)
+            chosen_position = mcts.choose_move(time_limit=0.5)[-1]
+            self.assertTrue(is_legal(TicTacToe, user_chosen_position, chosen_position))
+        finally:
+            mcts.terminate()
+
+    def test_async_mcts(self):
+        mcts = AsyncMCTS(TicTacToe, TicTacToe.STARTING_STATE, time_limit=0.5, root_parallel_workers=2)
+        mcts.start()
+        try:
+            user_chosen_position = TicTacToe.get_possible_moves(TicTacToe.STARTING_STATE)[4]
+            mcts.report_user_move(user_chosen_position)
+            positions, distribution = mcts.choose_move(return_distribution=True)[-1]
+            self.assertTrue(is_legal(TicTacToe, user_chosen_position, positions))
+            self.assertAlmostEqual(np.sum(distribution), 1)
+        finally:
+            mcts.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import json
+import unittest
+from time import sleep
+from tempfile import TemporaryDirectory
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection import SearchStatistics, MiniMax
+from perfect_information_game.move_selection.mcts import MCTS
+from perfect_information_game.move_selection.iterative_deepening import IterativeDeepening
+
+
+class TestSearchStatistics(unittest.TestCase):
+    def test_nested_timers(self):
+        search_statistics = SearchStatistics('Test')
+        with search_statistics.timer('outer'):
+            sleep(0.05)
+            with search_statistics.timer('inner'):
+                sleep(0.1)
+        # the time of the inner phase isn't counted for the outer phase
+        self.assertGreaterEqual(search_statistics.times['inner'], 0.1)
+        self.assertLess(search_statistics.times['outer'], 0.1)
+
+        search_statistics.add_node(1)
+        search_statistics.add_node(1)
+        search_statistics.add_cache('cache', 4, 1)
+        stats = search_statistics.finish()
+        self.assertEqual(stats['nodes'], 2)
+        self.assertEqual(stats['depths'], {1: 2})
+        self.assertEqual(stats['caches']['cache']['hit_rate'], 0.25)
+        search_statistics.start()
+        self.assertEqual(search_statistics.nodes, 0)
+        self.assertIs(search_statistics.get_stats(), stats)
+
+    def test_mcts(self):
+        with TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'stats.jsonl')
+            mcts = MCTS(TicTacToe, transpositions=True, max_nodes=200)
+            mcts.log_statistics(log_path)
+            self.assertIsNone(mcts.get_statistics())
+            mcts.choose_move(time_limit=1)
+            stats = mcts.get_statistics()
+            self.assertEqual(stats['chooser'], 'MCTS')
+            self.assertGreater(stats['nodes'], 0)
+            self.assertEqual(sum(stats['depths'].values()), stats['nodes'])
+            for phase in ['selection', 'expansion', 'move_generation', 'rollout', 'backup']:
+                self.assertIn(phase, stats['times'])
+            self.assertLessEqual(sum(stats['times'].values()), stats['time'])
+            self.assertGreater(stats['caches']['transpositions']['lookups'], 0)
+            self.assertGreater(stats['counts']['pruned_nodes'], 0)
+            # the tree is counted before its root is advanced to the chosen move
+            self.assertLessEqual(stats['tree_size'], 200)
+            self.assertGreater(stats['tree_size'], mcts.root.count_nodes())
+
+            mcts.choose_move(time_limit=0.5)
+            with open(log_path) as fin:
+                lines = [json.loads(line) for line in fin]
+            self.assertEqual(len(lines), 2)
+            self.assertEqual(lines[-1]['nodes'], mcts.get_statistics()['nodes'])
+
+        mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), batch_size=4, array_tree=True)
+        mcts.choose_move(time_limit=1)
+        stats = mcts.get_statistics()
+        self.assertIn('inference', stats['times'])
+        self.assertEqual(sum(stats['depths'].values()), stats['nodes'])
+        self.assertGreater(stats['counts']['batches'], 0)
+
+    def test_alpha_beta(self):
+        mini_max = MiniMax(Connect4, depth=3)
+        mini_max.choose_move()
+        stats = mini_max.get_statistics()
+        self.assertEqual(set(stats['depths']), {1, 2, 3})
+        self.assertGreater(stats['counts']['cutoffs'], 0)
+        for phase in ['move_generation', 'evaluation', 'backup']:
+            self.assertIn(phase, stats['times'])
+        self.assertLessEqual(sum(stats['times'].values()), stats['time'])
+
+        iterative_deepening = IterativeDeepening(Connect4, depth=3)
+        iterative_deepening.choose_move()
+        stats = iterative_deepening.get_statistics()
+        self.assertEqual(set(stats['depths']), {1, 2, 3})
+        self.assertEqual(stats['depths'][1], 7)
+        for phase in ['move_generation', 'evaluation', 'backup']:
+            self.assertIn(phase, stats['times'])
+        self.assertLessEqual(sum(stats['times'].values()), stats['time'])
+
+
+if __name__ == '__main__':
+    unittest.main()
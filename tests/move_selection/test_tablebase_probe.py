@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Chess
+from perfect_information_game.move_selection.mcts import TablebaseProbe, RolloutPolicy, RolloutNode, MCTS
+
+
+class KQkTablebaseManager:
+    """
+    Stands in for a ChessTablebaseManager in which white always wins KQk in 5 moves, KPk is always drawn (which
+    the tablebases store with an infinite terminal distance) and KRk is missing from the tablebase.
+    """
+    GameClass = Chess
+    available_tablebases = ['KQk', 'KPk', 'KRk']
+    results = {'KQk': (1, 5), 'KPk': (0, np.inf)}
+
+    @classmethod
+    def query_position(cls, state, outcome_only=False):
+        outcome, terminal_distance = cls.results.get(Chess.get_position_descriptor(state), (np.nan, np.nan))
+        return (outcome, terminal_distance) if outcome_only else (None, outcome, terminal_distance)
+
+
+class DrawnTablebaseManager:
+    """
+    Stands in for a ChessTablebaseManager in which every position is drawn, except for one missing position.
+    """
+    GameClass = Chess
+    available_tablebases = ['KPkp']
+
+    def __init__(self, missing_position):
+        self.missing_position = missing_position
+
+    def query_position(self, state, outcome_only=False):
+        outcome, terminal_distance = (np.nan, np.nan) if np.array_equal(state, self.missing_position) else (0, np.inf)
+        return (outcome, terminal_distance) if outcome_only else (None, outcome, terminal_distance)
+
+
+class TestTablebaseProbe(unittest.TestCase):
+    # white can capture black's queen, which leads to a position in the tablebase
+    position = Chess.parse_fen('q3k3/8/8/8/8/8/8/Q3K3 w - - 0 1')
+    rollout_policy = RolloutPolicy(max_depth=10, heuristic_scale=10)
+
+    def test_probe(self):
+        probe = TablebaseProbe(KQkTablebaseManager())
+        # positions with more pieces than any tablebase aren't looked up
+        self.assertIsNone(probe.probe(self.position))
+        self.assertEqual(probe.probes, 0)
+
+        drawn_position = Chess.parse_fen('4k3/8/8/8/8/8/P7/4K3 w - - 0 1')
+        self.assertEqual(probe.probe(drawn_position), (0, TablebaseProbe.DRAW_DISTANCE))
+        node = RolloutNode(drawn_position, None, Chess, tablebase_probe=probe)
+        self.assertTrue(node.fully_expanded)
+        self.assertEqual(node.depth_to_end_game(), TablebaseProbe.DRAW_DISTANCE)
+        probe = TablebaseProbe(KQkTablebaseManager())
+
+        self.assertIsNone(probe.probe(Chess.parse_fen('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')))
+        self.assertEqual(probe.probe(Chess.parse_fen('4k3/8/8/8/8/8/8/Q3K3 w - - 0 1')), (1, 5))
+        self.assertEqual(probe.get_stats()['hit_rate'], 0.5)
+
+        # rollouts stop as soon as they reach a position in the tablebase
+        self.assertEqual(RolloutPolicy().rollout(Chess, Chess.parse_fen('4k3/8/8/8/8/8/8/Q3K3 b - - 0 1'), probe), 1)
+        self.assertEqual(probe.hits, 2)
+
+    def test_nodes(self):
+        probe = TablebaseProbe(KQkTablebaseManager())
+        root = RolloutNode(self.position, None, Chess, rollout_policy=self.rollout_policy, tablebase_probe=probe)
+        expansions = 0
+        best_node = root.choose_expansion_node()
+        while best_node is not None:
+            best_node.expand()
+            expansions += 1
+            best_node = root.choose_expansion_node()
+        # the capture is found in the tablebase, which proves that the root is winning without searching it
+        self.assertLessEqual(expansions, len(Chess.get_possible_moves(self.position)) + 1)
+        self.assertTrue(root.fully_expanded)
+        self.assertEqual(root.get_evaluation(), 1)
+        self.assertEqual(root.depth_to_end_game(), 6)
+        best_node = root.choose_best_node(optimal=True)
+        self.assertEqual(Chess.get_position_descriptor(best_node.position), 'KQk')
+        self.assertIsNone(best_node.children)
+
+    def test_drawn_children(self):
+        position = Chess.parse_fen('4k3/p7/8/8/8/8/P7/4K3 w - - 0 1')
+        probe = TablebaseProbe(DrawnTablebaseManager(position))
+        root = RolloutNode(position, None, Chess, rollout_policy=self.rollout_policy, tablebase_probe=probe)
+        best_node = root.choose_expansion_node()
+        while best_node is not None:
+            best_node.expand()
+            best_node = root.choose_expansion_node()
+        self.assertEqual(root.get_evaluation(), 0)
+        self.assertEqual(root.depth_to_end_game(), TablebaseProbe.DRAW_DISTANCE + 1)
+
+        # the weights of the children must not overflow, even though their proofs are very long
+        _, distribution = root.choose_best_node(return_probability_distribution=True)
+        self.assertTrue(np.all(np.isfinite(distribution)))
+        np.testing.assert_allclose(distribution, 1 / len(root.children))
+        self.assertIn(root.choose_best_node(), root.children)
+
+    def test_mcts(self):
+        mcts = MCTS(Chess, self.position, rollout_policy=self.rollout_policy, tablebase_manager=KQkTablebaseManager())
+        chosen_position = mcts.choose_move(time_limit=5)[-1]
+        self.assertEqual(Chess.get_position_descriptor(chosen_position), 'KQk')
+        self.assertGreater(mcts.tablebase_probe.hits, 0)
+
+        # the root is now a position from the tablebase, which is fully expanded without any children
+        mcts.report_user_move(Chess.get_possible_moves(mcts.position)[0])
+        self.assertEqual(Chess.get_position_descriptor(mcts.choose_move(time_limit=1)[-1]), 'KQk')
+
+        with self.assertRaises(ValueError):
+            MCTS(Chess, array_tree=True, tablebase_manager=KQkTablebaseManager())
+
+
+if __name__ == '__main__':
+    unittest.main()
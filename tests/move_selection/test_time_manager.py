@@ -0,0 +1,70 @@
+import unittest
+from time import time
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.move_selection.mcts import TimeManager, RolloutNode, MCTS
+
+
+class TestTimeManager(unittest.TestCase):
+    @staticmethod
+    def find_forced_position(position):
+        """
+        :return: A position that isn't over where there is only one legal move.
+        """
+        moves = TicTacToe.get_possible_moves(position)
+        if len(moves) == 1 and not TicTacToe.is_over(position):
+            return position
+        for move in moves:
+            if not TicTacToe.is_over(move):
+                forced_position = TestTimeManager.find_forced_position(move)
+                if forced_position is not None:
+                    return forced_position
+        return None
+
+    def test_only_one_legal_move(self):
+        time_manager = TimeManager(verbose=False)
+        mcts = MCTS(TicTacToe, self.find_forced_position(TicTacToe.STARTING_STATE), time_manager=time_manager)
+        start_time = time()
+        mcts.choose_move(time_limit=5)
+        self.assertLess(time() - start_time, 1)
+        self.assertEqual(time_manager.reason, 'only one legal move')
+        self.assertGreater(time_manager.total_time_saved, 4)
+
+    def test_root_proven(self):
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0, 6]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        time_manager = TimeManager(verbose=False)
+        MCTS(TicTacToe, position, time_manager=time_manager).choose_move(time_limit=60)
+        # the tree is fully expanded before the time manager checks the root
+        self.assertIn(time_manager.reason, ['root proven', None])
+        self.assertGreater(time_manager.total_time_saved, 0)
+
+    def test_runner_up_cannot_catch_up(self):
+        root = RolloutNode(Connect4.STARTING_STATE, None, Connect4)
+        for _ in range(20):
+            root.choose_expansion_node().expand()
+        # give one child a lead that can't be overcome in the time limit
+        root.children[3].rollout_count += 10 ** 6
+        root.rollout_count += 10 ** 6
+
+        time_manager = TimeManager(check_interval=0.01, verbose=False)
+        time_manager.start(root, 60)
+        start_time = time()
+        while not time_manager.should_stop(root):
+            root.choose_expansion_node().expand()
+        self.assertLess(time() - start_time, 5)
+        self.assertEqual(time_manager.reason, 'runner-up cannot catch up')
+        self.assertGreater(time_manager.finish(), 50)
+
+    def test_time_limit(self):
+        for max_extension in [0, 1]:
+            time_manager = TimeManager(early_stopping=False, max_extension=max_extension, verbose=False)
+            mcts = MCTS(Connect4, time_manager=time_manager)
+            start_time = time()
+            mcts.choose_move(time_limit=0.5)
+            self.assertGreaterEqual(time() - start_time, 0.5)
+            self.assertLess(time() - start_time, 0.5 * (1 + max_extension) + 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Connect4 as GameClass
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import RolloutNode, HeuristicNode, TranspositionTable
+
+
+class TestTranspositions(unittest.TestCase):
+    @staticmethod
+    def search(root, expansions):
+        for _ in range(expansions):
+            best_node = root.choose_expansion_node()
+            if best_node is None:
+                break
+            best_node.expand()
+
+    @staticmethod
+    def get_nodes(root):
+        nodes = {}
+        stack = [root]
+        while len(stack) > 0:
+            node = stack.pop()
+            if id(node) in nodes:
+                continue
+            nodes[id(node)] = node
+            if node.children is not None:
+                stack.extend(node.children)
+        return list(nodes.values())
+
+    def test_rollout_node_shares_positions(self):
+        np.random.seed(0)
+        transposition_table = TranspositionTable(GameClass)
+        root = RolloutNode(GameClass.STARTING_STATE, parent=None, GameClass=GameClass,
+                           transposition_table=transposition_table)
+        self.search(root, 200)
+
+        self.assertEqual(root.count_expansions(), 200)
+        self.assertGreater(transposition_table.hits, 0)
+        self.assertGreater(transposition_table.saved_expansions, 0)
+
+        # every position must appear at most once at each depth
+        nodes = self.get_nodes(root)
+        keys = {(node.depth, node.position.tobytes()) for node in nodes}
+        self.assertEqual(len(keys), len(nodes))
+
+    def test_heuristic_node_saves_network_calls(self):
+        evaluated_positions = []
+        for transposition_table in [None, TranspositionTable(GameClass)]:
+            network = HeuristicNetwork(GameClass)
+            root = HeuristicNode(GameClass.STARTING_STATE, None, GameClass, network,
+                                 transposition_table=transposition_table)
+            self.search(root, 200)
+            evaluated_positions.append(network.evaluated_positions)
+
+        self.assertGreater(transposition_table.saved_evaluations, 0)
+        self.assertLess(evaluated_positions[1], evaluated_positions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import unittest
+from tempfile import TemporaryDirectory
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import TreeFile, RolloutNode, HeuristicNode, TranspositionTable, \
+    AsyncMCTS, MCTS
+
+
+class TestTreeFile(unittest.TestCase):
+    def assert_same_tree(self, node, loaded_node):
+        np.testing.assert_array_equal(node.position, loaded_node.position)
+        self.assertEqual(node.fully_expanded, loaded_node.fully_expanded)
+        self.assertEqual(node.proof_depth, loaded_node.proof_depth)
+        self.assertEqual(node.count_expansions(), loaded_node.count_expansions())
+        expansions, value, policy = node.get_statistics()
+        loaded_expansions, loaded_value, loaded_policy = loaded_node.get_statistics()
+        np.testing.assert_equal(value, loaded_value)
+        if policy is not None:
+            np.testing.assert_allclose(policy, loaded_policy, rtol=1e-6)
+        self.assertEqual(node.children is None, loaded_node.children is None)
+        if node.children is not None:
+            self.assertEqual(len(node.children), len(loaded_node.children))
+            for child, loaded_child in zip(node.children, loaded_node.children):
+                self.assert_same_tree(child, loaded_child)
+
+    def test_save_and_load(self):
+        network = HeuristicNetwork(Connect4)
+        roots = [
+            RolloutNode(Connect4.STARTING_STATE, None, Connect4),
+            HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network),
+            HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network, evaluate_on_visit=True, pack_position=True)
+        ]
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree.bin')
+            for root in roots:
+                for _ in range(200):
+                    root.choose_expansion_node().expand()
+                # small chunks so that the children of some nodes are split between chunks
+                saved_nodes = TreeFile.save(root, path, chunk_size=7)
+                self.assertEqual(saved_nodes, root.count_nodes())
+
+                loaded_root = RolloutNode(Connect4.STARTING_STATE, None, Connect4) if isinstance(root, RolloutNode) \
+                    else HeuristicNode(Connect4.STARTING_STATE, None, Connect4, network,
+                                       evaluate_on_visit=root.evaluate_on_visit)
+                network.evaluated_positions = 0
+                self.assertEqual(TreeFile.load(path, loaded_root), saved_nodes)
+                # the saved evaluations are used instead of the network
+                self.assertEqual(network.evaluated_positions, 0)
+                self.assert_same_tree(root, loaded_root)
+
+                # the search can be continued from the loaded tree
+                for _ in range(20):
+                    loaded_root.choose_expansion_node().expand()
+                self.assertEqual(loaded_root.count_expansions(), root.count_expansions() + 20)
+
+            with self.assertRaises(ValueError):
+                TreeFile.load(path, HeuristicNode(Connect4.get_possible_moves(Connect4.STARTING_STATE)[0], None,
+                                                  Connect4, network))
+            with self.assertRaises(ValueError):
+                TreeFile.load(path, RolloutNode(Connect4.STARTING_STATE, None, Connect4))
+
+    def test_transpositions(self):
+        root = RolloutNode(TicTacToe.STARTING_STATE, None, TicTacToe,
+                           transposition_table=TranspositionTable(TicTacToe))
+        best_node = root.choose_expansion_node()
+        while best_node is not None:
+            best_node.expand()
+            best_node = root.choose_expansion_node()
+
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree.bin')
+            saved_nodes = TreeFile.save(root, path)
+            loaded_root = RolloutNode(TicTacToe.STARTING_STATE, None, TicTacToe,
+                                      transposition_table=TranspositionTable(TicTacToe))
+            self.assertEqual(TreeFile.load(path, loaded_root), saved_nodes)
+        self.assertEqual(loaded_root.count_nodes(), saved_nodes)
+        # shared nodes are loaded once, and the proven tree doesn't need to be searched again
+        self.assertLess(saved_nodes, 6000)
+        self.assertTrue(loaded_root.fully_expanded)
+        self.assertEqual(loaded_root.get_evaluation(), 0)
+        self.assertEqual(loaded_root.depth_to_end_game(), 9)
+        self.assertIsNone(loaded_root.choose_expansion_node())
+
+    def test_move_choosers(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree.bin')
+            mcts = MCTS(TicTacToe, reuse_tree=False)
+            mcts.root = mcts.create_root()
+            mcts.search(mcts.root, 1)
+            expansions = mcts.root.count_expansions()
+            mcts.save_tree(path)
+
+            mcts = MCTS(TicTacToe)
+            mcts.load_tree(path)
+            self.assertEqual(mcts.root.count_expansions(), expansions)
+
+            async_mcts = AsyncMCTS(TicTacToe, TicTacToe.STARTING_STATE, time_limit=0.5, tree_path=path)
+            async_mcts.start()
+            try:
+                async_mcts.choose_move()
+                async_mcts.save_tree(path)
+            finally:
+                async_mcts.terminate()
+            # the saved tree is the subtree of the chosen move
+            mcts = MCTS(TicTacToe, async_mcts.position)
+            mcts.load_tree(path)
+            self.assertGreater(mcts.root.count_expansions(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
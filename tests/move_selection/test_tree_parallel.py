@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import TicTacToe, Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import SharedArrayTree, TreeParallelMCTS
+
+
+class TestTreeParallel(unittest.TestCase):
+    def test_proof_propagation(self):
+        # a position a few moves into the game keeps the tree small
+        position = TicTacToe.STARTING_STATE
+        for i in [4, 0, 6]:
+            position = TicTacToe.get_possible_moves(position)[i]
+        tree = SharedArrayTree(position, TicTacToe)
+        try:
+            tree.search(60)
+            # the remaining game is a draw with perfect play
+            self.assertTrue(tree.fully_expanded[0])
+            self.assertEqual(tree.root.get_evaluation(), 0)
+            self.assertTrue(np.all(tree.virtual_losses[:tree.size] == 0))
+        finally:
+            tree.close()
+
+    def test_virtual_losses_separate_workers(self):
+        network = HeuristicNetwork(Connect4)
+        tree = SharedArrayTree(Connect4.STARTING_STATE, Connect4, network)
+        try:
+            for _ in range(20):
+                node, path = tree.select_leaf(0)
+                tree.expand(node, remove_virtual_losses=True)
+
+            # two pending selections must not choose the same node
+            first_node, first_path = tree.select_leaf(0)
+            second_node, second_path = tree.select_leaf(0)
+            self.assertNotEqual(first_node, second_node)
+            tree.expand(first_node, remove_virtual_losses=True)
+            tree.expand(second_node, remove_virtual_losses=True)
+            self.assertEqual(tree.root.count_expansions(), 22)
+            self.assertTrue(np.all(tree.virtual_losses[:tree.size] == 0))
+        finally:
+            tree.close()
+
+    def test_full_tree(self):
+        tree = SharedArrayTree(Connect4.STARTING_STATE, Connect4, HeuristicNetwork(Connect4), capacity=64)
+        try:
+            expansions, _ = tree.search(10)
+            self.assertLessEqual(tree.size, 64)
+            self.assertEqual(tree.root.count_expansions(), expansions)
+        finally:
+            tree.close()
+
+    def test_tree_parallel_mcts(self):
+        mcts = TreeParallelMCTS(Connect4, network=HeuristicNetwork(Connect4), workers=2, capacity=2 ** 16)
+        try:
+            chosen_position = mcts.choose_move(time_limit=0.5)[-1]
+            self.assertTrue(any(np.all(chosen_position == move)
+                                for move in Connect4.get_possible_moves(Connect4.STARTING_STATE)))
+            self.assertTrue(np.all(mcts.position == chosen_position))
+            self.assertGreater(mcts.tree.root.count_expansions(), 1)
+        finally:
+            mcts.terminate()
+
+
+if __name__ == '__main__':
+    unittest.main()
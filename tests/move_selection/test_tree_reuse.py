@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from perfect_information_game.games import Connect4
+from perfect_information_game.heuristics import HeuristicNetwork
+from perfect_information_game.move_selection.mcts import MCTS
+
+
+class TestTreeReuse(unittest.TestCase):
+    def check_tree_reuse(self, **kwargs):
+        mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), **kwargs)
+        chosen_position = mcts.choose_move(time_limit=0.5)[-1]
+        self.assertTrue(np.all(mcts.position == chosen_position))
+        self.assertTrue(np.all(mcts.root.position == chosen_position))
+        self.assertIsNone(mcts.root.parent)
+
+        # the opponent's reply should already have been explored
+        user_chosen_position = max(mcts.root.children, key=lambda child: child.count_expansions()).position
+        mcts.report_user_move(user_chosen_position)
+        self.assertTrue(np.all(mcts.root.position == user_chosen_position))
+        self.assertIsNone(mcts.root.parent)
+        reused_expansions = mcts.root.count_expansions()
+        self.assertGreater(reused_expansions, 0)
+
+        root = mcts.root
+        mcts.choose_move(time_limit=0.5)
+        self.assertGreater(root.count_expansions(), reused_expansions)
+
+        # resetting to the starting position must discard the tree
+        mcts.reset()
+        self.assertIsNone(mcts.root)
+
+    def test_tree_reuse(self):
+        self.check_tree_reuse()
+
+    def test_array_tree_reuse(self):
+        self.check_tree_reuse(array_tree=True)
+
+    def test_without_tree_reuse(self):
+        mcts = MCTS(Connect4, network=HeuristicNetwork(Connect4), reuse_tree=False)
+        mcts.choose_move(time_limit=0.1)
+        self.assertIsNone(mcts.root)
+
+
+if __name__ == '__main__':
+    unittest.main()